@@ -0,0 +1,111 @@
+from typing import AsyncIterable, AsyncIterator, Optional
+
+from metrics import get_recorder
+from results import ResultEvent, events_from_responses
+from session import ReconnectCallback, resilient_results_async
+from trans import RivaArguments, build_recognition_config, build_streaming_config
+
+# Async counterparts of the streaming functions in trans.py, on grpc.aio. A session is a
+# coroutine on the caller's event loop rather than a thread, so one loop can serve many
+# mostly idle sessions; sessions on a loop share its channel (see channelpool.AioClientPool).
+
+
+async def _asr_requests(config, chunks: AsyncIterable[bytes]):
+    import riva.client.proto.riva_asr_pb2 as rasr
+
+    yield rasr.StreamingRecognizeRequest(streaming_config=config)
+    async for chunk in chunks:
+        yield rasr.StreamingRecognizeRequest(audio_content=chunk)
+
+
+async def _s2t_requests(config, chunks: AsyncIterable[bytes]):
+    import riva.client.proto.riva_nmt_pb2 as rnmt
+
+    yield rnmt.StreamingTranslateSpeechToTextRequest(config=config)
+    async for chunk in chunks:
+        yield rnmt.StreamingTranslateSpeechToTextRequest(audio_content=chunk)
+
+
+async def _events(call, timeline, translated: bool = False) -> AsyncIterator[ResultEvent]:
+    try:
+        async for response in call:
+            for event in events_from_responses((response,), translated=translated):
+                timeline.observe(event)
+                yield event
+    finally:
+        call.cancel()
+
+
+async def stream_transcripts(args: RivaArguments, audio_chunks: AsyncIterable[bytes]) -> AsyncIterator[ResultEvent]:
+    """Stream audio to Riva ASR without translation and yield a result event per result."""
+    from channelpool import get_aio_pool
+
+    entry = get_aio_pool().entry(args)
+    timeline = get_recorder().track(audio_chunks, args.sample_rate_hz)
+    call = entry.asr_stub.StreamingRecognize(
+        _asr_requests(build_recognition_config(args), timeline), metadata=entry.auth.get_auth_metadata()
+    )
+    async for event in _events(call, timeline):
+        yield event
+
+
+async def stream_s2t(args: RivaArguments, audio_chunks: AsyncIterable[bytes]) -> AsyncIterator[ResultEvent]:
+    """Stream audio to Riva speech-to-text translation, which translates every result."""
+    from channelpool import get_aio_pool
+
+    entry = get_aio_pool().entry(args)
+    timeline = get_recorder().track(audio_chunks, args.sample_rate_hz)
+    call = entry.nmt_stub.StreamingTranslateSpeechToText(
+        _s2t_requests(build_streaming_config(args), timeline), metadata=entry.auth.get_auth_metadata()
+    )
+    async for event in _events(call, timeline, translated=True):
+        yield event
+
+
+def stream_decoupled(args: RivaArguments, audio_chunks: AsyncIterable[bytes]) -> AsyncIterator[ResultEvent]:
+    """Stream audio to Riva ASR and translate its results separately with batched, memoized NMT."""
+    from translation import get_translator, translate_events_async
+
+    return translate_events_async(
+        stream_transcripts(args, audio_chunks),
+        get_translator(args),
+        interim_interval_ms=args.interim_translation_ms,
+    )
+
+
+def stream_results(args: RivaArguments, audio_chunks: AsyncIterable[bytes]) -> AsyncIterator[ResultEvent]:
+    """Stream audio to Riva and yield a translated result event for every interim and final result.
+
+    Uses the pipeline selected by `args.translation_mode`.
+    """
+    if args.translation_mode == "decoupled":
+        return stream_decoupled(args, audio_chunks)
+    return stream_s2t(args, audio_chunks)
+
+
+def trans(
+        args: RivaArguments,
+        audio_chunks: AsyncIterable[bytes],
+        on_reconnect: Optional[ReconnectCallback] = None,
+        translate: bool = True,
+        read_ahead_seconds: float = 0.0,
+) -> AsyncIterator[ResultEvent]:
+    """Transcribe and translate `audio_chunks` and yield every result event, like `trans.trans`.
+
+    Failed streams are reconnected and the audio not yet covered by a final result is sent
+    again; `on_reconnect` is called with the error and the backoff delay before each attempt.
+    With `translate=False` only transcripts are produced. `read_ahead_seconds` limits how much
+    of `audio_chunks` is read beyond what the server has processed; see `session.ResilientSession`.
+    """
+    if translate and args.translation_mode == "decoupled":
+        from translation import get_translator, translate_events_async
+
+        # Translated after the session has removed what a rollover recognized twice.
+        return translate_events_async(
+            resilient_results_async(args, audio_chunks, stream_transcripts, on_reconnect, read_ahead_seconds),
+            get_translator(args),
+            interim_interval_ms=args.interim_translation_ms,
+        )
+    return resilient_results_async(args, audio_chunks, stream_s2t if translate else stream_transcripts,
+                                   on_reconnect, read_ahead_seconds)
+
@@ -0,0 +1,213 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from google.protobuf import json_format
+from riva.client.argparse_utils import add_asr_config_argparse_parameters, add_connection_argparse_parameters
+
+from channelpool import get_pool
+from offline import build_offline_config, recognize_file, response_transcript, wav_duration
+
+AUDIO_EXTENSIONS = (".wav", ".flac", ".opus", ".ogg")
+
+
+class ProgressManifest:
+    """Append-only JSON-lines record of finished files, used to resume interrupted runs."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done: Dict[str, dict] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # a torn last line from a crash
+                    if entry.get("status") == "done":
+                        self.done[entry["path"]] = entry
+        self._file = open(path, "a", encoding="utf-8")
+
+    def is_done(self, path: str) -> bool:
+        return path in self.done
+
+    def record(self, entry: dict):
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+        if entry.get("status") == "done":
+            self.done[entry["path"]] = entry
+
+    def close(self):
+        self._file.close()
+
+
+def discover_inputs(source: str) -> Tuple[str, Iterator[str]]:
+    """Return the root used for output names and the audio files named by `source`.
+
+    `source` is either a directory, searched recursively, or a manifest file listing one
+    audio path per line (relative paths are resolved against the manifest's directory).
+    """
+    if os.path.isdir(source):
+        root = os.path.abspath(source)
+
+        def walk():
+            for dirpath, dirnames, filenames in os.walk(root):
+                dirnames.sort()
+                for name in sorted(filenames):
+                    if name.lower().endswith(AUDIO_EXTENSIONS):
+                        yield os.path.join(dirpath, name)
+
+        return root, walk()
+
+    root = os.path.dirname(os.path.abspath(source))
+
+    def read_manifest():
+        with open(source, encoding="utf-8") as fh:
+            for line in fh:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                if line.startswith("{"):
+                    line = json.loads(line)["path"]
+                yield os.path.normpath(os.path.join(root, line))
+
+    return root, read_manifest()
+
+
+class BatchTranscriber:
+    """Runs offline recognition over many files with bounded concurrency on one shared channel."""
+
+    def __init__(self, args: argparse.Namespace, output_dir: str, concurrency: int = 8, manifest_path: str = None):
+        self.args = args
+        self.output_dir = output_dir
+        self.concurrency = concurrency
+        self.config = build_offline_config(args)
+        self.asr_service = get_pool().get_asr_service(args)
+        os.makedirs(output_dir, exist_ok=True)
+        self.manifest = ProgressManifest(manifest_path or os.path.join(output_dir, "progress.jsonl"))
+        self.files_done = 0
+        self.files_failed = 0
+        self.files_skipped = 0
+        self.audio_seconds = 0.0
+        self._started = None
+
+    def _output_path(self, root: str, path: str) -> str:
+        relative = os.path.relpath(path, root)
+        if relative.startswith(os.pardir):
+            relative = path.lstrip(os.sep)
+        return os.path.join(self.output_dir, relative + ".json")
+
+    def _transcribe(self, root: str, path: str) -> dict:
+        started = time.monotonic()
+        response = recognize_file(self.asr_service, path, self.config)
+        output_path = self._output_path(root, path)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        with open(output_path, "w", encoding="utf-8") as fh:
+            json.dump({
+                "path": path,
+                "transcript": response_transcript(response),
+                "response": json_format.MessageToDict(response),
+            }, fh, ensure_ascii=False)
+        return {
+            "path": path,
+            "status": "done",
+            "output": output_path,
+            "audio_seconds": wav_duration(path),
+            "elapsed": round(time.monotonic() - started, 3),
+        }
+
+    def run(self, source: str, report_every: int = 50) -> None:
+        """Transcribe every not-yet-finished file named by `source`."""
+        root, paths = discover_inputs(source)
+        self._started = time.monotonic()
+        pending = set()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="batch") as executor:
+            # Keep a bounded window of in-flight files so memory stays flat on huge inputs.
+            for path in paths:
+                if self.manifest.is_done(path):
+                    self.files_skipped += 1
+                    continue
+                pending.add(executor.submit(self._run_one, root, path))
+                if len(pending) >= self.concurrency * 2:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    self._collect(finished, report_every)
+            while pending:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                self._collect(finished, report_every)
+        self.manifest.close()
+        self.report(final=True)
+
+    def _run_one(self, root: str, path: str) -> dict:
+        try:
+            return self._transcribe(root, path)
+        except Exception as e:
+            return {"path": path, "status": "failed", "error": str(e)}
+
+    def _collect(self, finished, report_every: int):
+        for future in finished:
+            entry = future.result()
+            self.manifest.record(entry)
+            if entry["status"] == "done":
+                self.files_done += 1
+                self.audio_seconds += entry.get("audio_seconds") or 0.0
+            else:
+                self.files_failed += 1
+                print(f"Failed: {entry['path']}: {entry['error']}", file=sys.stderr)
+            if (self.files_done + self.files_failed) % report_every == 0:
+                self.report()
+
+    def throughput(self) -> dict:
+        elapsed = max(time.monotonic() - self._started, 1e-9)
+        return {
+            "files_done": self.files_done,
+            "files_failed": self.files_failed,
+            "files_skipped": self.files_skipped,
+            "elapsed_seconds": round(elapsed, 3),
+            "files_per_second": round(self.files_done / elapsed, 3),
+            # Audio hours transcribed per wall-clock hour, i.e. the real-time factor.
+            "audio_hours_per_hour": round(self.audio_seconds / elapsed, 3),
+        }
+
+    def report(self, final: bool = False):
+        stats = self.throughput()
+        prefix = "Finished" if final else "Progress"
+        print(
+            f"{prefix}: {stats['files_done']} done, {stats['files_failed']} failed, "
+            f"{stats['files_skipped']} skipped, {stats['files_per_second']} files/s, "
+            f"{stats['audio_hours_per_hour']} audio-hours/hour",
+            file=sys.stderr,
+        )
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Offline batch transcription of a directory or manifest of audio files via Riva AI Services",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("source", help="A directory of audio files or a manifest listing one audio path per line.")
+    parser.add_argument("--output-dir", default="transcripts", help="Directory for per-file JSON results.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Number of files recognized at once.")
+    parser.add_argument(
+        "--progress-manifest", default=None, help="Resumable progress file (default: OUTPUT_DIR/progress.jsonl)."
+    )
+    parser = add_asr_config_argparse_parameters(parser, max_alternatives=True, profanity_filter=True, word_time_offsets=True)
+    parser = add_connection_argparse_parameters(parser)
+    return parser.parse_args(argv)
+
+
+def main() -> None:
+    args = parse_args()
+    transcriber = BatchTranscriber(args, args.output_dir, args.concurrency, args.progress_manifest)
+    try:
+        transcriber.run(args.source)
+    except KeyboardInterrupt:
+        transcriber.report(final=True)
+        print("Interrupted; rerun the same command to resume.", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
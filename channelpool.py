@@ -0,0 +1,194 @@
+import asyncio
+import threading
+import weakref
+from typing import Dict, List, Optional, Tuple
+
+import grpc
+import riva.client
+
+# Keep idle channels alive between recordings and reconnect quickly after a server restart.
+DEFAULT_CHANNEL_OPTIONS: List[Tuple[str, int]] = [
+    ("grpc.keepalive_time_ms", 30000),
+    ("grpc.keepalive_timeout_ms", 10000),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+    ("grpc.initial_reconnect_backoff_ms", 500),
+    ("grpc.max_reconnect_backoff_ms", 5000),
+]
+
+
+class _PoolEntry:
+    """A shared channel together with the Riva clients built on top of it."""
+
+    def __init__(self, auth: riva.client.Auth):
+        self.auth = auth
+        self.asr_service: Optional[riva.client.ASRService] = None
+        self.nmt_client: Optional[riva.client.NeuralMachineTranslationClient] = None
+        self.state: Optional[grpc.ChannelConnectivity] = None
+        auth.channel.subscribe(self._on_state_change)
+
+    def _on_state_change(self, state: grpc.ChannelConnectivity):
+        self.state = state
+
+    def close(self):
+        self.auth.channel.unsubscribe(self._on_state_change)
+        self.auth.channel.close()
+
+
+class RivaClientPool:
+    """Process-wide cache of gRPC channels and Riva clients keyed by connection settings."""
+
+    def __init__(self, options: Optional[List[Tuple[str, int]]] = None, ready_timeout: float = 5.0):
+        self._options = list(DEFAULT_CHANNEL_OPTIONS if options is None else options)
+        self._ready_timeout = ready_timeout
+        self._entries: Dict[tuple, _PoolEntry] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key_for(args) -> tuple:
+        """Return the pool key for the connection settings in `args`."""
+        metadata = tuple(tuple(item) for item in (args.metadata or []))
+        return (args.server, bool(args.use_ssl), args.ssl_cert or None, metadata)
+
+    def _entry(self, args) -> _PoolEntry:
+        key = self.key_for(args)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.state == grpc.ChannelConnectivity.SHUTDOWN:
+                auth = riva.client.Auth(
+                    args.ssl_cert or None, args.use_ssl, args.server, args.metadata, options=self._options
+                )
+                entry = self._entries[key] = _PoolEntry(auth)
+            return entry
+
+    def get_auth(self, args) -> riva.client.Auth:
+        """Return the shared `Auth` (and channel) for the connection settings in `args`."""
+        return self._entry(args).auth
+
+    def get_asr_service(self, args) -> riva.client.ASRService:
+        """Return the shared ASR client for the connection settings in `args`."""
+        entry = self._entry(args)
+        with self._lock:
+            if entry.asr_service is None:
+                entry.asr_service = riva.client.ASRService(entry.auth)
+            return entry.asr_service
+
+    def get_nmt_client(self, args) -> riva.client.NeuralMachineTranslationClient:
+        """Return the shared translation client for the connection settings in `args`."""
+        entry = self._entry(args)
+        with self._lock:
+            if entry.nmt_client is None:
+                entry.nmt_client = riva.client.NeuralMachineTranslationClient(entry.auth)
+            return entry.nmt_client
+
+    def warm_up(self, args, timeout: Optional[float] = None) -> bool:
+        """Connect the channel for `args` now and return whether it became ready in time."""
+        channel = self._entry(args).auth.channel
+        try:
+            grpc.channel_ready_future(channel).result(timeout=self._ready_timeout if timeout is None else timeout)
+        except grpc.FutureTimeoutError:
+            return False
+        return True
+
+    def warm_up_async(self, args, timeout: Optional[float] = None) -> threading.Thread:
+        """Run `warm_up` on a daemon thread so callers such as the GUI do not block."""
+        thread = threading.Thread(target=self.warm_up, args=(args, timeout), daemon=True)
+        thread.start()
+        return thread
+
+    def is_healthy(self, args) -> bool:
+        """Return True if the channel for `args` is currently connected."""
+        key = self.key_for(args)
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry is not None and entry.state == grpc.ChannelConnectivity.READY
+
+    def check_health(self, args, timeout: Optional[float] = None) -> bool:
+        """Probe the channel for `args`, replacing it on the next use if it cannot connect."""
+        if self.is_healthy(args):
+            return True
+        if self.warm_up(args, timeout):
+            return True
+        self.invalidate(args)
+        return False
+
+    def invalidate(self, args):
+        """Close and forget the channel for `args`; the next request opens a fresh one."""
+        key = self.key_for(args)
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry is not None:
+            entry.close()
+
+    def close(self):
+        """Close every pooled channel."""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            entry.close()
+
+
+class _AioPoolEntry:
+    """A shared grpc.aio channel and the Riva stubs built on top of it."""
+
+    def __init__(self, auth: riva.client.Auth):
+        from riva.client.proto import riva_asr_pb2_grpc, riva_nmt_pb2_grpc
+
+        self.auth = auth
+        self.asr_stub = riva_asr_pb2_grpc.RivaSpeechRecognitionStub(auth.channel)
+        self.nmt_stub = riva_nmt_pb2_grpc.RivaTranslationStub(auth.channel)
+
+
+class AioClientPool:
+    """Cache of grpc.aio channels and Riva stubs keyed by connection settings, per event loop.
+
+    An asyncio channel belongs to the loop it was created on, so every loop gets its own
+    channels; within a loop all sessions with the same settings share one channel.
+    """
+
+    def __init__(self, options: Optional[List[Tuple[str, int]]] = None):
+        self._options = list(DEFAULT_CHANNEL_OPTIONS if options is None else options)
+        self._loops: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[tuple, _AioPoolEntry]]" = \
+            weakref.WeakKeyDictionary()
+
+    def _entries(self) -> Dict[tuple, _AioPoolEntry]:
+        return self._loops.setdefault(asyncio.get_running_loop(), {})
+
+    def entry(self, args) -> _AioPoolEntry:
+        """Return the shared channel and stubs for the connection settings in `args` on this loop."""
+        entries = self._entries()
+        key = RivaClientPool.key_for(args)
+        entry = entries.get(key)
+        if entry is None:
+            auth = riva.client.Auth(
+                args.ssl_cert or None, args.use_ssl, args.server, args.metadata, options=self._options, use_aio=True
+            )
+            entry = entries[key] = _AioPoolEntry(auth)
+        return entry
+
+    async def invalidate(self, args):
+        """Close and forget the channel for `args` on this loop; the next request opens a fresh one."""
+        entry = self._entries().pop(RivaClientPool.key_for(args), None)
+        if entry is not None:
+            await entry.auth.channel.close()
+
+    async def close(self):
+        """Close every channel of this loop."""
+        entries = self._loops.pop(asyncio.get_running_loop(), {})
+        for entry in entries.values():
+            await entry.auth.channel.close()
+
+
+_default_pool = RivaClientPool()
+_default_aio_pool = AioClientPool()
+
+
+def get_pool() -> RivaClientPool:
+    """Return the process-wide client pool."""
+    return _default_pool
+
+
+def get_aio_pool() -> AioClientPool:
+    """Return the process-wide asyncio client pool."""
+    return _default_aio_pool
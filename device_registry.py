@@ -0,0 +1,220 @@
+import fnmatch
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, Union
+
+# Rates checked by `supported_rates`, most useful first.
+COMMON_RATES = (16000, 48000, 44100, 32000, 22050, 8000)
+
+
+@dataclass(frozen=True)
+class AudioDevice:
+    """An input device as PortAudio reported it when the registry last scanned."""
+
+    index: int
+    name: str
+    host_api: str
+    max_input_channels: int
+    default_rate: int
+
+    @property
+    def key(self) -> Tuple[str, str, int]:
+        """Identifies the device across rescans, which may renumber devices."""
+        return self.name, self.host_api, self.max_input_channels
+
+
+class DeviceRegistry:
+    """Process-wide cache of the input devices and the capture formats they support.
+
+    PortAudio is initialized once, on first use, and the interface is shared with the
+    streams that record (see `acquire`), so opening a recording neither re-initializes
+    PortAudio nor re-scans devices. Format support is probed per device on first use and
+    remembered. PortAudio only sees plugged or unplugged devices when it is re-initialized,
+    which `refresh` does, on demand only: when `find` has no match, when a stream cannot be
+    opened, or when a caller such as the settings dialog asks for it. A rescan may renumber
+    devices, so choices that are kept should name a device rather than hold its index.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._pyaudio = None
+        self._audio = None
+        self._users = 0
+        self._devices: Optional[Dict[int, AudioDevice]] = None
+        self._default_index: Optional[int] = None
+        self._formats: Dict[Tuple[Tuple[str, str, int], int, int], bool] = {}
+
+    def _interface(self):
+        if self._audio is None:
+            import pyaudio
+
+            self._pyaudio = pyaudio
+            self._audio = pyaudio.PyAudio()
+        return self._audio
+
+    def _scan(self):
+        audio = self._interface()
+        devices = {}
+        for i in range(audio.get_device_count()):
+            info = audio.get_device_info_by_index(i)
+            if info["maxInputChannels"] < 1:
+                continue
+            host_api = audio.get_host_api_info_by_index(info["hostApi"])["name"]
+            devices[info["index"]] = AudioDevice(
+                info["index"], info["name"], host_api, int(info["maxInputChannels"]), int(info["defaultSampleRate"])
+            )
+        try:
+            self._default_index = audio.get_default_input_device_info()["index"]
+        except OSError:
+            self._default_index = None
+        self._devices = devices
+
+    def _ensure_scanned(self):
+        if self._devices is None:
+            self._scan()
+
+    def devices(self) -> List[AudioDevice]:
+        """Return the input devices, scanning only the first time."""
+        with self._lock:
+            self._ensure_scanned()
+            return list(self._devices.values())
+
+    def get(self, index: int) -> Optional[AudioDevice]:
+        with self._lock:
+            self._ensure_scanned()
+            return self._devices.get(index)
+
+    def default(self) -> Optional[AudioDevice]:
+        """Return the system default input device, if there is one."""
+        with self._lock:
+            self._ensure_scanned()
+            return None if self._default_index is None else self._devices.get(self._default_index)
+
+    def resolve(self, device: Union[int, str, None]) -> Optional[AudioDevice]:
+        """Return the device `device` names or indexes (see `find`), or the default device for None."""
+        return self.default() if device is None else self.find(device)
+
+    def find(self, pattern: Union[int, str]) -> Optional[AudioDevice]:
+        """Return the first input device matching `pattern`, rescanning once if none does.
+
+        `pattern` is a device index, an exact name, a glob such as "USB*" or a part of the
+        name; names are compared case-insensitively.
+        """
+        for attempt in range(2):
+            device = self._match(pattern)
+            if device is not None or attempt or self.refresh_if_idle() is None:
+                return device
+        return None
+
+    def _match(self, pattern: Union[int, str]) -> Optional[AudioDevice]:
+        if isinstance(pattern, int) or str(pattern).strip().isdigit():
+            return self.get(int(pattern))
+        pattern = pattern.strip().lower()
+        devices = self.devices()
+        for matches in (
+                lambda name: name == pattern,
+                lambda name: fnmatch.fnmatchcase(name, pattern),
+                lambda name: pattern in name,
+        ):
+            for device in devices:
+                if matches(device.name.lower()):
+                    return device
+        return None
+
+    def supports(self, device: AudioDevice, rate: int, channels: int) -> bool:
+        """Return whether `device` can capture 16-bit audio at `rate` with `channels`, probing once."""
+        key = (device.key, rate, channels)
+        with self._lock:
+            supported = self._formats.get(key)
+            if supported is None:
+                audio = self._interface()
+                try:
+                    audio.is_format_supported(rate, input_device=device.index, input_channels=channels,
+                                              input_format=self._pyaudio.paInt16)
+                    supported = True
+                except ValueError:
+                    supported = False
+                self._formats[key] = supported
+            return supported
+
+    def supported_rates(self, device: AudioDevice, channels: int = 1) -> List[int]:
+        return [rate for rate in COMMON_RATES if self.supports(device, rate, channels)]
+
+    def pick_format(self, device: AudioDevice, rate: int, device_rate: int = 0,
+                    device_channels: int = 0) -> Tuple[int, int]:
+        """Return the (rate, channels) to capture from `device` for a stream at `rate`.
+
+        `device_rate`/`device_channels` are used when given (0 picks automatically);
+        otherwise the first supported format out of mono at `rate`, then mono, stereo and
+        all channels at the device's default rate.
+        """
+        if device_rate or device_channels:
+            return device_rate or device.default_rate, device_channels or 1
+        candidates = [(rate, 1), (device.default_rate, 1), (device.default_rate, min(2, device.max_input_channels)),
+                      (device.default_rate, device.max_input_channels)]
+        for candidate in candidates:
+            if self.supports(device, *candidate):
+                return candidate
+        # Let PortAudio report the error for the last candidate when nothing is supported.
+        return candidates[-1]
+
+    def acquire(self):
+        """Return the shared PyAudio interface for opening a stream; pair with `release`."""
+        with self._lock:
+            self._users += 1
+            return self._interface()
+
+    def release(self):
+        with self._lock:
+            self._users -= 1
+
+    @property
+    def pa_module(self):
+        """The pyaudio module, for its constants."""
+        with self._lock:
+            self._interface()
+            return self._pyaudio
+
+    def refresh_if_idle(self) -> Optional[Tuple[List[AudioDevice], List[AudioDevice]]]:
+        """Rescan unless a stream is open; return the (added, removed) devices, or None if busy."""
+        with self._lock:
+            if self._users:
+                return None
+            return self.refresh()
+
+    def refresh(self) -> Tuple[List[AudioDevice], List[AudioDevice]]:
+        """Re-initialize PortAudio and rescan, returning the (added, removed) devices.
+
+        Must not be called while a stream is open; see `refresh_if_idle`.
+        """
+        with self._lock:
+            before = {device.key: device for device in (self._devices or {}).values()}
+            if self._audio is not None:
+                self._audio.terminate()
+                self._audio = None
+            self._scan()
+            after = {device.key: device for device in self._devices.values()}
+            # Forget format support of devices that are gone; keep it for the rest.
+            self._formats = {key: value for key, value in self._formats.items() if key[0] in after}
+        added = [device for key, device in after.items() if key not in before]
+        removed = [device for key, device in before.items() if key not in after]
+        return added, removed
+
+
+_registry = DeviceRegistry()
+
+
+def list_input_devices(registry: Optional[DeviceRegistry] = None) -> None:
+    """Print the input devices, like `riva.client.audio_io.list_input_devices`, with their formats."""
+    registry = registry or _registry
+    default = registry.default()
+    print("Input audio devices:")
+    for device in registry.devices():
+        marker = " (default)" if default is not None and device.index == default.index else ""
+        print(f"{device.index}: {device.name}{marker} [{device.host_api}, {device.max_input_channels} ch, "
+              f"{device.default_rate} Hz]")
+
+
+def get_registry() -> DeviceRegistry:
+    """Return the process-wide device registry."""
+    return _registry
@@ -0,0 +1,232 @@
+import argparse
+import asyncio
+import io
+import threading
+import wave
+from typing import AsyncIterator, Callable, Tuple
+
+import grpc
+import riva.client.proto.riva_asr_pb2 as rasr
+import riva.client.proto.riva_asr_pb2_grpc as rasr_srv
+import riva.client.proto.riva_nmt_pb2 as riva_nmt
+import riva.client.proto.riva_nmt_pb2_grpc as riva_nmt_srv
+
+DEFAULT_TEXT = "the quick brown fox jumps over the lazy dog"
+
+
+class FakeRecognizer:
+    """Turns streamed LINEAR_PCM audio into canned interim and final results.
+
+    One word is "recognized" every `word_ms` of audio. Interim results are emitted every
+    `interim_ms` of audio and a final result closes each utterance of `final_ms`. Every
+    streaming response is delayed by `delay_ms`; offline requests take `delay_ms` plus
+    `offline_rtf` seconds per second of audio. With `stall`, streams are accepted but their
+    audio is never read, like on an overloaded server. With `quiet_silence`, like Riva, no
+    results are sent while the audio is digital silence.
+    """
+
+    def __init__(
+            self,
+            text: str = DEFAULT_TEXT,
+            word_ms: int = 300,
+            interim_ms: int = 200,
+            final_ms: int = 2400,
+            delay_ms: float = 0.0,
+            offline_rtf: float = 0.0,
+            stall: bool = False,
+            quiet_silence: bool = False,
+    ):
+        self.words = text.split() or ["word"]
+        self.word_ms = word_ms
+        self.interim_ms = interim_ms
+        self.final_ms = final_ms
+        self.delay_ms = delay_ms
+        self.offline_rtf = offline_rtf
+        self.stall = stall
+        self.quiet_silence = quiet_silence
+
+    def result(self, start_ms: int, end_ms: int, is_final: bool, prefix: str = "",
+               word_times: bool = True) -> rasr.StreamingRecognitionResult:
+        """Return the canned result covering audio from `start_ms` to `end_ms`.
+
+        Like Riva, finals carry word time offsets only with `word_times`, and interims never do.
+        """
+        words = []
+        for start in range(start_ms, end_ms - self.word_ms + 1, self.word_ms):
+            word = self.words[(start // self.word_ms) % len(self.words)]
+            words.append(rasr.WordInfo(word=word, start_time=start, end_time=start + self.word_ms, confidence=1.0))
+        return rasr.StreamingRecognitionResult(
+            alternatives=[rasr.SpeechRecognitionAlternative(
+                transcript=prefix + " ".join(w.word for w in words),
+                confidence=1.0 if is_final else 0.0,
+                words=words if is_final and word_times else [],
+            )],
+            is_final=is_final,
+            stability=1.0 if is_final else 0.5,
+            audio_processed=end_ms / 1000.0,
+        )
+
+    async def results(
+            self, audio: AsyncIterator[bytes], sample_rate_hz: int, prefix: str = "", word_times: bool = True,
+    ) -> AsyncIterator[rasr.StreamingRecognitionResult]:
+        """Yield results for the 16-bit mono chunks in `audio` as they arrive."""
+        if self.stall:
+            await asyncio.Event().wait()
+        bytes_per_ms = max(sample_rate_hz, 1000) * 2 / 1000.0
+        received = 0
+        utterance_start = 0
+        next_interim = self.interim_ms
+        async for chunk in audio:
+            received += len(chunk)
+            if self.quiet_silence and not chunk.strip(b"\0"):
+                continue
+            audio_ms = int(received / bytes_per_ms)
+            while audio_ms >= utterance_start + self.final_ms:
+                utterance_end = utterance_start + self.final_ms
+                await self._delay()
+                yield self.result(utterance_start, utterance_end, True, prefix, word_times)
+                utterance_start = utterance_end
+                next_interim = utterance_start + self.interim_ms
+            if audio_ms >= next_interim:
+                await self._delay()
+                yield self.result(utterance_start, audio_ms, False, prefix)
+                next_interim = audio_ms + self.interim_ms
+        audio_ms = int(received / bytes_per_ms)
+        if audio_ms > utterance_start:
+            await self._delay()
+            yield self.result(utterance_start, audio_ms, True, prefix, word_times)
+
+    async def recognize(self, audio: bytes, sample_rate_hz: int, prefix: str = "",
+                        word_times: bool = True) -> rasr.RecognizeResponse:
+        """Return the offline response for a whole recording (raw 16-bit mono PCM or a WAV file)."""
+        if audio[:4] == b"RIFF":
+            with wave.open(io.BytesIO(audio), 'rb') as wf:
+                sample_rate_hz = wf.getframerate()
+                audio_ms = wf.getnframes() * 1000 // sample_rate_hz
+        else:
+            audio_ms = len(audio) * 1000 // (max(sample_rate_hz, 1000) * 2)
+        await asyncio.sleep(self.delay_ms / 1000.0 + audio_ms / 1000.0 * self.offline_rtf)
+        results = []
+        for start_ms in range(0, audio_ms, self.final_ms):
+            streaming = self.result(start_ms, min(start_ms + self.final_ms, audio_ms), True, prefix, word_times)
+            results.append(rasr.SpeechRecognitionResult(
+                alternatives=streaming.alternatives, audio_processed=streaming.audio_processed,
+            ))
+        return rasr.RecognizeResponse(results=results)
+
+    async def _delay(self):
+        if self.delay_ms > 0:
+            await asyncio.sleep(self.delay_ms / 1000.0)
+
+
+async def _split_config(request_iterator) -> Tuple[object, AsyncIterator[bytes]]:
+    """Return the first (config) request and an iterator over the audio of the rest."""
+    requests = request_iterator.__aiter__()
+    first = await requests.__anext__()
+
+    async def audio():
+        async for request in requests:
+            yield request.audio_content
+
+    return first, audio()
+
+
+class FakeSpeechRecognition(rasr_srv.RivaSpeechRecognitionServicer):
+    """Stand-in for the Riva ASR service."""
+
+    def __init__(self, recognizer: FakeRecognizer):
+        self._recognizer = recognizer
+
+    async def Recognize(self, request, context):
+        return await self._recognizer.recognize(request.audio, request.config.sample_rate_hertz or 16000,
+                                                word_times=request.config.enable_word_time_offsets)
+
+    async def StreamingRecognize(self, request_iterator, context):
+        first, audio = await _split_config(request_iterator)
+        config = first.streaming_config.config
+        async for result in self._recognizer.results(audio, config.sample_rate_hertz or 16000,
+                                                     word_times=config.enable_word_time_offsets):
+            yield rasr.StreamingRecognizeResponse(results=[result])
+
+
+class FakeTranslation(riva_nmt_srv.RivaTranslationServicer):
+    """Stand-in for the Riva text and speech-to-text translation services."""
+
+    def __init__(self, recognizer: FakeRecognizer):
+        self._recognizer = recognizer
+
+    async def TranslateText(self, request, context):
+        await self._recognizer._delay()
+        return riva_nmt.TranslateTextResponse(translations=[
+            riva_nmt.Translation(text=f"[{request.target_language}] {text}", language=request.target_language)
+            for text in request.texts
+        ])
+
+    async def StreamingTranslateSpeechToText(self, request_iterator, context):
+        first, audio = await _split_config(request_iterator)
+        config = first.config.asr_config.config
+        prefix = f"[{first.config.translation_config.target_language_code}] "
+        async for result in self._recognizer.results(audio, config.sample_rate_hertz or 16000, prefix,
+                                                     word_times=config.enable_word_time_offsets):
+            yield riva_nmt.StreamingTranslateSpeechToTextResponse(results=[result])
+
+
+async def serve(recognizer: FakeRecognizer, address: str = "localhost:50051") -> grpc.aio.Server:
+    """Start the fake Riva services on `address` and return the running server."""
+    server = grpc.aio.server()
+    rasr_srv.add_RivaSpeechRecognitionServicer_to_server(FakeSpeechRecognition(recognizer), server)
+    riva_nmt_srv.add_RivaTranslationServicer_to_server(FakeTranslation(recognizer), server)
+    port = server.add_insecure_port(address)
+    if port == 0:
+        raise RuntimeError(f"Could not bind fake Riva server to {address}")
+    await server.start()
+    server.port = port
+    return server
+
+
+def start_in_background(recognizer: FakeRecognizer, host: str = "localhost") -> Tuple[str, Callable[[], None]]:
+    """Run the fake server on a free port in a daemon thread.
+
+    Returns the server address and a function that stops the server.
+    """
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    server = asyncio.run_coroutine_threadsafe(serve(recognizer, f"{host}:0"), loop).result()
+
+    def stop():
+        asyncio.run_coroutine_threadsafe(server.stop(None), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+
+    return f"{host}:{server.port}", stop
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Local stand-in for the Riva ASR and translation streaming services",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--address", default="localhost:50051", help="Address to listen on.")
+    parser.add_argument("--text", default=DEFAULT_TEXT, help="Words cycled through as the recognized transcript.")
+    parser.add_argument("--word-ms", type=int, default=300, help="Audio duration of one recognized word.")
+    parser.add_argument("--interim-ms", type=int, default=200, help="Audio duration between interim results.")
+    parser.add_argument("--final-ms", type=int, default=2400, help="Audio duration of one final utterance.")
+    parser.add_argument("--delay-ms", type=float, default=0.0, help="Processing delay added before every response.")
+    parser.add_argument("--offline-rtf", type=float, default=0.0,
+                        help="Extra offline processing time per second of audio, in seconds.")
+    parser.add_argument("--stall", action="store_true", help="Accept streams but never read their audio.")
+    parser.add_argument("--quiet-silence", action="store_true", help="Send no results during digital silence.")
+    return parser.parse_args()
+
+
+async def _main(args: argparse.Namespace):
+    recognizer = FakeRecognizer(args.text, args.word_ms, args.interim_ms, args.final_ms, args.delay_ms,
+                                args.offline_rtf, args.stall, args.quiet_silence)
+    server = await serve(recognizer, args.address)
+    print(f"Fake Riva server listening on port {server.port}", flush=True)
+    await server.wait_for_termination()
+
+
+if __name__ == '__main__':
+    asyncio.run(_main(parse_args()))
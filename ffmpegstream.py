@@ -0,0 +1,106 @@
+import threading
+from collections import deque
+from typing import Optional
+
+import ffmpeg
+
+# Keys of ffmpeg's -progress report, which is interleaved with its error messages on stderr.
+_PROGRESS_KEYS = frozenset({
+    "frame", "fps", "bitrate", "total_size", "out_time", "dup_frames", "drop_frames", "speed", "progress",
+})
+
+
+def probe_duration(path: str) -> Optional[float]:
+    """Return the duration of a media file in seconds, or None if ffprobe cannot tell."""
+    try:
+        duration = ffmpeg.probe(path)["format"].get("duration")
+    except (ffmpeg.Error, OSError, KeyError):
+        return None
+    try:
+        return float(duration) if duration is not None else None
+    except ValueError:
+        return None
+
+
+class FFmpegAudioStream:
+    """Decodes the audio track of a media file with ffmpeg as an iterator yielding PCM chunks.
+
+    ffmpeg writes 16-bit little-endian mono PCM at `rate` Hz to a pipe, so chunks can be
+    streamed to Riva as LINEAR_PCM while the file is still being decoded. ffmpeg also
+    reports how far it has decoded; with the duration from ffprobe that gives `progress`.
+    """
+
+    def __init__(self, path: str, rate: int = 16000, chunk: int = 1600, probe_duration: bool = True):
+        self._path = path
+        self._rate = rate
+        self._chunk_bytes = chunk * 2
+        self._probe_duration = probe_duration
+        self._process = None
+        self._stderr_tail = deque(maxlen=50)
+        self._stderr_thread = None
+        self.closed = True
+        self.error = None
+        self.duration: Optional[float] = None  # seconds, if ffprobe could tell
+        self.position = 0.0  # seconds of the input decoded so far
+
+    def __enter__(self):
+        if self._probe_duration:
+            self.duration = probe_duration(self._path)
+        self._process = (
+            ffmpeg
+            .input(self._path)
+            .output("pipe:", format="s16le", acodec="pcm_s16le", ac=1, ar=self._rate)
+            .global_args("-nostdin", "-hide_banner", "-loglevel", "error", "-nostats", "-progress", "pipe:2")
+            .run_async(pipe_stdout=True, pipe_stderr=True)
+        )
+        # Drain stderr continuously so a chatty ffmpeg never blocks on a full pipe.
+        self._stderr_thread = threading.Thread(target=self._read_stderr, daemon=True)
+        self._stderr_thread.start()
+        self.closed = False
+        return self
+
+    def _read_stderr(self):
+        for line in self._process.stderr:
+            # -progress writes key=value lines; out_time_ms is in microseconds despite its name.
+            key, _, value = line.decode("utf-8", "replace").strip().partition("=")
+            if key in ("out_time_us", "out_time_ms"):
+                if value.isdigit():
+                    self.position = int(value) / 1e6
+            elif key not in _PROGRESS_KEYS:
+                self._stderr_tail.append(line)
+
+    @property
+    def progress(self) -> Optional[float]:
+        """Fraction of the input decoded so far, or None if the duration is unknown."""
+        if not self.duration:
+            return None
+        return min(self.position / self.duration, 1.0)
+
+    def close(self) -> None:
+        if self._process is not None and self._process.poll() is None:
+            self._process.kill()
+        if self._process is not None:
+            self._process.wait()
+            self._process.stdout.close()
+        self.closed = True
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def __next__(self) -> bytes:
+        if self.closed:
+            raise StopIteration
+        data = self._process.stdout.read(self._chunk_bytes)
+        if data:
+            return data
+        returncode = self._process.wait()
+        self._stderr_thread.join()
+        self.closed = True
+        if returncode != 0:
+            # Keep the error around: gRPC replaces exceptions raised by request iterators.
+            self.error = ffmpeg.Error("ffmpeg", None, b"".join(self._stderr_tail))
+            raise self.error
+        raise StopIteration
+
+    def __iter__(self):
+        return self
@@ -0,0 +1,222 @@
+import argparse
+import asyncio
+import contextlib
+from collections import Counter
+
+from starlette.applications import Starlette
+from starlette.routing import WebSocketRoute
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+from metrics import MetricsExporter, get_recorder
+from results import ResultEvent
+from trans import TRANSLATION_MODES, RivaArguments
+from websocketstream import OVERFLOW_POLICIES, WebSocketStream
+
+# WebSocket close code telling clients the server is at capacity and to retry later.
+TRY_AGAIN_LATER = 1013
+# Audio a session takes from its WebSocketStream beyond what Riva has reported processing,
+# or in real time while Riva reports nothing. Anything more waits in the stream's buffer,
+# where --max-buffered-ms and --overflow apply.
+READ_AHEAD_SECONDS = 2.0
+
+
+class TranscriptionGateway:
+    """Accepts websocket audio sessions and streams them through Riva speech-to-text.
+
+    Clients send 16-bit mono LINEAR_PCM as binary messages and an empty binary message
+    to end the audio. Every result event is sent back on the same socket as JSON. Sessions
+    run as coroutines on the server's event loop over grpc.aio, so an idle session costs no
+    thread; a stream that fails is reconnected and its unacknowledged audio replayed.
+    """
+
+    def __init__(
+            self,
+            args: RivaArguments,
+            translate: bool = False,
+            max_sessions: int = 256,
+            max_sessions_per_client: int = 8,
+            max_pending_results: int = 64,
+            max_buffered_ms: int = 5000,
+            overflow: str = "block",
+    ):
+        self.args = args
+        self.translate = translate
+        self.max_sessions = max_sessions
+        self.max_sessions_per_client = max_sessions_per_client
+        self.max_pending_results = max_pending_results
+        self.max_buffered_ms = max_buffered_ms
+        self.overflow = overflow
+        self.active_sessions = 0
+        self._sessions_per_client: Counter = Counter()
+
+    def _admit(self, client: str) -> bool:
+        if self.active_sessions >= self.max_sessions:
+            return False
+        if self._sessions_per_client[client] >= self.max_sessions_per_client:
+            return False
+        self.active_sessions += 1
+        self._sessions_per_client[client] += 1
+        return True
+
+    def _release(self, client: str):
+        self.active_sessions -= 1
+        self._sessions_per_client[client] -= 1
+        if self._sessions_per_client[client] <= 0:
+            del self._sessions_per_client[client]
+
+    async def _recognize(self, stream: WebSocketStream, results: asyncio.Queue):
+        """Run one Riva stream, queueing its events for the sender."""
+        import aio_trans
+
+        try:
+            async for event in aio_trans.trans(self.args, stream, translate=self.translate,
+                                               read_ahead_seconds=READ_AHEAD_SECONDS):
+                self._put_result(results, event)
+        finally:
+            stream.close()
+            results.put_nowait(None)
+
+    def _put_result(self, results: asyncio.Queue, event: ResultEvent):
+        # A client that reads slowly loses interim results, never finals.
+        if not event.is_final and results.qsize() >= self.max_pending_results:
+            return
+        results.put_nowait(event)
+
+    async def handle(self, websocket: WebSocket):
+        """Serve one websocket audio session."""
+        client = websocket.client.host if websocket.client else "unknown"
+        if not self._admit(client):
+            await websocket.close(code=TRY_AGAIN_LATER)
+            return
+        try:
+            await websocket.accept()
+            await self._run_session(websocket)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            self._release(client)
+
+    async def _run_session(self, websocket: WebSocket):
+        results: asyncio.Queue = asyncio.Queue()
+        stream = WebSocketStream(
+            websocket,
+            chunk_size=self.args.file_streaming_chunk,
+            sample_rate_hz=self.args.sample_rate_hz,
+            max_buffered_ms=self.max_buffered_ms,
+            overflow=self.overflow,
+        )
+        async with stream:
+            receiver = asyncio.create_task(stream.receive_chunks())
+            worker = asyncio.create_task(self._recognize(stream, results))
+            try:
+                while True:
+                    event = await results.get()
+                    if event is None:
+                        break
+                    await websocket.send_json(event.to_dict())
+                await worker
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                await websocket.send_json({"error": str(e)})
+            finally:
+                receiver.cancel()
+                worker.cancel()
+                stream.close()
+                await asyncio.gather(worker, return_exceptions=True)
+        await websocket.close()
+
+    async def shutdown(self):
+        from channelpool import get_aio_pool
+
+        await get_aio_pool().close()
+
+
+def create_app(gateway: TranscriptionGateway, path: str = "/transcribe") -> Starlette:
+    """Return an ASGI app serving `gateway` on the websocket route `path`."""
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        yield
+        await gateway.shutdown()
+
+    return Starlette(routes=[WebSocketRoute(path, gateway.handle)], lifespan=lifespan)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="WebSocket gateway for streaming transcription via Riva AI Services",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--host", default="0.0.0.0", help="Interface to listen on.")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on.")
+    parser.add_argument("--server", default="localhost:50051", help="URI of the Riva server.")
+    parser.add_argument("--use-ssl", action="store_true", help="Use SSL/TLS for the Riva connection.")
+    parser.add_argument("--ssl-cert", help="Path to the SSL certificate of the Riva server.")
+    parser.add_argument("--language-code", default="en-US", help="Language of the streamed audio.")
+    parser.add_argument("--target-language-code", default=None, help="Translate transcripts to this language.")
+    parser.add_argument(
+        "--translation-mode", choices=TRANSLATION_MODES, default="s2t",
+        help="s2t translates every result in the stream; decoupled translates finals and debounced interims in batches.",
+    )
+    parser.add_argument(
+        "--interim-translation-ms", type=int, default=1000,
+        help="In decoupled mode, minimum time between interim translations; 0 translates finals only.",
+    )
+    parser.add_argument("--sample-rate-hz", type=int, default=16000, help="Sample rate of the streamed audio.")
+    parser.add_argument("--automatic-punctuation", action="store_true", help="Add punctuation to transcripts.")
+    parser.add_argument("--max-sessions", type=int, default=256, help="Maximum concurrent sessions.")
+    parser.add_argument(
+        "--max-sessions-per-client", type=int, default=8, help="Maximum concurrent sessions from one client address."
+    )
+    parser.add_argument(
+        "--max-pending-results", type=int, default=64, help="Interim results queued per session before dropping."
+    )
+    parser.add_argument(
+        "--max-buffered-ms", type=int, default=5000, help="Audio buffered per session before the overflow policy applies."
+    )
+    parser.add_argument(
+        "--overflow", choices=OVERFLOW_POLICIES, default="block", help="What to do when a session's buffer is full."
+    )
+    parser.add_argument(
+        "--metrics-file", default=None,
+        help="Periodically write latency histograms here (.json for JSON, otherwise Prometheus text).",
+    )
+    parser.add_argument("--metrics-interval", type=float, default=10.0, help="Seconds between metrics writes.")
+    return parser.parse_args()
+
+
+def main() -> None:
+    import uvicorn
+
+    cli = parse_args()
+    args = RivaArguments()
+    args.set_server(cli.server)
+    args.set_use_ssl(cli.use_ssl)
+    args.set_ssl_cert(cli.ssl_cert)
+    args.set_asr_language_code(cli.language_code)
+    args.set_sample_rate_hz(cli.sample_rate_hz)
+    args.set_automatic_punctuation(cli.automatic_punctuation)
+    if cli.target_language_code:
+        args.set_target_language_code(cli.target_language_code)
+    args.set_translation_mode(cli.translation_mode)
+    args.set_interim_translation_ms(cli.interim_translation_ms)
+    gateway = TranscriptionGateway(
+        args,
+        translate=cli.target_language_code is not None,
+        max_sessions=cli.max_sessions,
+        max_sessions_per_client=cli.max_sessions_per_client,
+        max_pending_results=cli.max_pending_results,
+        max_buffered_ms=cli.max_buffered_ms,
+        overflow=cli.overflow,
+    )
+    exporter = MetricsExporter(get_recorder(), cli.metrics_file, cli.metrics_interval).start() \
+        if cli.metrics_file else None
+    try:
+        uvicorn.run(create_app(gateway), host=cli.host, port=cli.port)
+    finally:
+        if exporter is not None:
+            exporter.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,25 @@
 import tkinter as tk
 from tkinter import filedialog, ttk
-import ffmpeg
-import pyaudio
-import wave
+import json
+import os
+import queue
 import threading
-import riva.client
-import riva.client.audio_io
-from trans import RivaArguments, trans
+from dataclasses import replace
+from history_store import HistoryStore
+from history_view import HistoryView
+from jobs import CANCELLED, DONE, FAILED, PRIORITY_LIVE, QUEUED, RUNNING, JobCancelled, JobScheduler
+from metrics import get_recorder
+from profiles import ProfileStore
+from result_cache import DiscardEntry, get_cache
+from results import ResultEvent
+from trans import build_streaming_config, trans
+from transcript_panel import TranscriptPanel
+# ffmpeg, NumPy, PyAudio, grpc and riva.client are imported where they are first used, so the
+# window shows without waiting for them; see startup_bench.py.
+
+# History status of a video or recording job in each job state.
+VIDEO_STATUS = {QUEUED: "Queued", RUNNING: "Transcribing", DONE: "Transcribed", FAILED: "Failed", CANCELLED: "Cancelled"}
+RECORDING_STATUS = {QUEUED: "Starting", RUNNING: "Recording", DONE: "Stopped", FAILED: "Failed", CANCELLED: "Stopped"}
 
 class AudioConverterApp:
     def __init__(self, root):
@@ -32,33 +45,36 @@ class AudioConverterApp:
         status_frame.grid(row=2, column=0, sticky="ew", padx=10, pady=5)
 
         # Control buttons with tooltips
-        self.select_button = ttk.Button(control_frame, text="Select Video", command=self.select_video)
+        self.select_button = ttk.Button(control_frame, text="Add Videos", command=self.select_video)
         self.select_button.pack(side="left", padx=5)
-        self.create_tooltip(self.select_button, "Select a video file to convert to audio (Ctrl+O)")
+        self.create_tooltip(self.select_button, "Queue one or more video files to transcribe (Ctrl+O)")
 
         self.record_button = ttk.Button(control_frame, text="Start Recording", command=self.toggle_recording)
         self.record_button.pack(side="left", padx=5)
         self.create_tooltip(self.record_button, "Start/Stop audio recording (Ctrl+R)")
 
+        self.cancel_button = ttk.Button(control_frame, text="Cancel Jobs", command=self.cancel_selected_jobs)
+        self.cancel_button.pack(side="left", padx=5)
+        self.create_tooltip(self.cancel_button, "Cancel the queued or running jobs selected in the history (Delete)")
+
         self.settings_button = ttk.Button(control_frame, text="Settings", command=self.open_settings)
         self.settings_button.pack(side="left", padx=5)
         self.create_tooltip(self.settings_button, "Configure Riva settings (Ctrl+,)")
 
-        # Content area (History) with scrollbar
-        history_frame = ttk.Frame(self.content_frame)
-        history_frame.pack(fill="both", expand=True)
-        
-        self.history_tree = ttk.Treeview(history_frame, columns=("File", "Type", "Status", "Time"), show="headings")
-        self.history_tree.heading("File", text="File")
-        self.history_tree.heading("Type", text="Type")
-        self.history_tree.heading("Status", text="Status")
-        self.history_tree.heading("Time", text="Time")
-        
-        scrollbar = ttk.Scrollbar(history_frame, orient="vertical", command=self.history_tree.yview)
-        self.history_tree.configure(yscrollcommand=scrollbar.set)
-        
-        self.history_tree.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
+        # Content area: live transcript above the history
+        content_panes = ttk.PanedWindow(self.content_frame, orient="vertical")
+        content_panes.pack(fill="both", expand=True)
+
+        self.transcript_panel = TranscriptPanel(content_panes)
+        content_panes.add(self.transcript_panel, weight=1)
+
+        # Sessions and transcripts persist on disk; the view only loads the rows near the scroll position
+        self.history_store = HistoryStore()
+        # Jobs do not outlive the app; anything a previous run left unfinished was cut short
+        self.history_store.finish_abandoned("Interrupted")
+        self.history_view = HistoryView(content_panes, self.history_store, on_open=self.show_session)
+        content_panes.add(self.history_view, weight=1)
+        self.history_tree = self.history_view.tree
 
         # Enhanced status bar
         status_frame.grid_columnconfigure(0, weight=1)
@@ -74,11 +90,54 @@ class AudioConverterApp:
         self.progress_bar.grid_remove()
         
         self.is_recording = False
-        self.riva_args = RivaArguments()
+        self.recording_job = None
+        # Videos and recordings run as jobs: a few at a time, recordings first, each cancellable
+        self.scheduler = JobScheduler(on_change=lambda job: self.call_in_ui(self.job_changed, job))
+        self.session_jobs = {}  # history session id -> job
+        self.job_sessions = {}  # job id -> [history session id, state last written to the history]
+        # Widget updates requested by worker threads, applied on the Tk main loop
+        self.main_thread = threading.current_thread()
+        self.ui_calls = queue.SimpleQueue()
+        self.root.after(50, self.run_ui_calls)
+        # Settings are kept as named profiles; the last used one is loaded at startup
+        self.profiles = ProfileStore()
+        self.riva_args = self.profiles.load_active()
+        # Device probing and the Riva handshake run once the window is on screen
+        self.root.bind("<Map>", self.on_first_map, add="+")
         
         # Bind keyboard shortcuts
         self.bind_shortcuts()
 
+    def on_first_map(self, event):
+        if event.widget is not self.root:
+            return
+        self.root.unbind("<Map>")
+        threading.Thread(target=self.background_init, daemon=True).start()
+
+    def background_init(self):
+        # Runs on a worker thread: PortAudio probes every device, which can take seconds.
+        from channelpool import get_pool
+
+        # Open the Riva channel now so the first recording does not pay for the handshake
+        get_pool().warm_up_async(self.riva_args)
+        try:
+            if self.riva_args.probe_input_device() is None:
+                self.update_status("No audio input found", self.riva_args.input_device or "", is_error=True)
+        except Exception as e:
+            self.update_status("No audio input found", str(e), is_error=True)
+
+    def refresh_devices(self):
+        # Runs on a worker thread: re-initializing PortAudio to see plugged and unplugged devices
+        # takes a while. Skipped while a recording holds the devices.
+        from device_registry import get_registry
+
+        changes = get_registry().refresh_if_idle()
+        if changes is None or not any(changes):
+            return
+        added, removed = changes
+        changes = [f"+{device.name}" for device in added] + [f"-{device.name}" for device in removed]
+        self.update_status("Audio devices changed", ", ".join(changes))
+
     def create_menu_bar(self):
         menubar = tk.Menu(self.root)
         self.root.config(menu=menubar)
@@ -86,8 +145,9 @@ class AudioConverterApp:
         # File menu
         file_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="File", menu=file_menu)
-        file_menu.add_command(label="Open Video...", command=self.select_video, accelerator="Ctrl+O")
+        file_menu.add_command(label="Add Videos...", command=self.select_video, accelerator="Ctrl+O")
         file_menu.add_command(label="Start/Stop Recording", command=self.toggle_recording, accelerator="Ctrl+R")
+        file_menu.add_command(label="Cancel Selected Jobs", command=self.cancel_selected_jobs, accelerator="Delete")
         file_menu.add_separator()
         file_menu.add_command(label="Settings", command=self.open_settings, accelerator="Ctrl+,")
         file_menu.add_separator()
@@ -102,6 +162,7 @@ class AudioConverterApp:
     def bind_shortcuts(self):
         self.root.bind("<Control-o>", lambda e: self.select_video())
         self.root.bind("<Control-r>", lambda e: self.toggle_recording())
+        self.history_tree.bind("<Delete>", lambda e: self.cancel_selected_jobs())
         self.root.bind("<Control-comma>", lambda e: self.open_settings())
 
     def show_about(self):
@@ -110,7 +171,7 @@ class AudioConverterApp:
 A GUI application for audio conversion and recording using NVIDIA Riva ASR.
 
 Features:
-• Video to audio conversion
+• Video transcription
 • Real-time audio recording
 • Speech recognition
 • Multiple language support
@@ -121,97 +182,328 @@ Features:
     def show_shortcuts(self):
         shortcuts_text = """Keyboard Shortcuts
 
-Ctrl+O: Open video file
+Ctrl+O: Add video files
 Ctrl+R: Start/Stop recording
+Delete: Cancel the selected jobs
 Ctrl+,: Open settings
 Alt+F4: Exit application"""
         
         self.show_message(self.root, "Keyboard Shortcuts", shortcuts_text)
 
+    def call_in_ui(self, func, *args):
+        """Run `func(*args)` on the Tk main loop; safe to call from any thread."""
+        self.ui_calls.put((func, args))
+
+    def run_ui_calls(self):
+        while True:
+            try:
+                func, args = self.ui_calls.get_nowait()
+            except queue.Empty:
+                break
+            func(*args)
+        self.root.after(50, self.run_ui_calls)
+
     def update_status(self, message, detail="", is_error=False):
+        if threading.current_thread() is not self.main_thread:
+            self.call_in_ui(self.update_status, message, detail, is_error)
+            return
         self.status_label.config(text=message, foreground="red" if is_error else "black")
         self.detail_label.config(text=detail)
-        self.root.update()
 
     def add_to_history(self, filename, type_, status):
-        from datetime import datetime
-        self.history_tree.insert("", 0, values=(filename, type_, status, datetime.now().strftime("%H:%M:%S")))
+        """Record a new session and return its id."""
+        row = self.history_store.add_session(filename, type_, status)
+        self.history_view.session_added(row)
+        return row[0]
+
+    def update_history(self, session_id, status, finished=False):
+        self.history_store.update_session(session_id, status, finished)
+        self.history_view.session_updated(session_id, status)
+
+    def result_sink(self, session_id, source="", gate=None):
+        """Return a result sink that shows events live and stores the final ones with the session.
+
+        With several sessions at once, `source` tells their lines apart in the live transcript.
+        With a VoiceActivityGate `gate`, event times are mapped from the audio sent to the server
+        back to the captured audio, so stored segments line up with the recording.
+        """
+        def on_result(event):
+            if gate is not None:
+                event = gate.to_capture_event(event)
+            self.transcript_panel.post(replace(event, source=source) if source else event)
+            if event.is_final and event.display_text.strip():
+                self.history_store.add_segment(session_id, event)
+        return on_result
+
+    def show_session(self, session_id):
+        transcript = "\n".join(self.history_store.transcript(session_id)) or "No transcript was recorded."
+        window = tk.Toplevel(self.root)
+        window.title("Transcript")
+        window.geometry("800x600")
+        window.transient(self.root)
+
+        button_frame = ttk.Frame(window)
+        button_frame.pack(side="bottom", fill="x", padx=10, pady=(0, 10))
+        ttk.Button(button_frame, text="Close", command=window.destroy).pack(side="right")
+
+        text_frame = ttk.Frame(window)
+        text_frame.pack(fill="both", expand=True, padx=10, pady=10)
+        text = tk.Text(text_frame, wrap="word")
+        scrollbar = ttk.Scrollbar(text_frame, orient="vertical", command=text.yview)
+        text.configure(yscrollcommand=scrollbar.set)
+        text.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+        text.insert("1.0", transcript)
+        # Read-only, but the text can still be selected and copied
+        text.configure(state="disabled")
 
     def select_video(self):
-        video_path = filedialog.askopenfilename(
-            title="Select Video File",
+        video_paths = filedialog.askopenfilenames(
+            title="Select Video Files",
             filetypes=[
                 ("Video Files", "*.mp4;*.avi;*.mov;*.mkv"),
                 ("All Files", "*.*")
             ]
         )
-        if video_path:
-            filename = video_path.split('/')[-1]
-            self.update_status("Converting video...", f"File: {filename}")
-            self.progress_bar.grid()
-            self.progress_bar.start()
-            self.root.update()
-            
+        for video_path in video_paths:
+            self.queue_video(video_path)
+        if video_paths:
+            self.update_status(f"Queued {len(video_paths)} video(s)", f"{len(self.scheduler.jobs())} job(s) pending")
+
+    def queue_video(self, video_path):
+        filename = os.path.basename(video_path)
+        session_id = self.add_to_history(filename, "Video", "Queued")
+        self.track_job(session_id, self.scheduler.submit(
+            filename, lambda job: self.transcribe_video(job, video_path, session_id)))
+
+    def track_job(self, session_id, job):
+        self.session_jobs[session_id] = job
+        self.job_sessions[job.id] = [session_id, QUEUED]
+
+    def cancel_selected_jobs(self):
+        jobs = [self.session_jobs[session_id] for session_id in self.history_view.selected_ids()
+                if session_id in self.session_jobs]
+        if not jobs:
+            self.update_status("No queued or running job selected", "Select jobs in the history first")
+            return
+        for job in jobs:
+            if job is self.recording_job and self.is_recording:
+                self.toggle_recording()
+            else:
+                job.cancel()
+
+    def job_changed(self, job):
+        # Runs on the Tk main loop for every state change and progress report of a job.
+        tracked = self.job_sessions.get(job.id)
+        if tracked is None:
+            return
+        session_id, written_state = tracked
+        status = (RECORDING_STATUS if job.live else VIDEO_STATUS)[job.state]
+        if job.finished:
+            del self.job_sessions[job.id]
+            self.session_jobs.pop(session_id, None)
+            self.update_history(session_id, status, finished=True)
+            self.job_finished(job)
+        else:
+            if job.state != written_state:
+                tracked[1] = job.state
+                self.update_history(session_id, status)
+            if job.state == RUNNING and job.progress is not None and not job.live:
+                # Progress is only shown; the stored status changes with the job state.
+                self.history_view.session_updated(session_id, f"{status} {job.progress:.0%}")
+        self.show_job_progress()
+
+    def job_finished(self, job):
+        if job.live:
+            if job is not self.recording_job:
+                # A recording that was still finishing when the next one started.
+                return
+            self.recording_job = None
+            if self.is_recording:
+                self.stop_recording()
+            if job.state == FAILED:
+                self.update_status("Recording failed", str(job.error), is_error=True)
+            elif job.detail:
+                self.update_status("Recording stopped", job.detail)
+        elif job.state == FAILED:
+            self.update_status("Transcription failed", f"{job.name}: {job.error}", is_error=True)
+        elif job.state == CANCELLED:
+            self.update_status("Transcription cancelled", f"File: {job.name}")
+        else:
+            cached = " (cached)" if job.detail == "cached" else ""
+            self.update_status("Transcription complete", f"File: {job.name}{cached}")
+
+    def show_job_progress(self):
+        # The bar spins while recording and otherwise shows how far the queued videos are.
+        if self.is_recording:
+            return
+        jobs = [job for job in self.scheduler.jobs() if not job.live]
+        if not jobs:
+            self.progress_bar.stop()
+            self.progress_bar.grid_remove()
+            return
+        done = sum(job.progress or 0.0 for job in jobs) / len(jobs)
+        self.progress_bar.stop()
+        self.progress_bar.configure(mode="determinate", maximum=100, value=100 * done)
+        self.progress_bar.grid()
+
+    def transcribe_video(self, job, video_path, session_id):
+        # Runs as a scheduler job on a worker thread: all widget updates are handed to the Tk main loop.
+        import ffmpeg
+        from ffmpegstream import FFmpegAudioStream, probe_duration
+        from segmented import SEGMENTED_MIN_SECONDS, transcribe_segmented
+
+        filename = os.path.basename(video_path)
+        on_result = self.result_sink(session_id, source=filename)
+        self.transcript_panel.add_note(f"--- {filename} ---")
+
+        # Results and decoded audio are cached by file content and recognition config.
+        cache = get_cache()
+        digest = cache.content_digest(video_path)
+        config = build_streaming_config(self.riva_args).SerializeToString(deterministic=True)
+        result_key = cache.key(digest, self.riva_args.translation_mode, config)
+        cached = cache.get(result_key)
+        if cached is not None:
+            for line in cached.decode("utf-8").splitlines():
+                on_result(ResultEvent.from_dict(json.loads(line)))
+            job.report(1.0, "cached")
+            return
+
+        finals = []
+
+        def collect(event):
+            # Raising here ends the stream at once, audio still buffered included.
+            job.check_cancelled()
+            on_result(event)
+            if event.is_final:
+                finals.append(event)
+
+        pcm_key = cache.key(digest, "pcm", self.riva_args.sample_rate_hz)
+        pcm_path = cache.path(pcm_key)
+        chunk_bytes = self.riva_args.file_streaming_chunk * 2
+        duration = probe_duration(video_path)
+        if duration is not None and duration >= SEGMENTED_MIN_SECONDS:
+            # Long videos are decoded and recognized as parallel segments instead of one real-time stream.
+            events = transcribe_segmented(self.riva_args, video_path, duration, translate=True,
+                                          on_progress=job.report)
             try:
-                output_audio = video_path.rsplit('.', 1)[0] + ".mp3"
-                self.convert_to_audio(video_path, output_audio)
-                output_filename = output_audio.split('/')[-1]
-                self.add_to_history(filename, "Video", "Converted")
-                self.update_status("Conversion complete", f"Output: {output_filename}")
-            except Exception as e:
-                self.add_to_history(filename, "Video", "Failed")
-                self.update_status("Conversion failed", str(e), is_error=True)
+                for event in events:
+                    collect(event)
             finally:
-                self.progress_bar.stop()
-                self.progress_bar.grid_remove()
-
-    def convert_to_audio(self, video_path, audio_path):
-        try:    
-            # Show ffmpeg progress in detail label
-            self.update_status("Converting video...", "Initializing ffmpeg...")
-            ffmpeg.input(video_path).output(audio_path, format='mp3').run(
-                capture_stdout=True, capture_stderr=True)
-        except ffmpeg.Error as e:
-            raise Exception(f"FFmpeg error: {e.stderr.decode()}")
-        except Exception as e:
-            raise Exception(f"Conversion error: {str(e)}")
+                events.close()
+        elif pcm_path is not None:
+            total_bytes = os.path.getsize(pcm_path)
+
+            def cached_chunks():
+                sent = 0
+                for chunk in cache.iter_chunks(pcm_path, chunk_bytes):
+                    job.check_cancelled()
+                    sent += len(chunk)
+                    job.report(sent / total_bytes if total_bytes else None)
+                    yield chunk
+
+            trans(self.riva_args, cached_chunks(), on_result=collect, on_reconnect=self.show_reconnect)
+        else:
+            with FFmpegAudioStream(
+                video_path,
+                self.riva_args.sample_rate_hz,
+                self.riva_args.file_streaming_chunk,
+            ) as audio_chunk_iterator, cache.writer(pcm_key) as pcm_file:
+                decoded_all = False
+
+                def decoded_chunks():
+                    nonlocal decoded_all
+                    # Keep the decoded audio so a rerun with other settings skips ffmpeg.
+                    for chunk in audio_chunk_iterator:
+                        job.check_cancelled()
+                        pcm_file.write(chunk)
+                        job.report(audio_chunk_iterator.progress)
+                        yield chunk
+                    decoded_all = True
+
+                try:
+                    trans(self.riva_args, decoded_chunks(), on_result=collect, on_reconnect=self.show_reconnect)
+                    if audio_chunk_iterator.error is not None:
+                        raise audio_chunk_iterator.error
+                except JobCancelled:
+                    raise
+                except Exception as e:
+                    error = audio_chunk_iterator.error or e
+                    if isinstance(error, ffmpeg.Error):
+                        raise RuntimeError(f"FFmpeg error: {error.stderr.decode()}") from error
+                    raise error
+                if not decoded_all:
+                    # The stream ended before the whole video was read; reruns must not replay a part.
+                    raise DiscardEntry()
+        cache.put(result_key, "".join(json.dumps(event.to_dict()) + "\n" for event in finals).encode("utf-8"))
 
     def toggle_recording(self):
         if not self.is_recording:
-            try:
-                self.is_recording = True
-                self.record_button.configure(text="Stop Recording")
-                style = ttk.Style()
-                style.configure("Recording.TButton", background="red")
-                self.record_button.configure(style="Recording.TButton")
-                
-                self.update_status("Recording in progress", 
-                                 f"Sample rate: {self.riva_args.sample_rate_hz}Hz")
-                self.progress_bar.grid()
-                self.progress_bar.start()
-                self.add_to_history("Microphone", "Recording", "Started")
-                threading.Thread(target=self.record_audio).start()
-            except Exception as e:
-                self.update_status("Recording failed", str(e), is_error=True)
-                self.is_recording = False
-                self.record_button.configure(text="Start Recording", style="")
-                self.progress_bar.stop()
-                self.progress_bar.grid_remove()
+            self.is_recording = True
+            self.record_button.configure(text="Stop Recording")
+            style = ttk.Style()
+            style.configure("Recording.TButton", background="red")
+            self.record_button.configure(style="Recording.TButton")
+
+            self.update_status("Recording in progress",
+                               f"Sample rate: {self.riva_args.sample_rate_hz}Hz")
+            self.progress_bar.configure(mode="indeterminate")
+            self.progress_bar.grid()
+            self.progress_bar.start()
+            session_id = self.add_to_history("Microphone", "Recording", "Starting")
+            self.transcript_panel.add_note("--- Microphone ---")
+            # Live audio cannot wait: the scheduler keeps a slot free for it however many videos are queued.
+            self.recording_job = self.scheduler.submit(
+                "Microphone", lambda job: self.record_audio(job, session_id), priority=PRIORITY_LIVE, live=True)
+            self.track_job(session_id, self.recording_job)
+            self.root.after(1000, self.show_latency)
         else:
-            self.is_recording = False
-            self.record_button.configure(text="Start Recording", style="")
-            self.progress_bar.stop()
-            self.progress_bar.grid_remove()
+            self.stop_recording()
             self.update_status("Recording stopped", "Ready")
-            self.add_to_history("Microphone", "Recording", "Stopped")
 
-    def record_audio(self):
-        with riva.client.audio_io.MicrophoneStream(
+    def stop_recording(self):
+        self.is_recording = False
+        if self.recording_job is not None:
+            # Closes the microphone; the job finishes once the last results are in.
+            self.recording_job.cancel()
+        self.record_button.configure(text="Start Recording", style="")
+        self.show_job_progress()
+
+    def show_latency(self):
+        # Polled on the Tk main loop while recording; the histograms are filled by the stream threads.
+        if not self.is_recording:
+            return
+        text = get_recorder().status_text()
+        if text:
+            self.detail_label.config(text=text)
+        self.root.after(1000, self.show_latency)
+
+    def record_audio(self, job, session_id):
+        # Runs as a live job on a worker thread: results go to the transcript panel's queue and the history store.
+        from resample import NativeMicrophoneStream
+        from vad import VoiceActivityGate
+
+        with NativeMicrophoneStream(
             self.riva_args.sample_rate_hz,
             self.riva_args.file_streaming_chunk,
             device=self.riva_args.input_device,
+            device_rate=self.riva_args.device_sample_rate_hz,
+            device_channels=self.riva_args.device_channel_count,
         ) as audio_chunk_iterator:
-            trans(self.riva_args, audio_chunk_iterator)
+            # Stopping the recording cancels the job, which ends the audio (at once if already stopped).
+            job.on_cancel(audio_chunk_iterator.close)
+            if not self.riva_args.vad_enabled:
+                trans(self.riva_args, audio_chunk_iterator, on_result=self.result_sink(session_id),
+                      on_reconnect=self.show_reconnect)
+                return
+            gate = VoiceActivityGate.from_args(self.riva_args, audio_chunk_iterator)
+            trans(self.riva_args, iter(gate), on_result=self.result_sink(session_id, gate=gate),
+                  on_reconnect=self.show_reconnect)
+            job.detail = f"VAD skipped {gate.saved_fraction:.0%} of audio"
+
+    def show_reconnect(self, error, delay):
+        # Called on the worker thread while the stream is being re-established; audio keeps buffering.
+        self.update_status("Reconnecting to server...", f"{error.code().name}: retrying in {delay:.1f}s")
 
     def create_labeled_entry(self, parent, row, label_text, tooltip_text, initial_value, validator=None):
         # Create container frame
@@ -228,7 +520,7 @@ Alt+F4: Exit application"""
         # Create and pack entry
         entry = ttk.Entry(frame)
         entry.grid(row=0, column=1, sticky="ew")
-        entry.insert(0, str(initial_value))
+        entry.insert(0, "" if initial_value is None else str(initial_value))
         
         # Add tooltip
         self.create_tooltip(label, tooltip_text)
@@ -288,6 +580,8 @@ Alt+F4: Exit application"""
             return False
 
     def open_settings(self):
+        # Pick up devices plugged in or removed since the last scan while the dialog is open
+        threading.Thread(target=self.refresh_devices, daemon=True).start()
         settings_window = tk.Toplevel(self.root)
         settings_window.title("Settings")
         settings_window.geometry("600x800")
@@ -305,6 +599,17 @@ Alt+F4: Exit application"""
                               justify="center")
         desc_label.pack(pady=5)
 
+        profile_frame = ttk.Frame(settings_window)
+        profile_frame.pack(fill="x", padx=20, pady=(0, 5))
+        ttk.Label(profile_frame, text="Profile:").pack(side="left", padx=(0, 5))
+        self.profile_combo = ttk.Combobox(profile_frame, values=self.profiles.names())
+        self.profile_combo.set(self.profiles.active)
+        self.profile_combo.pack(side="left", fill="x", expand=True)
+        self.profile_combo.bind("<<ComboboxSelected>>",
+                                lambda e: self.switch_profile(settings_window, self.profile_combo.get()))
+        self.create_tooltip(self.profile_combo,
+                            "Pick a saved profile, or type a new name to save these settings under it")
+
         # Create a notebook with custom style
         style = ttk.Style()
         style.configure("Settings.TNotebook", padding=10)
@@ -327,8 +632,6 @@ Alt+F4: Exit application"""
             server_frame, 1, "Server URL:",
             "The URL of your Riva server (e.g., localhost:50051)",
             self.riva_args.server)
-        self.server_url_entry.insert(0, self.riva_args.server)
-        self.server_url_entry.grid(row=0, column=1, padx=10, pady=10)
 
         self.ssl_cert_entry = self.create_labeled_entry(
             server_frame, 2, "SSL Certificate:",
@@ -342,8 +645,8 @@ Alt+F4: Exit application"""
             
         self.metadata_entry = self.create_labeled_entry(
             server_frame, 4, "Metadata:",
-            "Additional metadata to send with requests",
-            self.riva_args.metadata)
+            "Additional metadata to send with requests (key=value, comma-separated)",
+            ", ".join(f"{key}={value}" for key, value in self.riva_args.metadata))
 
         # General Settings Tab
         general_frame = ttk.Frame(notebook)
@@ -376,9 +679,8 @@ Alt+F4: Exit application"""
             
         self.input_device_entry = self.create_labeled_entry(
             general_frame, 5, "Input Device:",
-            "Audio input device ID (usually 0 for default)",
-            self.riva_args.input_device,
-            self.validate_int)
+            "Audio input device ID or name (empty for the system default device)",
+            "" if self.riva_args.input_device is None else self.riva_args.input_device)
             
         self.file_streaming_chunk_entry = self.create_labeled_entry(
             general_frame, 6, "Streaming Chunk Size:",
@@ -400,6 +702,36 @@ Alt+F4: Exit application"""
             "Exclude filler words and hesitations",
             self.riva_args.no_verbatim_transcripts)
 
+        ttk.Label(general_frame, text="Capture Format", 
+                 font=("Helvetica", 12, "bold")).grid(row=10, column=0, 
+                 columnspan=2, pady=(20,10), sticky="w", padx=10)
+
+        self.device_sample_rate_entry = self.create_labeled_entry(
+            general_frame, 11, "Device Sample Rate (Hz):",
+            "Rate to open the input device at, resampled to the sample rate above (0 for automatic)",
+            self.riva_args.device_sample_rate_hz,
+            self.validate_int)
+
+        self.device_channel_count_entry = self.create_labeled_entry(
+            general_frame, 12, "Device Channels:",
+            "Channels to open the input device with, mixed down to mono (0 for automatic)",
+            self.riva_args.device_channel_count,
+            self.validate_int)
+
+        ttk.Label(general_frame, text="Translation", 
+                 font=("Helvetica", 12, "bold")).grid(row=13, column=0, 
+                 columnspan=2, pady=(20,10), sticky="w", padx=10)
+
+        self.decoupled_translation_var = self.create_labeled_checkbox(
+            general_frame, 14, "Translate Finals Separately",
+            "Run recognition on its own and translate finished sentences in batches (far fewer translation calls)",
+            self.riva_args.translation_mode == "decoupled")
+
+        self.interim_translation_entry = self.create_labeled_entry(
+            general_frame, 15, "Interim Translation (ms):",
+            "With separate translation, minimum time between translations of partial results (0 for finals only)",
+            self.riva_args.interim_translation_ms,
+            self.validate_int)
         
 
         # Advanced Settings Tab
@@ -428,7 +760,7 @@ Alt+F4: Exit application"""
         self.boosted_lm_words_entry = self.create_labeled_entry(
             advanced_frame, 4, "Boosted Words:",
             "Words to boost in language model (comma-separated)",
-            self.riva_args.boosted_lm_words)
+            ", ".join(self.riva_args.boosted_lm_words))
             
         self.boosted_lm_score_entry = self.create_labeled_entry(
             advanced_frame, 5, "Boost Score:",
@@ -456,6 +788,12 @@ Alt+F4: Exit application"""
             "Advanced configuration options (JSON format)",
             self.riva_args.custom_configuration)
 
+        self.stream_rollover_entry = self.create_labeled_entry(
+            advanced_frame, 10, "Stream Rollover (s):",
+            "Move long sessions to a fresh stream after this much audio, at the next pause (0 to disable)",
+            self.riva_args.stream_rollover_seconds,
+            self.validate_float)
+
         # History Settings Tab
         history_frame = ttk.Frame(notebook)
         notebook.add(history_frame, text="History")
@@ -504,6 +842,15 @@ Alt+F4: Exit application"""
             self.riva_args.stop_threshold_eou,
             self.validate_float)
 
+        ttk.Label(history_frame, text="Client-side Voice Activity Gate", 
+                 font=("Helvetica", 12, "bold")).grid(row=8, column=0, 
+                 columnspan=2, pady=(20,10), sticky="w", padx=10)
+
+        self.vad_enabled_var = self.create_labeled_checkbox(
+            history_frame, 9, "Skip Silence Before Sending",
+            "Do not send silent audio to the server (uses the start/stop thresholds and histories above)",
+            self.riva_args.vad_enabled)
+
         # Save/Cancel Buttons
         button_frame = ttk.Frame(settings_window)
         button_frame.pack(pady=20, padx=10, fill="x")
@@ -537,6 +884,24 @@ Alt+F4: Exit application"""
         if not is_error:
             messagebox.after(2000, messagebox.destroy)
 
+    def switch_profile(self, settings_window, name):
+        self.riva_args = self.profiles.load(name)
+        self.profiles.set_active(name)
+        # Reopen the window so every field shows the loaded profile
+        settings_window.destroy()
+        self.open_settings()
+
+    def find_input_device(self, pattern):
+        if not pattern:
+            return None
+        from device_registry import get_registry
+
+        device = get_registry().find(pattern)
+        if device is None:
+            raise ValueError(f"no input device matches {pattern!r}")
+        # Kept by name: indices change when devices are plugged in or removed.
+        return device.name
+
     def save_settings(self, settings_window):
         try:
             # Server settings
@@ -547,22 +912,28 @@ Alt+F4: Exit application"""
             
             # General settings
             self.riva_args.set_model_name(self.model_name_entry.get())
-            self.riva_args.set_input_device(int(self.input_device_entry.get()))
+            self.riva_args.set_input_device(self.find_input_device(self.input_device_entry.get().strip()))
             self.riva_args.set_file_streaming_chunk(int(self.file_streaming_chunk_entry.get()))
             self.riva_args.set_automatic_punctuation(self.automatic_punctuation_var.get())
             self.riva_args.set_no_verbatim_transcripts(self.no_verbatim_transcripts_var.get())
             self.riva_args.set_sample_rate_hz(int(self.sample_rate_entry.get()))
+            self.riva_args.set_device_sample_rate_hz(int(self.device_sample_rate_entry.get()))
+            self.riva_args.set_device_channel_count(int(self.device_channel_count_entry.get()))
             self.riva_args.set_asr_language_code(self.language_code_entry.get())
             self.riva_args.set_target_language_code(self.target_language_code_entry.get())
+            self.riva_args.set_translation_mode("decoupled" if self.decoupled_translation_var.get() else "s2t")
+            self.riva_args.set_interim_translation_ms(int(self.interim_translation_entry.get()))
             
             # Advanced settings
-            self.riva_args.set_max_alternatives(int(self.max_alternatives_entry.get()))
+            if self.max_alternatives_entry.get().strip():
+                self.riva_args.set_max_alternatives(int(self.max_alternatives_entry.get()))
             self.riva_args.set_profanity_filter(self.profanity_filter_var.get())
             self.riva_args.set_boosted_lm_words(self.boosted_lm_words_entry.get())
             self.riva_args.set_boosted_lm_score(float(self.boosted_lm_score_entry.get()))
             self.riva_args.set_speaker_diarization(self.speaker_diarization_var.get())
             self.riva_args.set_diarization_max_speakers(int(self.diarization_max_speakers_entry.get()))
             self.riva_args.set_custom_configuration(self.custom_configuration_entry.get())
+            self.riva_args.set_stream_rollover_seconds(float(self.stream_rollover_entry.get()))
             
             # History settings
             self.riva_args.set_start_history(int(self.start_history_entry.get()))
@@ -571,6 +942,11 @@ Alt+F4: Exit application"""
             self.riva_args.set_stop_threshold(float(self.stop_threshold_entry.get()))
             self.riva_args.set_stop_history_eou(int(self.stop_history_eou_entry.get()))
             self.riva_args.set_stop_threshold_eou(float(self.stop_threshold_eou_entry.get()))
+            self.riva_args.set_vad_enabled(self.vad_enabled_var.get())
+            from channelpool import get_pool
+
+            get_pool().warm_up_async(self.riva_args)
+            self.profiles.save(self.profile_combo.get(), self.riva_args)
             
             self.show_message(settings_window, "Success", 
                             "Settings saved successfully!")
@@ -585,3 +961,4 @@ if __name__ == "__main__":
     root = tk.Tk()
     app = AudioConverterApp(root)
     root.mainloop()
+    app.history_store.close()
@@ -0,0 +1,160 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from results import ResultEvent
+
+DEFAULT_HISTORY_PATH = os.path.join(os.path.expanduser("~"), ".riva_project", "history.db")
+
+# (id, name, kind, status, started)
+SessionRow = Tuple[int, str, str, str, float]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    started REAL NOT NULL,
+    finished REAL
+);
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY,
+    session_id INTEGER NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    source TEXT NOT NULL DEFAULT '',
+    audio_seconds REAL NOT NULL DEFAULT 0,
+    text TEXT NOT NULL DEFAULT '',
+    translation TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS segments_session ON segments(session_id);
+"""
+
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5(
+    text, translation, content='segments', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS segments_fts_insert AFTER INSERT ON segments BEGIN
+    INSERT INTO segments_fts(rowid, text, translation) VALUES (new.id, new.text, new.translation);
+END;
+CREATE TRIGGER IF NOT EXISTS segments_fts_delete AFTER DELETE ON segments BEGIN
+    INSERT INTO segments_fts(segments_fts, rowid, text, translation)
+    VALUES ('delete', old.id, old.text, old.translation);
+END;
+"""
+
+
+class HistoryStore:
+    """On-disk history of transcription sessions and their final transcripts.
+
+    Sessions are paged newest first by id (keyset pagination), so a page costs the same with
+    a hundred sessions or a million. Transcripts are searched with SQLite FTS5 when the
+    SQLite build has it and with LIKE otherwise. Safe to use from several threads.
+    """
+
+    def __init__(self, path: str = DEFAULT_HISTORY_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA foreign_keys=ON")
+        self._db.executescript(_SCHEMA)
+        try:
+            self._db.executescript(_FTS_SCHEMA)
+            self.full_text = True
+        except sqlite3.OperationalError:
+            self.full_text = False
+        self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def add_session(self, name: str, kind: str, status: str) -> SessionRow:
+        started = time.time()
+        with self._lock, self._db:
+            cursor = self._db.execute(
+                "INSERT INTO sessions (name, kind, status, started) VALUES (?, ?, ?, ?)", (name, kind, status, started)
+            )
+        return cursor.lastrowid, name, kind, status, started
+
+    def update_session(self, session_id: int, status: str, finished: bool = False):
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE sessions SET status = ?, finished = COALESCE(?, finished) WHERE id = ?",
+                (status, time.time() if finished else None, session_id),
+            )
+
+    def finish_abandoned(self, status: str) -> int:
+        """Give sessions a previous run left unfinished `status`; returns how many there were."""
+        with self._lock, self._db:
+            cursor = self._db.execute(
+                "UPDATE sessions SET status = ?, finished = ? WHERE finished IS NULL", (status, time.time())
+            )
+        return cursor.rowcount
+
+    def add_segment(self, session_id: int, event: ResultEvent):
+        """Store a final result of a session."""
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO segments (session_id, source, audio_seconds, text, translation) VALUES (?, ?, ?, ?, ?)",
+                (session_id, event.source, event.audio_processed, event.text.strip(), event.translation.strip()),
+            )
+
+    def transcript(self, session_id: int) -> List[str]:
+        """Return the final results of a session in order, translation preferred."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT source, text, translation FROM segments WHERE session_id = ? ORDER BY id", (session_id,)
+            ).fetchall()
+        return [f"[{source}] {translation or text}" if source else translation or text
+                for source, text, translation in rows]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def page(
+            self,
+            query: str = "",
+            before_id: Optional[int] = None,
+            after_id: Optional[int] = None,
+            limit: int = 100,
+    ) -> List[SessionRow]:
+        """Return up to `limit` sessions, newest first.
+
+        With `before_id`, the sessions just older than it; with `after_id`, the sessions just
+        newer than it. A non-empty `query` keeps only sessions whose name or transcript
+        matches it.
+        """
+        conditions, params = [], []
+        if before_id is not None:
+            conditions.append("id < ?")
+            params.append(before_id)
+        if after_id is not None:
+            conditions.append("id > ?")
+            params.append(after_id)
+        if query.strip():
+            condition, query_params = self._search_condition(query)
+            conditions.append(condition)
+            params.extend(query_params)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        order = "ASC" if after_id is not None else "DESC"
+        sql = f"SELECT id, name, kind, status, started FROM sessions {where} ORDER BY id {order} LIMIT ?"
+        with self._lock:
+            rows = self._db.execute(sql, (*params, limit)).fetchall()
+        return rows[::-1] if after_id is not None else rows
+
+    def _search_condition(self, query: str) -> Tuple[str, list]:
+        like = f"%{query.strip()}%"
+        if self.full_text:
+            # Quote every word so user input cannot form FTS syntax; the last word matches as a prefix.
+            terms = " ".join('"{}"'.format(word.replace('"', '""')) for word in query.split()) + "*"
+            return ("(name LIKE ? OR id IN (SELECT session_id FROM segments WHERE id IN "
+                    "(SELECT rowid FROM segments_fts WHERE segments_fts MATCH ?)))"), [like, terms]
+        return ("(name LIKE ? OR id IN (SELECT session_id FROM segments "
+                "WHERE text LIKE ? OR translation LIKE ?))"), [like, like, like]
@@ -0,0 +1,146 @@
+import time
+from tkinter import ttk
+from typing import Callable, List, Optional
+
+from history_store import HistoryStore, SessionRow
+
+
+class HistoryView(ttk.Frame):
+    """Session history backed by a HistoryStore, with a search box.
+
+    The Treeview only holds a window of at most `max_rows` sessions. Scrolling near either
+    end of the window loads the next `page_size` sessions from the store and drops the same
+    number from the other end, so the widget stays small however long the history is.
+    Double-clicking a session passes its id to `on_open`.
+    """
+
+    def __init__(
+            self,
+            parent,
+            store: HistoryStore,
+            on_open: Optional[Callable[[int], None]] = None,
+            page_size: int = 100,
+            max_rows: int = 500,
+    ):
+        super().__init__(parent)
+        self.store = store
+        self._on_open = on_open
+        self._page_size = page_size
+        self._max_rows = max(max_rows, 2 * page_size)
+        self._query = ""
+        self._more_above = False
+        self._more_below = False
+        self._loading = False
+
+        search_frame = ttk.Frame(self)
+        search_frame.pack(fill="x", pady=(0, 5))
+        ttk.Label(search_frame, text="Search:").pack(side="left", padx=(0, 5))
+        self.search_entry = ttk.Entry(search_frame)
+        self.search_entry.pack(side="left", fill="x", expand=True)
+        self.search_entry.bind("<Return>", lambda e: self.search(self.search_entry.get()))
+        ttk.Button(search_frame, text="Clear", command=self._clear_search).pack(side="left", padx=5)
+
+        tree_frame = ttk.Frame(self)
+        tree_frame.pack(fill="both", expand=True)
+        self.tree = ttk.Treeview(tree_frame, columns=("File", "Type", "Status", "Time"), show="headings")
+        for column in ("File", "Type", "Status", "Time"):
+            self.tree.heading(column, text=column)
+        self._scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self._on_scroll)
+        self.tree.pack(side="left", fill="both", expand=True)
+        self._scrollbar.pack(side="right", fill="y")
+        self.tree.bind("<Double-1>", self._open_selected)
+
+        self.reload()
+
+    @staticmethod
+    def _values(row: SessionRow):
+        _, name, kind, status, started = row
+        return name, kind, status, time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(started))
+
+    def _insert(self, rows: List[SessionRow], index):
+        for row in rows:
+            self.tree.insert("", index, iid=str(row[0]), values=self._values(row))
+            if index != "end":
+                index += 1
+
+    def reload(self):
+        """Show the newest sessions matching the current search."""
+        self.tree.delete(*self.tree.get_children())
+        rows = self.store.page(self._query, limit=self._page_size)
+        self._insert(rows, "end")
+        self._more_above = False
+        self._more_below = len(rows) == self._page_size
+
+    def search(self, query: str):
+        self._query = query.strip()
+        self.reload()
+
+    def _clear_search(self):
+        self.search_entry.delete(0, "end")
+        self.search("")
+
+    def session_added(self, row: SessionRow):
+        """Show a new session if the newest sessions are in view."""
+        if self._more_above or self._query:
+            return
+        self._insert([row], 0)
+        children = self.tree.get_children()
+        if len(children) > self._max_rows:
+            self.tree.delete(*children[self._max_rows:])
+            self._more_below = True
+
+    def session_updated(self, session_id: int, status: str):
+        iid = str(session_id)
+        if self.tree.exists(iid):
+            self.tree.set(iid, "Status", status)
+
+    def selected_ids(self) -> List[int]:
+        return [int(iid) for iid in self.tree.selection()]
+
+    def _on_scroll(self, first, last):
+        self._scrollbar.set(first, last)
+        if self._loading:
+            return
+        if float(last) > 0.95 and self._more_below:
+            self._loading = True
+            self.after_idle(self._load_below)
+        elif float(first) < 0.05 and self._more_above:
+            self._loading = True
+            self.after_idle(self._load_above)
+
+    def _load_below(self):
+        children = self.tree.get_children()
+        rows = self.store.page(self._query, before_id=int(children[-1]), limit=self._page_size) if children else []
+        self._more_below = len(rows) == self._page_size
+        self._insert(rows, "end")
+        children = self.tree.get_children()
+        excess = len(children) - self._max_rows
+        if excess > 0:
+            # Keep the row at the top of the view in place while the rows above it are dropped.
+            top = self.tree.identify_row(0)
+            self.tree.delete(*children[:excess])
+            self._more_above = True
+            if top and self.tree.exists(top):
+                self.tree.see(top)
+        self._loading = False
+
+    def _load_above(self):
+        children = self.tree.get_children()
+        rows = self.store.page(self._query, after_id=int(children[0]), limit=self._page_size) if children else []
+        self._more_above = len(rows) == self._page_size
+        top = children[0] if children else None
+        self._insert(rows, 0)
+        children = self.tree.get_children()
+        excess = len(children) - self._max_rows
+        if excess > 0:
+            self.tree.delete(*children[-excess:])
+            self._more_below = True
+        if top:
+            self.tree.see(top)
+        self._loading = False
+
+    def _open_selected(self, event):
+        iid = self.tree.identify_row(event.y)
+        if iid and self._on_open is not None:
+            self._on_open(int(iid))
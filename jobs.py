@@ -0,0 +1,224 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+# Lower runs first. Live recordings must never wait behind a queue of batch work.
+PRIORITY_LIVE = 0
+PRIORITY_BATCH = 10
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Raised inside a job's work once the job has been cancelled."""
+
+
+class Job:
+    """One unit of background work and its state, as seen by the scheduler and the UI.
+
+    The work function receives the job and should call `report` with its progress and
+    `check_cancelled` (or watch `cancelled`) regularly. Work that blocks, e.g. on a
+    subprocess, can register a callback with `on_cancel` that unblocks it.
+    """
+
+    def __init__(self, job_id: int, name: str, run: Callable[["Job"], None], priority: int, live: bool,
+                 scheduler: "JobScheduler"):
+        self.id = job_id
+        self.name = name
+        self.priority = priority
+        self.live = live
+        self.state = QUEUED
+        self.progress: Optional[float] = None  # fraction done, None while unknown
+        self._reported: Optional[float] = None  # progress listeners last heard of
+        self.detail = ""  # short note for the UI, e.g. why it failed
+        self.error: Optional[Exception] = None
+        self.submitted = time.time()
+        self._run = run
+        self._scheduler = scheduler
+        self._cancelled = threading.Event()
+        self._cancel_callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"Job({self.id}, {self.name!r}, {self.state})"
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    @property
+    def finished(self) -> bool:
+        return self.state in FINISHED_STATES
+
+    def cancel(self):
+        """Cancel the job: a queued job never starts, a running one is asked to stop."""
+        self._scheduler.cancel(self)
+
+    def on_cancel(self, callback: Callable[[], None]):
+        """Call `callback` when the job is cancelled, at once if it already is."""
+        with self._lock:
+            if not self.cancelled:
+                self._cancel_callbacks.append(callback)
+                return
+        callback()
+
+    def _request_cancel(self):
+        with self._lock:
+            self._cancelled.set()
+            callbacks, self._cancel_callbacks = self._cancel_callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise JobCancelled(self.name)
+
+    def report(self, progress: Optional[float], detail: Optional[str] = None):
+        """Set the fraction done; listeners hear of it when it moved by at least a percent."""
+        if progress is not None:
+            progress = min(max(progress, 0.0), 1.0)
+        previous = self._reported
+        self.progress = progress
+        if detail is not None:
+            self.detail = detail
+        if progress is None or previous is None:
+            moved = progress is not previous
+        else:
+            moved = abs(progress - previous) >= 0.01 or (progress == 1.0 and previous < 1.0)
+        if moved or detail is not None:
+            self._reported = progress
+            self._scheduler._notify(self)
+
+
+JobListener = Callable[[Job], None]
+
+
+class JobScheduler:
+    """Runs jobs on a bounded set of worker threads, most urgent first.
+
+    At most `max_workers` jobs run at once. `reserved_live` of those slots are kept for live
+    jobs, so a long queue of batch work can saturate the machine and a recording still
+    starts at once. Queued jobs run by priority, then in submission order. `on_change(job)`
+    is called from whichever thread changed the job: when it is queued, starts, reports
+    progress and finishes.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, reserved_live: int = 1,
+                 on_change: Optional[JobListener] = None):
+        self.max_workers = max(max_workers or os.cpu_count() or 2, reserved_live + 1)
+        self.reserved_live = reserved_live
+        self.on_change = on_change
+        self._queue: List[tuple] = []  # (priority, sequence, job)
+        self._sequence = itertools.count()
+        self._ids = itertools.count(1)
+        self._jobs: Dict[int, Job] = {}
+        self._running_batch = 0
+        self._running_live = 0
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def submit(self, name: str, run: Callable[[Job], None], priority: int = PRIORITY_BATCH,
+               live: bool = False) -> Job:
+        """Queue `run(job)` and return the job."""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("the scheduler is shut down")
+            job = Job(next(self._ids), name, run, priority, live, self)
+            self._jobs[job.id] = job
+            heapq.heappush(self._queue, (priority, next(self._sequence), job))
+        self._notify(job)
+        self._dispatch()
+        return job
+
+    def get(self, job_id: int) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> List[Job]:
+        """Return the jobs that have not finished, in submission order."""
+        with self._lock:
+            return [job for job in self._jobs.values() if not job.finished]
+
+    def cancel(self, job: Job):
+        with self._lock:
+            if job.finished:
+                return
+            queued = job.state == QUEUED
+            if queued:
+                # Left in the heap; _dispatch skips finished jobs.
+                job.state = CANCELLED
+                self._jobs.pop(job.id, None)
+        job._request_cancel()
+        if queued:
+            self._notify(job)
+
+    def shutdown(self, cancel: bool = True):
+        """Stop starting jobs and, with `cancel`, cancel every job still queued or running."""
+        with self._lock:
+            self._closed = True
+            jobs = list(self._jobs.values())
+        if cancel:
+            for job in jobs:
+                self.cancel(job)
+
+    def _has_slot(self, job: Job) -> bool:
+        running = self._running_batch + self._running_live
+        if running >= self.max_workers:
+            return False
+        # Live jobs may use any free slot; batch jobs leave the reserved ones free.
+        return job.live or self._running_batch < self.max_workers - self.reserved_live
+
+    def _dispatch(self):
+        started = []
+        with self._lock:
+            while self._queue and not self._closed:
+                job = self._queue[0][2]
+                if job.finished:
+                    heapq.heappop(self._queue)
+                    continue
+                if not self._has_slot(job):
+                    # The most urgent job waits for a slot; nothing behind it may overtake it.
+                    break
+                heapq.heappop(self._queue)
+                job.state = RUNNING
+                if job.live:
+                    self._running_live += 1
+                else:
+                    self._running_batch += 1
+                started.append(job)
+        for job in started:
+            self._notify(job)
+            threading.Thread(target=self._work, args=(job,), name=f"job-{job.id}", daemon=True).start()
+
+    def _work(self, job: Job):
+        try:
+            job._run(job)
+            state = CANCELLED if job.cancelled else DONE
+        except JobCancelled:
+            state = CANCELLED
+        except Exception as e:
+            job.error = e
+            state = CANCELLED if job.cancelled else FAILED
+        with self._lock:
+            job.state = state
+            if state == DONE:
+                job.progress = 1.0
+            if job.live:
+                self._running_live -= 1
+            else:
+                self._running_batch -= 1
+            self._jobs.pop(job.id, None)
+        self._notify(job)
+        self._dispatch()
+
+    def _notify(self, job: Job):
+        if self.on_change is not None:
+            self.on_change(job)
@@ -0,0 +1,361 @@
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import threading
+import time
+import wave
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import riva.client
+
+from channelpool import get_pool
+from resample import StreamingResampler
+from trans import TRANSLATION_MODES, RivaArguments, stream_results, stream_transcripts
+from translation import get_translator
+
+MODES = ("streaming", "websocket", "offline")
+
+
+def synthetic_pcm(seconds: float, sample_rate_hz: int) -> bytes:
+    """Return 16-bit mono speech-like audio: noise bursts of 0.3-2 s separated by short pauses."""
+    rng = np.random.default_rng(0)
+    samples = np.zeros(int(seconds * sample_rate_hz), dtype=np.float32)
+    position = 0
+    while position < len(samples):
+        burst = int(rng.uniform(0.3, 2.0) * sample_rate_hz)
+        t = np.arange(min(burst, len(samples) - position)) / sample_rate_hz
+        samples[position:position + len(t)] = (
+            3000 * np.sin(2 * np.pi * rng.uniform(120, 250) * t) + rng.normal(0, 800, len(t))
+        )
+        position += burst + int(rng.uniform(0.2, 0.8) * sample_rate_hz)
+    return np.clip(samples, -32768, 32767).astype(np.int16).tobytes()
+
+
+def wav_pcm(path: str, sample_rate_hz: int) -> bytes:
+    """Read a 16-bit WAV file as mono PCM at `sample_rate_hz`."""
+    with wave.open(path, 'rb') as wf:
+        if wf.getsampwidth() != 2:
+            raise ValueError(f"{path} is not 16-bit PCM.")
+        resampler = StreamingResampler(wf.getframerate(), sample_rate_hz, wf.getnchannels())
+        return resampler.process(wf.readframes(wf.getnframes())) + resampler.flush()
+
+
+def percentiles(values: List[float]) -> Optional[Dict[str, float]]:
+    if not values:
+        return None
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "count": len(values),
+        "mean": round(float(np.mean(values)), 3),
+        "p50": round(float(p50), 3),
+        "p95": round(float(p95), 3),
+        "p99": round(float(p99), 3),
+        "max": round(float(np.max(values)), 3),
+    }
+
+
+class SessionStats:
+    """Timing of one load-test session. All times are time.monotonic() seconds."""
+
+    def __init__(self):
+        self.started_at = None
+        self.finished_at = None
+        self.audio_seconds = 0.0
+        self.send_overhead_ms: List[float] = []
+        self.first_interim_ms = None
+        self.final_ms: List[float] = []
+        self.error = None
+        # Audio sent so far (ms) and when, to find when the audio behind a result was sent.
+        self._sent_audio_ms: List[float] = []
+        self._sent_at: List[float] = []
+
+    def sent(self, audio_ms: float, at: float):
+        self._sent_audio_ms.append(audio_ms)
+        self._sent_at.append(at)
+
+    def result(self, is_final: bool, audio_processed: float, received_at: float):
+        if not is_final and self.first_interim_ms is None:
+            self.first_interim_ms = (received_at - self.started_at) * 1000
+        if is_final and self._sent_at:
+            index = min(bisect_left(self._sent_audio_ms, audio_processed * 1000 - 1e-6), len(self._sent_at) - 1)
+            self.final_ms.append((received_at - self._sent_at[index]) * 1000)
+
+
+class PacedChunks:
+    """Iterates `pcm` in chunks at `speed` times real time (0 sends as fast as possible).
+
+    The time the consumer spends between taking a chunk and asking for the next one is
+    recorded as the per-chunk send overhead.
+    """
+
+    def __init__(self, pcm: bytes, chunk_bytes: int, sample_rate_hz: int, speed: float, stats: SessionStats):
+        self._pcm = pcm
+        self._chunk_bytes = chunk_bytes
+        self._bytes_per_ms = sample_rate_hz * 2 / 1000.0
+        self._speed = speed
+        self._stats = stats
+
+    def __iter__(self) -> Iterator[bytes]:
+        stats = self._stats
+        stats.started_at = time.monotonic()
+        for offset in range(0, len(self._pcm), self._chunk_bytes):
+            chunk = self._pcm[offset:offset + self._chunk_bytes]
+            audio_ms = (offset + len(chunk)) / self._bytes_per_ms
+            if self._speed > 0:
+                delay = stats.started_at + offset / self._bytes_per_ms / 1000 / self._speed - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            handed_over = time.monotonic()
+            stats.sent(audio_ms, handed_over)
+            yield chunk
+            stats.send_overhead_ms.append((time.monotonic() - handed_over) * 1000)
+        stats.audio_seconds = len(self._pcm) / self._bytes_per_ms / 1000
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        return sock.getsockname()[1]
+
+
+def start_fake_server(delay_ms: float, offline_rtf: float) -> Tuple[str, subprocess.Popen]:
+    """Start fake_riva_server.py in a child process, so its CPU time is not counted as client load."""
+    address = f"localhost:{_free_port()}"
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_riva_server.py"),
+         "--address", address, "--delay-ms", str(delay_ms), "--offline-rtf", str(offline_rtf)],
+        stdout=subprocess.PIPE,
+    )
+    process.stdout.readline()  # the "listening" line
+    return address, process
+
+
+class LoadTest:
+    """Runs `sessions` concurrent transcription sessions against a Riva (or fake Riva) server."""
+
+    def __init__(self, args: RivaArguments, pcm: bytes, sessions: int, mode: str = "streaming",
+                 speed: float = 1.0, ramp_seconds: float = 0.0, translate: bool = False):
+        self.args = args
+        self.pcm = pcm
+        self.sessions = sessions
+        self.mode = mode
+        self.speed = speed
+        self.ramp_seconds = ramp_seconds
+        self.translate = translate
+        self.chunk_bytes = args.file_streaming_chunk * 2
+
+    def _stagger(self, index: int):
+        if self.ramp_seconds > 0:
+            time.sleep(self.ramp_seconds * index / self.sessions)
+
+    def _streaming_session(self, index: int) -> SessionStats:
+        stats = SessionStats()
+        self._stagger(index)
+        recognize = stream_results if self.translate else stream_transcripts
+        chunks = PacedChunks(self.pcm, self.chunk_bytes, self.args.sample_rate_hz, self.speed, stats)
+        try:
+            for event in recognize(self.args, iter(chunks)):
+                stats.result(event.is_final, event.audio_processed, event.received_at)
+        except Exception as e:
+            stats.error = str(e)
+        stats.finished_at = time.monotonic()
+        return stats
+
+    def _offline_session(self, index: int) -> SessionStats:
+        stats = SessionStats()
+        self._stagger(index)
+        config = riva.client.RecognitionConfig(
+            encoding=riva.client.AudioEncoding.LINEAR_PCM,
+            language_code=self.args.asr_language_code,
+            sample_rate_hertz=self.args.sample_rate_hz,
+            audio_channel_count=1,
+            max_alternatives=1,
+        )
+        asr_service = get_pool().get_asr_service(self.args)
+        stats.started_at = time.monotonic()
+        stats.audio_seconds = len(self.pcm) / 2 / self.args.sample_rate_hz
+        stats.sent(stats.audio_seconds * 1000, stats.started_at)
+        try:
+            asr_service.offline_recognize(self.pcm, config)
+            stats.result(True, stats.audio_seconds, time.monotonic())
+        except Exception as e:
+            stats.error = str(e)
+        stats.finished_at = time.monotonic()
+        return stats
+
+    async def _websocket_session(self, index: int, url: str) -> SessionStats:
+        import websockets
+
+        stats = SessionStats()
+        await asyncio.sleep(self.ramp_seconds * index / self.sessions if self.ramp_seconds > 0 else 0)
+        bytes_per_ms = self.args.sample_rate_hz * 2 / 1000.0
+        try:
+            async with websockets.connect(url, max_size=None) as websocket:
+                async def receive():
+                    async for message in websocket:
+                        event = json.loads(message)
+                        if "error" in event:
+                            raise RuntimeError(event["error"])
+                        stats.result(event["is_final"], event["audio_processed"], time.monotonic())
+
+                receiver = asyncio.create_task(receive())
+                stats.started_at = time.monotonic()
+                for offset in range(0, len(self.pcm), self.chunk_bytes):
+                    chunk = self.pcm[offset:offset + self.chunk_bytes]
+                    if self.speed > 0:
+                        delay = stats.started_at + offset / bytes_per_ms / 1000 / self.speed - time.monotonic()
+                        if delay > 0:
+                            await asyncio.sleep(delay)
+                    sent_at = time.monotonic()
+                    stats.sent((offset + len(chunk)) / bytes_per_ms, sent_at)
+                    await websocket.send(chunk)
+                    stats.send_overhead_ms.append((time.monotonic() - sent_at) * 1000)
+                await websocket.send(b"")
+                stats.audio_seconds = len(self.pcm) / bytes_per_ms / 1000
+                await receiver
+        except Exception as e:
+            stats.error = str(e)
+        stats.finished_at = time.monotonic()
+        return stats
+
+    def _run_websocket(self) -> List[SessionStats]:
+        import uvicorn
+
+        from gateway import TranscriptionGateway, create_app
+
+        gateway = TranscriptionGateway(self.args, translate=self.translate, max_sessions=self.sessions,
+                                       max_sessions_per_client=self.sessions)
+        port = _free_port()
+        server = uvicorn.Server(uvicorn.Config(create_app(gateway), host="localhost", port=port, log_level="warning"))
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        while not server.started:
+            time.sleep(0.05)
+
+        async def run_all():
+            url = f"ws://localhost:{port}/transcribe"
+            return await asyncio.gather(*(self._websocket_session(i, url) for i in range(self.sessions)))
+
+        try:
+            return asyncio.run(run_all())
+        finally:
+            server.should_exit = True
+            thread.join()
+
+    def run(self) -> dict:
+        """Run every session to completion and return the summary report."""
+        get_pool().warm_up(self.args)
+        translator = get_translator(self.args) \
+            if self.translate and self.args.translation_mode == "decoupled" else None
+        nmt_before = translator.stats() if translator is not None else None
+        cpu_before = time.process_time()
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        started = time.monotonic()
+        if self.mode == "websocket":
+            results = self._run_websocket()
+        else:
+            session = self._offline_session if self.mode == "offline" else self._streaming_session
+            with ThreadPoolExecutor(max_workers=self.sessions, thread_name_prefix="load") as executor:
+                results = list(executor.map(session, range(self.sessions)))
+        wall = time.monotonic() - started
+        cpu = time.process_time() - cpu_before
+        # ru_maxrss is in kilobytes on Linux; the peak grows only if the sessions needed more.
+        rss_growth_mb = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024
+        audio_seconds = sum(s.audio_seconds for s in results if s.error is None)
+        nmt = None
+        if translator is not None:
+            # The translator is shared between runs, so report this run's share of its counters.
+            stats = {name: value - nmt_before[name] for name, value in translator.stats().items()}
+            nmt = {**stats, "requests_per_audio_minute": round(60 * stats["requests"] / max(audio_seconds, 1e-9), 2)}
+        return {
+            "mode": self.mode,
+            "sessions": self.sessions,
+            "translate": self.translate,
+            "translation_mode": self.args.translation_mode if self.translate else None,
+            "nmt": nmt,
+            "speed": self.speed,
+            "audio_seconds_per_session": round(len(self.pcm) / 2 / self.args.sample_rate_hz, 3),
+            "chunk_frames": self.args.file_streaming_chunk,
+            "wall_seconds": round(wall, 3),
+            "throughput_audio_seconds_per_second": round(audio_seconds / wall, 3),
+            "errors": [s.error for s in results if s.error is not None],
+            "send_overhead_ms": percentiles([v for s in results for v in s.send_overhead_ms]),
+            "first_interim_ms": percentiles([s.first_interim_ms for s in results if s.first_interim_ms is not None]),
+            "final_ms": percentiles([v for s in results for v in s.final_ms]),
+            "session_seconds": percentiles([s.finished_at - s.started_at for s in results if s.started_at]),
+            "cpu_seconds_per_session": round(cpu / self.sessions, 4),
+            "cpu_percent_per_session": round(100 * cpu / wall / self.sessions, 3),
+            "peak_rss_growth_mb_per_session": round(rss_growth_mb / self.sessions, 3),
+        }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Load test and latency benchmark for the streaming, websocket and offline transcription paths",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--mode", choices=MODES, default="streaming", help="Path to exercise.")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 8, 32],
+                        help="Concurrent session counts; one run per value.")
+    parser.add_argument("--server", default=None,
+                        help="URI of a Riva server. Without it a local fake server is started.")
+    parser.add_argument("--wav", default=None, help="16-bit WAV file to stream instead of synthetic audio.")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Length of the synthetic audio.")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Send audio at this multiple of real time; 0 sends as fast as possible.")
+    parser.add_argument("--ramp-seconds", type=float, default=0.0, help="Spread session starts over this time.")
+    parser.add_argument("--sample-rate-hz", type=int, default=16000, help="Sample rate of the streamed audio.")
+    parser.add_argument("--chunk-frames", type=int, default=1600, help="Frames per streamed chunk.")
+    parser.add_argument("--translate", action="store_true", help="Use speech-to-text translation instead of ASR.")
+    parser.add_argument("--translation-mode", choices=TRANSLATION_MODES, default="s2t",
+                        help="Translation pipeline used with --translate.")
+    parser.add_argument("--fake-delay-ms", type=float, default=20.0, help="Response delay of the fake server.")
+    parser.add_argument("--fake-offline-rtf", type=float, default=0.01,
+                        help="Offline processing seconds per audio second of the fake server.")
+    parser.add_argument("--output", default=None, help="Write the JSON report here instead of stdout.")
+    return parser.parse_args()
+
+
+def main() -> None:
+    cli = parse_args()
+    fake_server = None
+    server = cli.server
+    if server is None:
+        server, fake_server = start_fake_server(cli.fake_delay_ms, cli.fake_offline_rtf)
+    try:
+        args = RivaArguments()
+        args.set_server(server)
+        args.set_sample_rate_hz(cli.sample_rate_hz)
+        args.set_file_streaming_chunk(cli.chunk_frames)
+        args.set_translation_mode(cli.translation_mode)
+        pcm = wav_pcm(cli.wav, cli.sample_rate_hz) if cli.wav else synthetic_pcm(cli.seconds, cli.sample_rate_hz)
+        runs = []
+        for sessions in cli.sessions:
+            report = LoadTest(args, pcm, sessions, cli.mode, cli.speed, cli.ramp_seconds, cli.translate).run()
+            print(f"{cli.mode} x{sessions}: {report['throughput_audio_seconds_per_second']} audio s/s, "
+                  f"final p95 {(report['final_ms'] or {}).get('p95')} ms, {len(report['errors'])} errors",
+                  file=sys.stderr)
+            runs.append(report)
+    finally:
+        if fake_server is not None:
+            fake_server.terminate()
+            fake_server.wait()
+    output = {"server": "fake" if cli.server is None else cli.server, "created": time.time(), "runs": runs}
+    if cli.output:
+        with open(cli.output, "w", encoding="utf-8") as fh:
+            json.dump(output, fh, indent=2)
+    else:
+        json.dump(output, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+import json
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Union
+
+from results import ResultEvent
+
+# Pipeline stages whose latency is recorded, in milliseconds.
+CAPTURE_TO_SEND = "capture_to_send"  # audio captured or received until handed to the gRPC stream
+SEND_TO_INTERIM = "send_to_interim"  # audio handed to the stream until an interim result covers it
+SEND_TO_FINAL = "send_to_final"  # audio handed to the stream until a final result covers it
+STAGES = (CAPTURE_TO_SEND, SEND_TO_INTERIM, SEND_TO_FINAL)
+
+
+class StampedChunk(bytes):
+    """An audio chunk that remembers when the oldest audio in it was captured (time.monotonic())."""
+
+    def __new__(cls, data: bytes, captured_at: float):
+        chunk = super().__new__(cls, data)
+        chunk.captured_at = captured_at
+        return chunk
+
+
+class LatencyHistogram:
+    """Counts latencies in logarithmic buckets, four per doubling from 0.25 ms to about 65 s.
+
+    Recording a value is a logarithm and a counter increment, so it is cheap enough for
+    every chunk and result. Quantiles are estimated to within one bucket (about 19%).
+    """
+
+    BUCKETS_PER_DOUBLING = 4
+    MIN_EXPONENT = -8  # 2 ** (-8 / 4) = 0.25 ms
+    MAX_EXPONENT = 64  # 2 ** (64 / 4) = 65536 ms
+
+    def __init__(self):
+        self.bounds = [2 ** (i / self.BUCKETS_PER_DOUBLING) for i in range(self.MIN_EXPONENT, self.MAX_EXPONENT + 1)]
+        self._counts = [0] * (len(self.bounds) + 1)  # the last bucket holds everything above the top bound
+        self._lock = threading.Lock()
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value_ms: float):
+        if value_ms <= self.bounds[0]:
+            index = 0
+        else:
+            index = min(math.ceil(math.log2(value_ms) * self.BUCKETS_PER_DOUBLING) - self.MIN_EXPONENT,
+                        len(self.bounds))
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.sum += value_ms
+            self.max = max(self.max, value_ms)
+
+    def counts(self) -> List[int]:
+        with self._lock:
+            return list(self._counts)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate the `q` quantile in milliseconds, or None if nothing was recorded."""
+        counts = self.counts()
+        total = sum(counts)
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            if count and seen + count >= rank:
+                upper = self.bounds[index] if index < len(self.bounds) else self.max
+                lower = self.bounds[index - 1] if index else 0.0
+                return min(lower + (upper - lower) * (rank - seen) / count, self.max)
+            seen += count
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.sum / self.count, 3) if self.count else None,
+            "p50_ms": _rounded(self.quantile(0.5)),
+            "p90_ms": _rounded(self.quantile(0.9)),
+            "p99_ms": _rounded(self.quantile(0.99)),
+            "max_ms": round(self.max, 3),
+        }
+
+
+def _rounded(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 3)
+
+
+class StreamTimeline:
+    """Follows one recognition stream so results can be tied back to when their audio was sent.
+
+    Iterate it in place of the audio chunks given to the stream and pass every result event
+    to `observe`.
+    """
+
+    def __init__(self, recorder: "LatencyRecorder", chunks: Union[Iterable[bytes], AsyncIterable[bytes]],
+                 sample_rate_hz: int, sample_width: int = 2):
+        self._recorder = recorder
+        self._chunks = chunks
+        self._bytes_per_ms = sample_rate_hz * sample_width / 1000.0
+        self._audio_ms = 0.0
+        self._lock = threading.Lock()
+        # End of the audio sent so far (ms) and when it was sent, from the oldest unanswered chunk.
+        self._ends: List[float] = []
+        self._sent_at: List[float] = []
+        self._first = 0
+
+    def _sending(self, chunk: bytes):
+        sent_at = time.monotonic()
+        captured_at = getattr(chunk, "captured_at", None)
+        if captured_at is not None:
+            self._recorder.observe(CAPTURE_TO_SEND, (sent_at - captured_at) * 1000)
+        self._audio_ms += len(chunk) / self._bytes_per_ms
+        with self._lock:
+            self._ends.append(self._audio_ms)
+            self._sent_at.append(sent_at)
+
+    def __iter__(self) -> Iterator[bytes]:
+        for chunk in self._chunks:
+            self._sending(chunk)
+            yield chunk
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        """Iterate an async source of chunks, for streams on grpc.aio."""
+        async for chunk in self._chunks:
+            self._sending(chunk)
+            yield chunk
+
+    def observe(self, event: ResultEvent):
+        """Record the latency of `event` from when the audio it ends at was sent."""
+        with self._lock:
+            if self._first >= len(self._ends):
+                return
+            index = bisect_left(self._ends, event.audio_processed * 1000 - 1e-6, self._first)
+            index = min(index, len(self._ends) - 1)
+            sent_at = self._sent_at[index]
+            if event.is_final:
+                # Later results only cover later audio, so forget what this one answered.
+                self._first = index
+                if self._first > 1024 and self._first * 2 > len(self._ends):
+                    del self._ends[:self._first]
+                    del self._sent_at[:self._first]
+                    self._first = 0
+        stage = SEND_TO_FINAL if event.is_final else SEND_TO_INTERIM
+        self._recorder.observe(stage, (event.received_at - sent_at) * 1000)
+
+
+class LatencyRecorder:
+    """Latency histograms for every pipeline stage."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.histograms: Dict[str, LatencyHistogram] = {stage: LatencyHistogram() for stage in STAGES}
+
+    def observe(self, stage: str, value_ms: float):
+        self.histograms[stage].observe(max(value_ms, 0.0))
+
+    def track(self, chunks: Union[Iterable[bytes], AsyncIterable[bytes]], sample_rate_hz: int) -> StreamTimeline:
+        """Return a timeline that records the latencies of one stream of 16-bit mono chunks."""
+        return StreamTimeline(self, chunks, sample_rate_hz)
+
+    def reset(self):
+        self.started = time.time()
+        self.histograms = {stage: LatencyHistogram() for stage in STAGES}
+
+    def snapshot(self) -> dict:
+        return {
+            "started": self.started,
+            "time": time.time(),
+            "stages": {stage: histogram.summary() for stage, histogram in self.histograms.items()},
+        }
+
+    def prometheus_text(self) -> str:
+        """Return the histograms in the Prometheus text exposition format, in seconds."""
+        name = "riva_client_latency_seconds"
+        lines = [f"# HELP {name} Latency of each transcription pipeline stage.", f"# TYPE {name} histogram"]
+        for stage, histogram in self.histograms.items():
+            cumulative = 0
+            counts = histogram.counts()
+            for bound, count in zip(histogram.bounds, counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{bound / 1000:.6g}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {sum(counts)}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.sum / 1000:.6f}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+    def status_text(self) -> str:
+        """Return a one-line summary for status bars."""
+        parts = []
+        for stage, label in ((CAPTURE_TO_SEND, "capture"), (SEND_TO_INTERIM, "interim"), (SEND_TO_FINAL, "final")):
+            histogram = self.histograms[stage]
+            if histogram.count:
+                parts.append(f"{label} p50 {histogram.quantile(0.5):.0f} / p90 {histogram.quantile(0.9):.0f} ms")
+        return " | ".join(parts)
+
+
+class MetricsExporter:
+    """Periodically writes the recorder's histograms to a file.
+
+    Files ending in .json get the JSON snapshot, anything else the Prometheus text format
+    (e.g. for the node_exporter textfile collector). Each write replaces the file atomically.
+    """
+
+    def __init__(self, recorder: LatencyRecorder, path: str, interval: float = 10.0):
+        self.recorder = recorder
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-exporter", daemon=True)
+
+    def start(self) -> "MetricsExporter":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.write()
+
+    def write(self):
+        if self.path.endswith(".json"):
+            content = json.dumps(self.recorder.snapshot(), indent=2)
+        else:
+            content = self.recorder.prometheus_text()
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as fh:
+            fh.write(content)
+        os.replace(temporary, self.path)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except OSError as e:
+                print(f"Could not write metrics to {self.path}: {e}")
+
+
+_recorder: Optional[LatencyRecorder] = None
+_recorder_lock = threading.Lock()
+
+
+def get_recorder() -> LatencyRecorder:
+    """Return the process-wide latency recorder."""
+    global _recorder
+    with _recorder_lock:
+        if _recorder is None:
+            _recorder = LatencyRecorder()
+        return _recorder
@@ -0,0 +1,258 @@
+import argparse
+import math
+import mmap
+import os
+import struct
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import grpc
+import riva.client
+import riva.client.proto.riva_asr_pb2 as rasr
+
+from results import WordOffset
+
+# Status codes worth retrying: the server is restarting or temporarily overloaded.
+RETRYABLE_STATUS_CODES = (grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.RESOURCE_EXHAUSTED)
+
+
+def build_offline_config(args: argparse.Namespace) -> riva.client.RecognitionConfig:
+    """Build an offline RecognitionConfig from the options of `add_asr_config_argparse_parameters`."""
+    config = riva.client.RecognitionConfig(
+        language_code=args.language_code,
+        max_alternatives=getattr(args, "max_alternatives", 1),
+        profanity_filter=getattr(args, "profanity_filter", False),
+        enable_automatic_punctuation=args.automatic_punctuation,
+        verbatim_transcripts=not args.no_verbatim_transcripts,
+        enable_word_time_offsets=getattr(args, "word_time_offsets", False) or args.speaker_diarization,
+    )
+    if args.model_name:
+        config.model = args.model_name
+    riva.client.add_word_boosting_to_config(config, args.boosted_lm_words, args.boosted_lm_score)
+    riva.client.asr.add_speaker_diarization_to_config(
+        config, diarization_enable=args.speaker_diarization, diarization_max_speakers=args.diarization_max_speakers
+    )
+    riva.client.add_custom_configuration_to_config(config, args.custom_configuration)
+    return config
+
+
+def wav_duration(path: str) -> Optional[float]:
+    """Return the duration of a WAV file in seconds, or None if it is not a readable WAV file."""
+    try:
+        with wave.open(path, 'rb') as wf:
+            return wf.getnframes() / wf.getframerate()
+    except (wave.Error, EOFError, OSError):
+        return None
+
+
+def _offline_recognize(asr_service, content: bytes, config, retries: int = 3, backoff: float = 1.0):
+    for attempt in range(retries + 1):
+        try:
+            return asr_service.offline_recognize(content, config)
+        except grpc.RpcError as e:
+            if e.code() not in RETRYABLE_STATUS_CODES or attempt == retries:
+                raise
+            time.sleep(backoff * 2 ** attempt)
+
+
+def recognize_file(
+        asr_service: riva.client.ASRService,
+        path: str,
+        config: riva.client.RecognitionConfig,
+        retries: int = 3,
+        backoff: float = 1.0,
+) -> rasr.RecognizeResponse:
+    """Run offline recognition on one audio file, retrying transient server errors."""
+    file_config = riva.client.RecognitionConfig()
+    file_config.CopyFrom(config)
+    riva.client.add_audio_file_specs_to_config(file_config, path)
+    with open(path, 'rb') as fh:
+        content = fh.read()
+    return _offline_recognize(asr_service, content, file_config, retries, backoff)
+
+
+def response_transcript(response) -> str:
+    """Return the best transcript of every result in `response`, joined with spaces."""
+    return " ".join(
+        result.alternatives[0].transcript.strip() for result in response.results if result.alternatives
+    )
+
+
+
+class WavLayout:
+    """Format and byte position of the PCM data chunk of a WAV file."""
+
+    def __init__(self, sample_rate: int, channels: int, sample_width: int, data_offset: int, data_size: int):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self.data_offset = data_offset
+        self.data_size = data_size
+
+    @property
+    def frame_bytes(self) -> int:
+        return self.channels * self.sample_width
+
+
+def read_wav_layout(path: str) -> WavLayout:
+    """Locate the PCM data of a WAV file without reading the samples."""
+    with wave.open(path, 'rb') as wf:
+        sample_rate, channels, sample_width = wf.getframerate(), wf.getnchannels(), wf.getsampwidth()
+    with open(path, 'rb') as fh:
+        riff = fh.read(12)
+        if riff[:4] != b"RIFF" or riff[8:12] != b"WAVE":
+            raise ValueError(f"{path} is not a RIFF/WAVE file.")
+        file_size = os.fstat(fh.fileno()).st_size
+        while True:
+            header = fh.read(8)
+            if len(header) < 8:
+                raise ValueError(f"{path} has no data chunk.")
+            chunk_id, chunk_size = header[:4], struct.unpack("<I", header[4:])[0]
+            if chunk_id == b"data":
+                offset = fh.tell()
+                # Recorders that crashed may leave a zero or oversized length: trust the file size.
+                size = min(chunk_size, file_size - offset) if chunk_size else file_size - offset
+                return WavLayout(sample_rate, channels, sample_width, offset, size)
+            fh.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+
+
+class WindowStitcher:
+    """Joins the words of consecutive, overlapping recognition windows into one timeline.
+
+    Windows must be added in order. Inside each overlap, words are taken from the earlier
+    window up to the middle of the overlap and from the later window after it. Speaker tags
+    of each window are mapped onto global tags by matching the speakers of words that both
+    windows recognized in their overlap.
+    """
+
+    def __init__(self):
+        self._previous_words: List[WordOffset] = []
+        self._previous_end_ms = None
+        self._next_speaker_tag = 1
+
+    def add(self, start_ms: int, end_ms: int, words: List[WordOffset], next_start_ms: Optional[int] = None) -> List[WordOffset]:
+        """Add the words (in global time) of the window spanning `start_ms` to `end_ms`.
+
+        `next_start_ms` is where the following window starts, or None for the last window.
+        Returns the words of this window that belong to the stitched output.
+        """
+        words = self._map_speakers(words)
+        lower_cut = -math.inf if self._previous_end_ms is None else (start_ms + self._previous_end_ms) / 2
+        upper_cut = math.inf if next_start_ms is None else (next_start_ms + end_ms) / 2
+        self._previous_words = words
+        self._previous_end_ms = end_ms
+        return [w for w in words if lower_cut <= (w.start_ms + w.end_ms) / 2 < upper_cut]
+
+    def _map_speakers(self, words: List[WordOffset]) -> List[WordOffset]:
+        local_tags = sorted({w.speaker_tag for w in words if w.speaker_tag})
+        if not local_tags:
+            return words
+        votes: Dict[Tuple[int, int], int] = {}
+        for word in words:
+            if not word.speaker_tag or self._previous_end_ms is None or word.start_ms >= self._previous_end_ms:
+                continue
+            match = self._overlapping_word(word)
+            if match is not None and match.speaker_tag:
+                key = (word.speaker_tag, match.speaker_tag)
+                votes[key] = votes.get(key, 0) + 1
+        mapping: Dict[int, int] = {}
+        used = set()
+        for (local, global_tag), _ in sorted(votes.items(), key=lambda item: -item[1]):
+            if local not in mapping and global_tag not in used:
+                mapping[local] = global_tag
+                used.add(global_tag)
+        for local in local_tags:
+            if local not in mapping:
+                mapping[local] = self._next_speaker_tag
+                self._next_speaker_tag += 1
+        self._next_speaker_tag = max(self._next_speaker_tag, max(mapping.values()) + 1)
+        return [replace(w, speaker_tag=mapping.get(w.speaker_tag, 0)) for w in words]
+
+    def _overlapping_word(self, word: WordOffset) -> Optional[WordOffset]:
+        best, best_overlap = None, 0
+        for candidate in self._previous_words:
+            overlap = min(word.end_ms, candidate.end_ms) - max(word.start_ms, candidate.start_ms)
+            if overlap > best_overlap:
+                best, best_overlap = candidate, overlap
+        return best
+
+
+def response_words(response, offset_ms: int = 0) -> List[WordOffset]:
+    """Return the words of the best alternative of every result, shifted by `offset_ms`."""
+    return [
+        WordOffset(w.word, w.start_time + offset_ms, w.end_time + offset_ms, w.confidence, w.speaker_tag)
+        for result in response.results if result.alternatives
+        for w in result.alternatives[0].words
+    ]
+
+
+def recognize_pcm_windows(
+        asr_service: riva.client.ASRService,
+        pcm,
+        layout: WavLayout,
+        config: riva.client.RecognitionConfig,
+        window_seconds: float = 60.0,
+        overlap_seconds: float = 4.0,
+        concurrency: int = 4,
+        offset_ms: int = 0,
+) -> Iterator[WordOffset]:
+    """Recognize a long PCM buffer as overlapping windows and yield the stitched words in order.
+
+    `pcm` is any buffer (bytes, memoryview, mmap) holding the samples described by `layout`,
+    starting at `layout.data_offset`. At most `concurrency` windows are in flight, so memory
+    use does not depend on the length of the audio. Word times are shifted by `offset_ms`.
+    """
+    if overlap_seconds >= window_seconds:
+        raise ValueError("overlap_seconds must be smaller than window_seconds.")
+    window_config = riva.client.RecognitionConfig()
+    window_config.CopyFrom(config)
+    window_config.encoding = riva.client.AudioEncoding.LINEAR_PCM
+    window_config.sample_rate_hertz = layout.sample_rate
+    window_config.audio_channel_count = layout.channels
+    window_config.enable_word_time_offsets = True
+
+    total_frames = layout.data_size // layout.frame_bytes
+    window_frames = int(window_seconds * layout.sample_rate)
+    step_frames = window_frames - int(overlap_seconds * layout.sample_rate)
+    starts = list(range(0, max(total_frames - (window_frames - step_frames), 1), step_frames))
+
+    def to_ms(frame: int) -> int:
+        return offset_ms + frame * 1000 // layout.sample_rate
+
+    def recognize(start_frame: int):
+        end_frame = min(start_frame + window_frames, total_frames)
+        begin = layout.data_offset + start_frame * layout.frame_bytes
+        content = bytes(pcm[begin:layout.data_offset + end_frame * layout.frame_bytes])
+        response = _offline_recognize(asr_service, content, window_config)
+        return end_frame, response_words(response, to_ms(start_frame))
+
+    stitcher = WindowStitcher()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="window") as executor:
+        futures = {}
+        for index, start_frame in enumerate(starts):
+            futures[index] = executor.submit(recognize, start_frame)
+            # Stitch in order while keeping at most `concurrency` windows in flight.
+            while len(futures) > concurrency or (index == len(starts) - 1 and futures):
+                first = min(futures)
+                end_frame, words = futures.pop(first).result()
+                next_start = to_ms(starts[first + 1]) if first + 1 < len(starts) else None
+                yield from stitcher.add(to_ms(starts[first]), to_ms(end_frame), words, next_start)
+
+
+def recognize_long_wav(
+        asr_service: riva.client.ASRService,
+        path: str,
+        config: riva.client.RecognitionConfig,
+        window_seconds: float = 60.0,
+        overlap_seconds: float = 4.0,
+        concurrency: int = 4,
+) -> Iterator[WordOffset]:
+    """Recognize a WAV file of any length through a memory map, yielding stitched words in order."""
+    layout = read_wav_layout(path)
+    with open(path, 'rb') as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as pcm:
+        yield from recognize_pcm_windows(
+            asr_service, pcm, layout, config, window_seconds, overlap_seconds, concurrency
+        )
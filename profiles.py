@@ -0,0 +1,95 @@
+import json
+import os
+import sys
+import threading
+from typing import List
+
+from trans import RivaArguments
+
+DEFAULT_PROFILES_PATH = os.path.join(os.path.expanduser("~"), ".riva_project", "profiles.json")
+DEFAULT_PROFILE = "default"
+
+
+class ProfileStore:
+    """Named RivaArguments profiles kept in one JSON file, plus which profile is active.
+
+    The file is rewritten atomically on every change, so a crash never leaves it half
+    written. Fields a profile does not mention keep their RivaArguments defaults, so profiles
+    saved by older versions still load. A file that cannot be read is set aside with a
+    warning and the defaults are used, so a broken file never keeps the app from starting.
+    """
+
+    def __init__(self, path: str = DEFAULT_PROFILES_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data = {"active": DEFAULT_PROFILE, "profiles": {}}
+        if os.path.exists(path):
+            self._read()
+
+    def _read(self):
+        try:
+            with open(self.path, encoding="utf-8") as fh:
+                data = json.load(fh)
+            if not isinstance(data, dict) or not isinstance(data.get("profiles", {}), dict) \
+                    or not isinstance(data.get("active", DEFAULT_PROFILE), str):
+                raise ValueError("not a profiles file")
+        except (OSError, ValueError) as e:  # json.JSONDecodeError and UnicodeDecodeError are ValueErrors
+            backup = f"{self.path}.bad"
+            try:
+                os.replace(self.path, backup)
+            except OSError:
+                backup = None
+            print(f"Ignoring unreadable profiles in {self.path} ({e})"
+                  + (f"; moved it to {backup}" if backup else ""), file=sys.stderr)
+            return
+        self._data.update(data)
+
+    def _write(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as fh:
+            json.dump(self._data, fh, indent=2, sort_keys=True)
+        os.replace(temporary, self.path)
+
+    @property
+    def active(self) -> str:
+        return self._data["active"]
+
+    def names(self) -> List[str]:
+        with self._lock:
+            return sorted(set(self._data["profiles"]) | {DEFAULT_PROFILE})
+
+    def load(self, name: str) -> RivaArguments:
+        """Return the arguments of profile `name`; an unknown or invalid profile gives the defaults."""
+        with self._lock:
+            fields = self._data["profiles"].get(name, {})
+        try:
+            return RivaArguments.from_dict(fields)
+        except (AttributeError, TypeError, ValueError) as e:
+            print(f"Ignoring invalid profile {name!r} in {self.path} ({e})", file=sys.stderr)
+            return RivaArguments()
+
+    def load_active(self) -> RivaArguments:
+        return self.load(self.active)
+
+    def save(self, name: str, args: RivaArguments, activate: bool = True):
+        name = name.strip()
+        if not name:
+            raise ValueError("profile name cannot be empty")
+        with self._lock:
+            self._data["profiles"][name] = args.to_dict()
+            if activate:
+                self._data["active"] = name
+            self._write()
+
+    def set_active(self, name: str):
+        with self._lock:
+            self._data["active"] = name
+            self._write()
+
+    def delete(self, name: str):
+        with self._lock:
+            self._data["profiles"].pop(name, None)
+            if self._data["active"] == name:
+                self._data["active"] = DEFAULT_PROFILE
+            self._write()
@@ -1,52 +1,193 @@
-import pyaudio
+import argparse
+import os
+import queue
+import threading
+import time
 import wave
 
+import pyaudio
+
+from device_registry import get_registry
+
 # Parameters for recording
 FORMAT = pyaudio.paInt16  # Audio format (16-bit PCM)
 CHANNELS = 1               # Number of channels (1 for mono)
-RATE = 16000               # Sample rate (44.1 kHz)
+RATE = 16000               # Sample rate (16 kHz)
 CHUNK = 1600               # Buffer size
-RECORD_SECONDS = 20        # Duration of recording in seconds
 WAVE_OUTPUT_FILENAME = "record1.wav"  # Output file name
 
-print("Recording parameters:", FORMAT, CHANNELS, RATE, CHUNK, RECORD_SECONDS)
-# Create an interface to PortAudio
-audio = pyaudio.PyAudio()
-chosen_device_index = -1
-for x in range(0,audio.get_device_count()):
-    info = audio.get_device_info_by_index(x)
-    print(info)
-    if info["name"] == "pulse":
-        chosen_device_index = info["index"]
-        print("Chosen index: ", chosen_device_index)
-# Start recording
-stream = audio.open(format=FORMAT, channels=CHANNELS,
-                    rate=RATE, input_device_index=chosen_device_index, input=True,
-                    frames_per_buffer=CHUNK)
 
-print(type(stream))
+class StreamingWavWriter:
+    """Writes audio frames to WAV files on a background thread, rotating segments as they grow.
+
+    Frames are written as they arrive and the WAV header is patched after every write, so
+    each segment on disk is a valid WAV file at all times. A new segment is started once the
+    current one reaches `max_segment_seconds` of audio or `max_segment_bytes` of data.
+    """
+
+    def __init__(
+            self,
+            path: str,
+            channels: int = CHANNELS,
+            sample_width: int = 2,
+            rate: int = RATE,
+            max_segment_seconds: float = 0,
+            max_segment_bytes: int = 0,
+            max_queued_chunks: int = 256,
+    ):
+        self._base, self._ext = os.path.splitext(path)
+        self._ext = self._ext or ".wav"
+        self._channels = channels
+        self._sample_width = sample_width
+        self._rate = rate
+        frame_bytes = channels * sample_width
+        limits = []
+        if max_segment_seconds > 0:
+            limits.append(int(max_segment_seconds * rate) * frame_bytes)
+        if max_segment_bytes > 0:
+            limits.append(max(max_segment_bytes - max_segment_bytes % frame_bytes, frame_bytes))
+        self._segment_limit = min(limits) if limits else 0
+        self._queue = queue.Queue(maxsize=max_queued_chunks)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._file = None
+        self._wave = None
+        self._segment_bytes = 0
+        self.segments = []
+        self.error = None
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def write(self, data: bytes):
+        """Queue frames for writing; blocks only if the writer falls far behind."""
+        if self.error is not None:
+            raise self.error
+        self._queue.put(data)
+
+    def close(self):
+        """Flush queued frames, finish the current segment and stop the writer thread."""
+        self._queue.put(None)
+        self._thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def _segment_path(self) -> str:
+        if not self._segment_limit:
+            return self._base + self._ext
+        return f"{self._base}_{len(self.segments):04d}{self._ext}"
+
+    def _open_segment(self):
+        path = self._segment_path()
+        self._file = open(path, "wb")
+        self._wave = wave.open(self._file, "wb")
+        self._wave.setnchannels(self._channels)
+        self._wave.setsampwidth(self._sample_width)
+        self._wave.setframerate(self._rate)
+        self._segment_bytes = 0
+        self.segments.append(path)
+
+    def _close_segment(self):
+        if self._wave is not None:
+            self._wave.close()
+            self._file.close()
+            self._wave = None
+            self._file = None
+
+    def _write(self, data: bytes):
+        view = memoryview(data)
+        while view:
+            if self._wave is None:
+                self._open_segment()
+            room = len(view)
+            if self._segment_limit:
+                room = min(room, self._segment_limit - self._segment_bytes)
+            # writeframes() patches the RIFF and data lengths in the header after each call.
+            self._wave.writeframes(view[:room])
+            self._file.flush()
+            self._segment_bytes += room
+            view = view[room:]
+            if self._segment_limit and self._segment_bytes >= self._segment_limit:
+                self._close_segment()
+
+    def _run(self):
+        try:
+            while True:
+                data = self._queue.get()
+                if data is None:
+                    break
+                self._write(data)
+        except Exception as e:
+            self.error = e
+            # Keep draining so producers blocked on a full queue are released.
+            while self._queue.get() is not None:
+                pass
+        finally:
+            self._close_segment()
 
-print("Recording...")
 
-frames = []
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Record from the microphone to WAV files of unlimited length",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--output", default=WAVE_OUTPUT_FILENAME, help="Output file name.")
+    parser.add_argument("--duration", type=float, default=0, help="Seconds to record; 0 records until Ctrl+C.")
+    parser.add_argument("--segment-seconds", type=float, default=300,
+                        help="Start a new file after this many seconds; 0 disables rotation by duration.")
+    parser.add_argument("--segment-bytes", type=int, default=0,
+                        help="Start a new file after this many bytes of audio; 0 disables rotation by size.")
+    parser.add_argument("--device-name", default="pulse",
+                        help="Input device to record from: an index, a name, a glob or part of a name.")
+    return parser.parse_args()
 
-for i in range(0, int(RATE / CHUNK * RECORD_SECONDS)):
-    data = stream.read(CHUNK)
-    frames.append(data)
-    # print(data)
 
-print("Finished recording.")
+def main() -> None:
+    args = parse_args()
+    print("Recording parameters:", FORMAT, CHANNELS, RATE, CHUNK, args.duration or "unlimited")
+    # The registry scans the devices once and shares its PortAudio interface
+    registry = get_registry()
+    device = registry.find(args.device_name)
+    if device is None:
+        print(f"No input device matches {args.device_name!r}; recording from the default device.")
+        chosen_device_index = None
+    else:
+        chosen_device_index = device.index
+        print("Chosen device:", device)
+    audio = registry.acquire()
+    # Start recording
+    stream = audio.open(format=FORMAT, channels=CHANNELS,
+                        rate=RATE, input_device_index=chosen_device_index, input=True,
+                        frames_per_buffer=CHUNK)
 
-# Stop and close the stream
-stream.stop_stream()
-stream.close()
-audio.terminate()
+    print("Recording... press Ctrl+C to stop.")
 
-# Save the recorded data as a WAV file
-with wave.open(WAVE_OUTPUT_FILENAME, 'wb') as wf:
-    wf.setnchannels(CHANNELS)
-    wf.setsampwidth(audio.get_sample_size(FORMAT))
-    wf.setframerate(RATE)
-    wf.writeframes(b''.join(frames))
+    writer = StreamingWavWriter(
+        args.output,
+        channels=CHANNELS,
+        sample_width=audio.get_sample_size(FORMAT),
+        rate=RATE,
+        max_segment_seconds=args.segment_seconds,
+        max_segment_bytes=args.segment_bytes,
+    )
+    deadline = time.monotonic() + args.duration if args.duration > 0 else None
+    try:
+        with writer:
+            while deadline is None or time.monotonic() < deadline:
+                writer.write(stream.read(CHUNK, exception_on_overflow=False))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("Finished recording.")
+        # Stop and close the stream
+        stream.stop_stream()
+        stream.close()
+        registry.release()
+    print("Wrote:", ", ".join(writer.segments))
 
 
+if __name__ == '__main__':
+    main()
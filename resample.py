@@ -0,0 +1,246 @@
+import argparse
+import math
+import queue
+import time
+from typing import Iterator, Optional, Tuple, Union
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from device_registry import get_registry
+from metrics import StampedChunk
+
+
+class StreamingResampler:
+    """Converts interleaved 16-bit PCM chunks to mono at another sample rate.
+
+    Channels are down-mixed by averaging, then the signal is resampled by the reduced ratio
+    `out_rate / in_rate` with a polyphase Kaiser-windowed sinc filter. The filter history and
+    the output phase are carried across chunks, so any chunking of the input produces the same
+    output samples as converting the whole signal at once.
+    """
+
+    def __init__(
+            self,
+            in_rate: int,
+            out_rate: int,
+            in_channels: int = 1,
+            zero_crossings: int = 8,
+            rolloff: float = 0.95,
+            beta: float = 8.6,
+    ):
+        self.in_rate = in_rate
+        self.out_rate = out_rate
+        self.in_channels = in_channels
+        divisor = math.gcd(in_rate, out_rate)
+        self._up, self._down = out_rate // divisor, in_rate // divisor
+        self._frame_bytes = 2 * in_channels
+        self._partial = b""
+        self._passthrough = self._up == self._down
+
+        # Prototype low-pass filter at the upsampled rate, cut off below the lower Nyquist rate.
+        span = max(self._up, self._down)
+        taps = 2 * zero_crossings * span + 1
+        cutoff = rolloff / (2 * span)
+        n = np.arange(taps) - (taps - 1) / 2
+        prototype = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(taps, beta) * self._up
+        self._taps_per_phase = -(-taps // self._up)
+        prototype = np.pad(prototype, (0, self._taps_per_phase * self._up - taps))
+        # Row p holds taps p, p + up, p + 2 * up, ... reversed so they line up with input windows.
+        self._phases = prototype.reshape(self._taps_per_phase, self._up).T[:, ::-1].astype(np.float32)
+        self._delay = (taps - 1) // 2
+
+        # Input history, starting with silence before the first sample.
+        self._history = np.zeros(self._taps_per_phase - 1, dtype=np.float32)
+        self._history_start = -(self._taps_per_phase - 1)
+        self._next_output = 0
+        self._samples_in = 0
+
+    def _mix_down(self, chunk: bytes) -> np.ndarray:
+        data = self._partial + chunk if self._partial else chunk
+        usable = len(data) - len(data) % self._frame_bytes
+        self._partial = data[usable:]
+        samples = np.frombuffer(data, dtype=np.int16, count=usable // 2)
+        if self.in_channels == 1:
+            return samples.astype(np.float32)
+        return samples.reshape(-1, self.in_channels).mean(axis=1, dtype=np.float32)
+
+    def process(self, chunk: bytes) -> bytes:
+        """Convert one chunk; returns the output samples that are complete so far."""
+        samples = self._mix_down(chunk)
+        self._samples_in += len(samples)
+        if self._passthrough:
+            return self._to_pcm(samples)
+        self._history = np.concatenate((self._history, samples))
+        return self._to_pcm(self._emit())
+
+    def flush(self) -> bytes:
+        """Return the output samples still held back by the filter delay at the end of the stream."""
+        if self._passthrough:
+            return b""
+        padding = self._delay // self._up + 1
+        self._history = np.concatenate((self._history, np.zeros(padding, dtype=np.float32)))
+        total_out = -(-self._samples_in * self._up // self._down)
+        return self._to_pcm(self._emit(limit=total_out))
+
+    def _emit(self, limit: Optional[int] = None) -> np.ndarray:
+        last_input = self._history_start + len(self._history) - 1
+        # The last output whose newest input sample, (n * down + delay) // up, has arrived.
+        last_output = ((last_input + 1) * self._up - 1 - self._delay) // self._down
+        if limit is not None:
+            last_output = min(last_output, limit - 1)
+        if last_output < self._next_output:
+            return np.zeros(0, dtype=np.float32)
+        positions = np.arange(self._next_output, last_output + 1, dtype=np.int64) * self._down + self._delay
+        newest, phase = np.divmod(positions, self._up)
+        windows = sliding_window_view(self._history, self._taps_per_phase)
+        offsets = newest - (self._taps_per_phase - 1) - self._history_start
+        output = np.einsum("ij,ij->i", windows[offsets], self._phases[phase])
+
+        self._next_output = last_output + 1
+        keep_from = ((self._next_output * self._down + self._delay) // self._up
+                     - (self._taps_per_phase - 1) - self._history_start)
+        keep_from = min(max(keep_from, 0), len(self._history))
+        self._history = self._history[keep_from:]
+        self._history_start += keep_from
+        return output
+
+    @staticmethod
+    def _to_pcm(samples: np.ndarray) -> bytes:
+        return np.clip(np.rint(samples), -32768, 32767).astype(np.int16).tobytes()
+
+
+class NativeMicrophoneStream:
+    """Records from an input device in a format it supports and yields mono chunks at `rate`.
+
+    A drop-in replacement for `riva.client.audio_io.MicrophoneStream` for devices that cannot
+    open at the ASR rate or in mono. The capture format is chosen by
+    `DeviceRegistry.pick_format` from the registry's cached device list, so opening a stream
+    does not re-scan devices. Chunks are `StampedChunk`s carrying the time their oldest audio
+    was captured. `device` is an index or a name as `DeviceRegistry.find` takes; None is the
+    default device.
+    """
+
+    def __init__(self, rate: int, chunk: int, device: Union[int, str, None] = None, device_rate: int = 0,
+                 device_channels: int = 0):
+        self._rate = rate
+        self._chunk = chunk
+        self._device = device
+        self._device_rate = device_rate
+        self._device_channels = device_channels
+        self._buff = queue.Queue()
+        self.capture_format: Optional[Tuple[int, int]] = None
+        self.resampler: Optional[StreamingResampler] = None
+        self.closed = True
+
+    def __enter__(self):
+        registry = get_registry()
+        for attempt in range(2):
+            # Holding the shared interface keeps the registry from rescanning (and renumbering) devices.
+            self._audio_interface = registry.acquire()
+            try:
+                self._open(registry)
+                break
+            except OSError:
+                registry.release()
+                # The device list may be stale, e.g. a device was unplugged; rescan and try once more.
+                if attempt or registry.refresh_if_idle() is None:
+                    raise
+            except BaseException:
+                registry.release()
+                raise
+        self.closed = False
+        return self
+
+    def _open(self, registry):
+        device = registry.resolve(self._device)
+        if device is None:
+            raise OSError("no default input device" if self._device is None else f"no input device {self._device!r}")
+        rate, channels = self.capture_format = registry.pick_format(
+            device, self._rate, self._device_rate, self._device_channels
+        )
+        self._pa_module = registry.pa_module
+        self.resampler = StreamingResampler(rate, self._rate, channels)
+        self._audio_stream = self._audio_interface.open(
+            format=self._pa_module.paInt16,
+            input_device_index=device.index,
+            channels=channels,
+            rate=rate,
+            input=True,
+            # Keep the chunk duration of the ASR stream.
+            frames_per_buffer=max(self._chunk * rate // self._rate, 1),
+            stream_callback=self._fill_buffer,
+        )
+
+    def close(self) -> None:
+        """Stop capturing; safe to call from another thread and more than once."""
+        if self.closed:
+            return
+        self._audio_stream.stop_stream()
+        self._audio_stream.close()
+        self.closed = True
+        self._buff.put(None)
+        get_registry().release()
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def _fill_buffer(self, in_data, frame_count, time_info, status_flags):
+        self._buff.put((in_data, time.monotonic()))
+        return None, self._pa_module.paContinue
+
+    def __next__(self) -> bytes:
+        captured_at = None
+        while True:
+            item = self._buff.get()
+            if item is None:
+                raise StopIteration
+            chunk, stamp = item
+            captured_at = stamp if captured_at is None else captured_at
+            data = [chunk]
+            while True:
+                try:
+                    item = self._buff.get(block=False)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._buff.put(None)
+                    break
+                data.append(item[0])
+            converted = self.resampler.process(b"".join(data))
+            if converted:
+                return StampedChunk(converted, captured_at)
+
+    def __iter__(self) -> Iterator[bytes]:
+        return self
+
+
+def benchmark(in_rate: int, out_rate: int, channels: int, seconds: float, chunk_ms: int) -> float:
+    """Resample `seconds` of noise in `chunk_ms` chunks and return the speed as a real-time factor."""
+    rng = np.random.default_rng(0)
+    pcm = rng.integers(-8000, 8000, int(in_rate * seconds) * channels, dtype=np.int16).tobytes()
+    chunk_bytes = in_rate * chunk_ms // 1000 * channels * 2
+    resampler = StreamingResampler(in_rate, out_rate, channels)
+    started = time.perf_counter()
+    for offset in range(0, len(pcm), chunk_bytes):
+        resampler.process(pcm[offset:offset + chunk_bytes])
+    resampler.flush()
+    return seconds / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the streaming resampler",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--out-rate", type=int, default=16000, help="ASR sample rate.")
+    parser.add_argument("--seconds", type=float, default=60.0, help="Seconds of audio per run.")
+    parser.add_argument("--chunk-ms", type=int, default=100, help="Chunk duration.")
+    args = parser.parse_args()
+    for in_rate, channels in ((16000, 1), (44100, 2), (48000, 2), (48000, 1), (22050, 1), (8000, 1)):
+        factor = benchmark(in_rate, args.out_rate, channels, args.seconds, args.chunk_ms)
+        print(f"{in_rate} Hz x{channels} -> {args.out_rate} Hz mono: {factor:.0f}x real time")
+
+
+if __name__ == '__main__':
+    main()
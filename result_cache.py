@@ -0,0 +1,201 @@
+import contextlib
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterator, Optional
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".riva_project", "cache")
+DEFAULT_MAX_BYTES = 4 * 1024 ** 3
+HASH_BLOCK_BYTES = 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_last_used ON entries(last_used);
+CREATE TABLE IF NOT EXISTS digests (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    digest TEXT NOT NULL
+);
+"""
+
+
+class DiscardEntry(Exception):
+    """Raised inside `ResultCache.writer` to drop the entry being written without an error."""
+
+
+def file_digest(path: str) -> str:
+    """Return the BLAKE2b digest of a file, read in fixed-size blocks into one reused buffer."""
+    digest = hashlib.blake2b(digest_size=20)
+    buffer = bytearray(HASH_BLOCK_BYTES)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as fh:
+        while True:
+            size = fh.readinto(buffer)
+            if not size:
+                break
+            digest.update(view[:size])
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Disk cache of decoded audio and recognition results, addressed by audio content.
+
+    Entries are files under `root`, named by a key derived from the digest of the source
+    file and whatever else the cached data depends on (see `key`). Reading an entry marks it
+    used; once the entries exceed `max_bytes` the least recently used ones are deleted.
+    File digests are remembered by path, size, modification time and inode, so an unchanged
+    file is only hashed once.
+    """
+
+    def __init__(self, root: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(root, "index.db"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def content_digest(self, path: str) -> str:
+        """Return the digest of a file's content, hashing it only if it changed since last time."""
+        path = os.path.realpath(path)
+        stat = os.stat(path)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT digest FROM digests WHERE path = ? AND size = ? AND mtime_ns = ? AND inode = ?",
+                (path, stat.st_size, stat.st_mtime_ns, stat.st_ino),
+            ).fetchone()
+        if row:
+            return row[0]
+        digest = file_digest(path)
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO digests (path, size, mtime_ns, inode, digest) VALUES (?, ?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, stat.st_ino, digest),
+            )
+        return digest
+
+    @staticmethod
+    def key(digest: str, kind: str, *parts) -> str:
+        """Return the cache key of `kind` data derived from content `digest` and `parts`.
+
+        `parts` are bytes (e.g. a deterministically serialized RecognitionConfig) or values
+        whose repr is stable, such as numbers and strings.
+        """
+        key = hashlib.blake2b(digest_size=20)
+        key.update(f"{digest}:{kind}".encode())
+        for part in parts:
+            key.update(b"\0")
+            key.update(part if isinstance(part, bytes) else repr(part).encode())
+        return f"{kind}-{key.hexdigest()}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[-2:], key)
+
+    def path(self, key: str) -> Optional[str]:
+        """Return the file of a cached entry and mark it used, or None on a miss."""
+        path = self._path(key)
+        with self._lock, self._db:
+            found = self._db.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key)).rowcount
+        if found and os.path.exists(path):
+            return path
+        if found:
+            self._forget(key)
+        return None
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self.path(key)
+        if path is None:
+            return None
+        with open(path, 'rb') as fh:
+            return fh.read()
+
+    def put(self, key: str, data: bytes):
+        with self.writer(key) as fh:
+            fh.write(data)
+
+    @contextlib.contextmanager
+    def writer(self, key: str):
+        """Write an entry incrementally. The entry only appears if the block completes.
+
+        Raising `DiscardEntry` in the block drops the entry quietly, e.g. when less was
+        written than the entry should hold.
+        """
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(temporary, 'wb') as fh:
+                yield fh
+            os.replace(temporary, path)
+        except BaseException as e:
+            with contextlib.suppress(OSError):
+                os.remove(temporary)
+            if isinstance(e, DiscardEntry):
+                return
+            raise
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, size, last_used) VALUES (?, ?, ?)",
+                (key, os.path.getsize(path), time.time()),
+            )
+        self.evict()
+
+    def iter_chunks(self, path: str, chunk_bytes: int) -> Iterator[bytes]:
+        """Yield a cached file in chunks, e.g. to stream cached PCM."""
+        with open(path, 'rb') as fh:
+            while True:
+                data = fh.read(chunk_bytes)
+                if not data:
+                    return
+                yield data
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in `max_bytes`."""
+        excess = self.total_bytes() - self.max_bytes
+        while excess > 0:
+            with self._lock:
+                rows = self._db.execute("SELECT key, size FROM entries ORDER BY last_used LIMIT 64").fetchall()
+            if not rows:
+                return
+            for key, size in rows:
+                self._forget(key)
+                excess -= size
+                if excess <= 0:
+                    return
+
+    def _forget(self, key: str):
+        with contextlib.suppress(OSError):
+            os.remove(self._path(key))
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+
+_cache: Optional[ResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> ResultCache:
+    """Return the process-wide result cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache()
+        return _cache
@@ -0,0 +1,157 @@
+import heapq
+import itertools
+import json
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Iterable, Iterator, Optional, TextIO, Tuple
+
+
+@dataclass(frozen=True)
+class WordOffset:
+    """A recognized word and its position in the streamed audio, in milliseconds."""
+
+    word: str
+    start_ms: int
+    end_ms: int
+    confidence: float = 0.0
+    speaker_tag: int = 0
+
+
+@dataclass(frozen=True)
+class ResultEvent:
+    """One interim or final result of a streaming recognition session."""
+
+    is_final: bool
+    text: str
+    translation: str = ""
+    stability: float = 0.0
+    confidence: float = 0.0
+    words: Tuple[WordOffset, ...] = ()
+    audio_processed: float = 0.0  # seconds of audio the server had processed
+    channel_tag: int = 0
+    source: str = ""  # the input the audio came from, when several are transcribed at once
+    received_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def display_text(self) -> str:
+        """Return the translation if there is one, otherwise the transcript."""
+        return self.translation or self.text
+
+    def to_dict(self) -> dict:
+        """Return the event as plain JSON-serializable data."""
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ResultEvent":
+        """Rebuild an event from the output of `to_dict`."""
+        words = tuple(WordOffset(**word) for word in data.get("words", ()))
+        return cls(**{**data, "words": words})
+
+
+ResultSink = Callable[[ResultEvent], None]
+
+
+def events_from_responses(responses: Iterable, translated: bool = False) -> Iterator[ResultEvent]:
+    """Convert streaming ASR or speech-to-text translation responses into result events.
+
+    With `translated=True` the responses come from `StreamingTranslateSpeechToText`, whose
+    transcripts already hold the translated text.
+    """
+    for response in responses:
+        received_at = time.monotonic()
+        for result in response.results:
+            if not result.alternatives:
+                continue
+            alternative = result.alternatives[0]
+            words = tuple(
+                WordOffset(w.word, w.start_time, w.end_time, w.confidence, w.speaker_tag)
+                for w in alternative.words
+            )
+            transcript = alternative.transcript
+            yield ResultEvent(
+                is_final=result.is_final,
+                text="" if translated else transcript,
+                translation=transcript if translated else "",
+                stability=result.stability,
+                confidence=alternative.confidence,
+                words=words,
+                audio_processed=result.audio_processed,
+                channel_tag=result.channel_tag,
+                received_at=received_at,
+            )
+
+
+def print_event(event: ResultEvent, file: Optional[TextIO] = None):
+    """Print final results one per line; interim results are skipped."""
+    if event.is_final:
+        prefix = f"[{event.source}] " if event.source else ""
+        print(f"## {prefix}{event.display_text}", file=file or sys.stdout, flush=True)
+
+
+class JsonLinesWriter:
+    """Result sink that appends every event as one JSON object per line."""
+
+    def __init__(self, file: TextIO, finals_only: bool = False):
+        self._file = file
+        self._finals_only = finals_only
+
+    def __call__(self, event: ResultEvent):
+        if self._finals_only and not event.is_final:
+            return
+        self._file.write(json.dumps(event.to_dict(), ensure_ascii=False) + "\n")
+        if event.is_final:
+            self._file.flush()
+
+
+class TimeOrderedMerger:
+    """Result sink that merges events from concurrent streams into one time-ordered sequence.
+
+    `push` may be called from any thread. Each event is held for `delay` seconds after its
+    timestamp so that events of other streams with earlier timestamps can overtake it, then
+    handed to `sink` on the merger's own thread, one at a time.
+    """
+
+    def __init__(self, sink: ResultSink, delay: float = 0.5):
+        self._sink = sink
+        self._delay = delay
+        self._heap = []
+        self._order = itertools.count()
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="result-merger", daemon=True)
+        self._thread.start()
+
+    def push(self, event: ResultEvent, timestamp: Optional[float] = None):
+        """Queue an event ordered by `timestamp` (time.monotonic() based, default `received_at`)."""
+        timestamp = event.received_at if timestamp is None else timestamp
+        release_at = max(timestamp + self._delay, time.monotonic())
+        with self._condition:
+            heapq.heappush(self._heap, (timestamp, next(self._order), release_at, event))
+            self._condition.notify()
+
+    __call__ = push
+
+    def close(self):
+        """Deliver all queued events and stop the merger thread."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    if self._heap:
+                        wait = self._heap[0][2] - time.monotonic()
+                        if wait <= 0 or self._closed:
+                            event = heapq.heappop(self._heap)[3]
+                            break
+                    elif self._closed:
+                        return
+                    else:
+                        wait = None
+                    self._condition.wait(wait)
+            self._sink(event)
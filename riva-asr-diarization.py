@@ -1,17 +1,37 @@
+import argparse
 import io
-import grpc
+import json
+import os
+from dataclasses import asdict
 
 import riva.client
+import riva.client.proto.riva_asr_pb2 as rasr
+
+from channelpool import get_pool
+from offline import recognize_long_wav
+from result_cache import get_cache
+from results import WordOffset
+
+# Files above this size are recognized in windows instead of one request.
+LONG_FILE_BYTES = 32 * 1024 * 1024
+
+parser = argparse.ArgumentParser(description="Offline ASR with speaker diarization via Riva AI Services")
+# Other samples: "tutorials/audio_samples/interview-with-bill.wav", "tutorials/audio_samples/en-US_sample.wav"
+parser.add_argument("path", nargs="?", default="./test_audio/test.wav", help="WAV file to transcribe.")
+parser.add_argument("--server", default="localhost:50051", help="URI of the Riva server.")
+parser.add_argument("--long-file", action="store_true",
+                    help="Recognize the file in overlapping windows (automatic for large files).")
+parser.add_argument("--window-seconds", type=float, default=60.0, help="Window length in long-file mode.")
+parser.add_argument("--overlap-seconds", type=float, default=4.0, help="Window overlap in long-file mode.")
+parser.add_argument("--concurrency", type=int, default=4, help="Windows recognized at once in long-file mode.")
+parser.add_argument("--no-cache", action="store_true", help="Recognize again even if the result is cached.")
+args = parser.parse_args()
 
 # Instantiate client
-auth = riva.client.Auth(uri='localhost:50051')
-riva_asr = riva.client.ASRService(auth)
+connection = argparse.Namespace(server=args.server, use_ssl=False, ssl_cert=None, metadata=[])
+riva_asr = get_pool().get_asr_service(connection)
 
-# path = "tutorials/audio_samples/interview-with-bill.wav"
-# path = "tutorials/audio_samples/en-US_sample.wav"
-path = "./test_audio/test.wav"
-with io.open(path, 'rb') as fh:
-    content = fh.read()
+path = args.path
 
 # Creating RecognitionConfig
 config = riva.client.RecognitionConfig(
@@ -23,14 +43,45 @@ config = riva.client.RecognitionConfig(
 
 riva.client.asr.add_speaker_diarization_to_config(config, diarization_enable=True, diarization_max_speakers=8)
 
-# ASR inference call with Recognize
-response = riva_asr.offline_recognize(content, config)
-print("ASR Transcript with Speaker Diarization:\n", response)
+# Results are cached by file content and config, so a rerun on the same file returns at once.
+cache = get_cache()
+digest = cache.content_digest(path)
+config_bytes = config.SerializeToString(deterministic=True)
 
-# Pretty print transcript with color coded speaker tags. Black color text indicates no speaker tag was assigned.
-for result in response.results:
-    for word in result.alternatives[0].words:
+if args.long_file or os.path.getsize(path) > LONG_FILE_BYTES:
+    # Windowed inference over a memory map: memory stays flat regardless of file length.
+    key = cache.key(digest, "offline-windows", config_bytes, args.window_seconds, args.overlap_seconds)
+    cached = None if args.no_cache else cache.get(key)
+    if cached is not None:
+        words = (WordOffset(**word) for word in json.loads(cached))
+    else:
+        words = recognize_long_wav(riva_asr, path, config, args.window_seconds, args.overlap_seconds,
+                                   args.concurrency)
+    print("ASR Transcript with Speaker Diarization:")
+    recognized = []
+    for word in words:
+        recognized.append(word)
         color = '\033['+ str(30 + word.speaker_tag) + 'm'
-        print(color, word.word, end="")
-      
+        print(color, word.word, end="", flush=True)
+    print('\033[0m')
+    if cached is None:
+        cache.put(key, json.dumps([asdict(word) for word in recognized]).encode("utf-8"))
+else:
+    key = cache.key(digest, "offline", config_bytes)
+    cached = None if args.no_cache else cache.get(key)
+    if cached is not None:
+        response = rasr.RecognizeResponse.FromString(cached)
+    else:
+        with io.open(path, 'rb') as fh:
+            content = fh.read()
+
+        # ASR inference call with Recognize
+        response = riva_asr.offline_recognize(content, config)
+        cache.put(key, response.SerializeToString())
+    print("ASR Transcript with Speaker Diarization:\n", response)
 
+    # Pretty print transcript with color coded speaker tags. Black color text indicates no speaker tag was assigned.
+    for result in response.results:
+        for word in result.alternatives[0].words:
+            color = '\033['+ str(30 + word.speaker_tag) + 'm'
+            print(color, word.word, end="")
@@ -0,0 +1,220 @@
+import argparse
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, replace
+from typing import Callable, Iterable, Iterator, List, Optional
+
+from offline import WavLayout, WindowStitcher
+from results import ResultEvent, WordOffset, print_event
+from trans import RivaArguments
+
+# Below this length a single streaming pass is as fast; see gui.AudioConverterApp.transcribe_video.
+SEGMENTED_MIN_SECONDS = 600.0
+
+
+@dataclass(frozen=True)
+class Segment:
+    """A time range of the input that one worker decodes and transcribes on its own."""
+
+    index: int
+    start: float  # seconds
+    length: float  # seconds
+
+    @property
+    def end(self) -> float:
+        return self.start + self.length
+
+
+def plan_segments(duration: float, segment_seconds: float = 300.0, overlap_seconds: float = 4.0) -> List[Segment]:
+    """Split `duration` seconds into segments of `segment_seconds` that overlap by `overlap_seconds`.
+
+    The last segment absorbs a remainder shorter than the overlap instead of becoming a sliver.
+    """
+    if overlap_seconds >= segment_seconds:
+        raise ValueError("overlap_seconds must be smaller than segment_seconds.")
+    step = segment_seconds - overlap_seconds
+    segments = []
+    start = 0.0
+    while True:
+        if duration - start <= segment_seconds + overlap_seconds:
+            segments.append(Segment(len(segments), start, max(duration - start, 0.0)))
+            return segments
+        segments.append(Segment(len(segments), start, segment_seconds))
+        start += step
+
+
+def decode_segment(path: str, segment: Segment, rate: int = 16000) -> bytes:
+    """Decode one segment of a media file to 16-bit mono PCM with its own ffmpeg process."""
+    import ffmpeg
+
+    # -ss/-t before the input seek in the demuxer and stop decoding at the end of the range.
+    pcm, _ = (
+        ffmpeg
+        .input(path, ss=f"{segment.start:.3f}", t=f"{segment.length:.3f}")
+        .output("pipe:", format="s16le", acodec="pcm_s16le", ac=1, ar=rate)
+        .global_args("-nostdin", "-hide_banner", "-loglevel", "error")
+        .run(capture_stdout=True, capture_stderr=True)
+    )
+    return pcm
+
+
+def transcribe_segment(args: RivaArguments, path: str, segment: Segment, window_seconds: float = 60.0,
+                       overlap_seconds: float = 4.0, concurrency: int = 2) -> List[WordOffset]:
+    """Decode and recognize one segment, returning its stitched words in the time of the whole input.
+
+    Runs in a worker process. gRPC and ffmpeg errors are re-raised as RuntimeError, since
+    they do not survive being sent back to the parent process.
+    """
+    import ffmpeg
+    import grpc
+
+    from channelpool import get_pool
+    from offline import recognize_pcm_windows
+    from trans import build_recognition_config
+
+    try:
+        pcm = decode_segment(path, segment, args.sample_rate_hz)
+        layout = WavLayout(args.sample_rate_hz, 1, 2, 0, len(pcm))
+        return list(recognize_pcm_windows(
+            get_pool().get_asr_service(args), pcm, layout, build_recognition_config(args).config,
+            window_seconds=min(window_seconds, max(segment.length, 1.0)),
+            overlap_seconds=min(overlap_seconds, max(segment.length, 1.0) / 2),
+            concurrency=concurrency,
+            offset_ms=round(segment.start * 1000),
+        ))
+    except ffmpeg.Error as e:
+        raise RuntimeError(f"FFmpeg error in {segment.start:.0f}-{segment.end:.0f}s: {e.stderr.decode()}") from None
+    except grpc.RpcError as e:
+        raise RuntimeError(f"Riva error in {segment.start:.0f}-{segment.end:.0f}s: "
+                           f"{e.code().name}: {e.details()}") from None
+
+
+def group_words(words: Iterable[WordOffset], max_gap_ms: int = 700, max_words: int = 40) -> Iterator[ResultEvent]:
+    """Group a stream of words into final result events, breaking at pauses longer than `max_gap_ms`."""
+    utterance: List[WordOffset] = []
+
+    def event() -> ResultEvent:
+        return ResultEvent(
+            is_final=True,
+            text=" ".join(w.word for w in utterance),
+            confidence=sum(w.confidence for w in utterance) / len(utterance),
+            words=tuple(utterance),
+            audio_processed=utterance[-1].end_ms / 1000,
+        )
+
+    for word in words:
+        if utterance and (word.start_ms - utterance[-1].end_ms > max_gap_ms or len(utterance) >= max_words):
+            yield event()
+            utterance = []
+        utterance.append(word)
+    if utterance:
+        yield event()
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """Return the process-wide pool of segment workers, one per core.
+
+    Shared by every segmented transcription, so concurrent ones split the cores instead of
+    each starting a pool. Workers are spawned rather than forked, since gRPC does not
+    survive a fork of a process with open channels.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=os.cpu_count() or 2,
+                                            mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+
+def transcribe_segmented(
+        args: RivaArguments,
+        path: str,
+        duration: float,
+        segment_seconds: float = 300.0,
+        overlap_seconds: float = 4.0,
+        translate: bool = False,
+        executor: Optional[ProcessPoolExecutor] = None,
+        on_progress: Optional[Callable[[float], None]] = None,
+) -> Iterator[ResultEvent]:
+    """Transcribe a long media file as parallel segments and yield its final results in order.
+
+    Every segment is decoded by its own ffmpeg process and recognized in a worker process;
+    results are merged in time order, with words recognized twice where segments overlap
+    kept once. A segment's results are yielded as soon as every earlier segment is done.
+    `on_progress` is called with the fraction of segments finished. Closing the generator
+    cancels the segments that have not started. With `translate`, results are translated
+    with the batched, memoized translator of the decoupled mode.
+    """
+    segments = plan_segments(duration, segment_seconds, overlap_seconds)
+    executor = executor or get_executor()
+    futures: List[Future] = [executor.submit(transcribe_segment, args, path, segment) for segment in segments]
+    translator = None
+    if translate:
+        from translation import get_translator
+
+        translator = get_translator(args)
+
+    def stitched() -> Iterator[WordOffset]:
+        stitcher = WindowStitcher()
+        for segment, future in zip(segments, futures):
+            words = future.result()
+            if on_progress is not None:
+                # Segments finish out of order, so later ones may already be done too.
+                on_progress(sum(f.done() for f in futures) / len(futures))
+            next_start = segments[segment.index + 1].start if segment.index + 1 < len(segments) else None
+            yield from stitcher.add(round(segment.start * 1000), round(segment.end * 1000), words,
+                                    None if next_start is None else round(next_start * 1000))
+
+    try:
+        for event in group_words(stitched()):
+            if translator is not None:
+                event = replace(event, translation=translator.submit(event.text).result())
+            yield event
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def main() -> None:
+    from ffmpegstream import probe_duration
+
+    parser = argparse.ArgumentParser(
+        description="Transcribe a long video or audio file as parallel segments via Riva AI Services",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("input", help="Media file to transcribe.")
+    parser.add_argument("--server", default="localhost:50051", help="URI of the Riva server.")
+    parser.add_argument("--language-code", default="en-US", help="Language of the audio.")
+    parser.add_argument("--target-language-code", default=None, help="Translate transcripts to this language.")
+    parser.add_argument("--segment-seconds", type=float, default=300.0, help="Length of the segments.")
+    parser.add_argument("--overlap-seconds", type=float, default=4.0, help="Overlap between segments.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Segments processed at once.")
+    cli = parser.parse_args()
+
+    duration = probe_duration(cli.input)
+    if duration is None:
+        parser.error(f"cannot determine the duration of {cli.input}")
+    args = RivaArguments()
+    args.set_server(cli.server)
+    args.set_asr_language_code(cli.language_code)
+    if cli.target_language_code:
+        args.set_target_language_code(cli.target_language_code)
+    started = time.monotonic()
+    with ProcessPoolExecutor(max_workers=cli.workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        for event in transcribe_segmented(args, cli.input, duration, cli.segment_seconds, cli.overlap_seconds,
+                                          translate=cli.target_language_code is not None, executor=executor):
+            print_event(event)
+    elapsed = time.monotonic() - started
+    print(f"{duration:.0f}s of audio in {elapsed:.1f}s ({duration / elapsed:.1f}x real time)", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,536 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import replace
+from typing import AsyncIterable, AsyncIterator, Callable, Deque, Iterable, Iterator, Optional, Tuple
+
+import grpc
+
+from channelpool import get_aio_pool, get_pool
+from results import ResultEvent
+
+# Errors a server restart or network drop produces; anything else (e.g. a bad config) is raised.
+RETRYABLE_CODES = frozenset({
+    grpc.StatusCode.UNAVAILABLE,
+    grpc.StatusCode.UNKNOWN,
+    grpc.StatusCode.INTERNAL,
+    grpc.StatusCode.ABORTED,
+    grpc.StatusCode.CANCELLED,
+    grpc.StatusCode.DEADLINE_EXCEEDED,
+    grpc.StatusCode.RESOURCE_EXHAUSTED,
+})
+
+Recognizer = Callable[[object, Iterable[bytes]], Iterator[ResultEvent]]
+AsyncRecognizer = Callable[[object, AsyncIterable[bytes]], AsyncIterator[ResultEvent]]
+ReconnectCallback = Callable[[Exception, float], None]
+
+
+def is_retryable(error: Exception) -> bool:
+    return isinstance(error, grpc.RpcError) and error.code() in RETRYABLE_CODES
+
+
+def _drop_leading_words(text: str, dropped: int, total: int) -> str:
+    """Drop the first `dropped` of `total` recognized words from `text`.
+
+    The words of a speech-to-text translation result are those of its translation. Text whose
+    words do not line up with the recognized ones loses the same share of its words.
+    """
+    tokens = text.split()
+    if len(tokens) != total:
+        dropped = round(len(tokens) * dropped / total)
+    return " ".join(tokens[dropped:])
+
+
+class ReplayBuffer:
+    """Bounded buffer of captured audio, addressed by byte offset from the start of the session.
+
+    Audio stays buffered until a final result acknowledges it, so a new stream can be fed
+    the unacknowledged tail. When the buffer is full, `append` blocks until results free
+    space, which paces sources faster than real time. If the stream has been given all the
+    buffered audio and still frees nothing for `stall_seconds` (an utterance longer than the
+    buffer), the oldest audio is dropped instead and counted in `dropped_bytes`. With
+    `max_ahead_bytes`, `append` also waits while the buffer holds that much audio beyond the
+    offset last passed to `progress`, so a server that falls behind leaves the backlog with
+    the source and its own limits apply to it. Servers send nothing during silence, so while
+    no progress is reported the limit moves on at `bytes_per_second`, i.e. in real time.
+    """
+
+    def __init__(self, max_bytes: int, stall_seconds: float = 5.0, max_ahead_bytes: int = 0,
+                 bytes_per_second: int = 32000):
+        self.max_bytes = max_bytes
+        self.stall_seconds = stall_seconds
+        self.max_ahead_bytes = max_ahead_bytes
+        self.bytes_per_second = bytes_per_second
+        self.dropped_bytes = 0
+        self._chunks: Deque[Tuple[int, bytes]] = deque()  # (offset, chunk)
+        self._start = 0  # offset of the oldest buffered byte
+        self._end = 0  # offset just past the newest buffered byte
+        self._sent = 0  # offset just past the furthest byte handed to a stream
+        self._processed = 0  # offset up to which the server has reported processing audio
+        self._processed_at = time.monotonic()
+        self._finished = False
+        self._aborted = False
+        self._generation = 0
+        self._cond = threading.Condition()
+
+    def append(self, chunk: bytes) -> bool:
+        """Add captured audio. Returns False if the buffer was aborted."""
+        with self._cond:
+            while not self._aborted and self._read_ahead_delay() > 0:
+                self._cond.wait(self._read_ahead_delay())
+            stalled_at = None
+            while not self._aborted and self._chunks and self._end + len(chunk) - self._start > self.max_bytes:
+                if self._sent < self._end:
+                    stalled_at = None
+                    self._cond.wait()
+                    continue
+                now = time.monotonic()
+                if stalled_at is None:
+                    stalled_at = now
+                if now - stalled_at >= self.stall_seconds:
+                    self.dropped_bytes += self._drop_first()
+                else:
+                    self._cond.wait(stalled_at + self.stall_seconds - now)
+            if self._aborted:
+                return False
+            self._chunks.append((self._end, chunk))
+            self._end += len(chunk)
+            self._cond.notify_all()
+            return True
+
+    def _read_ahead_delay(self) -> float:
+        """Return how long `append` has to wait before the read-ahead limit lets audio in."""
+        if not self.max_ahead_bytes:
+            return 0.0
+        silent_bytes = (time.monotonic() - self._processed_at) * self.bytes_per_second
+        excess = self._end - self._processed - self.max_ahead_bytes - silent_bytes
+        return max(excess, 0.0) / self.bytes_per_second
+
+    def _drop_first(self) -> int:
+        offset, chunk = self._chunks.popleft()
+        self._start = offset + len(chunk)
+        return len(chunk)
+
+    def finish(self):
+        """Mark the end of the captured audio."""
+        with self._cond:
+            self._finished = True
+            self._cond.notify_all()
+
+    def abort(self):
+        """Stop all readers and writers."""
+        with self._cond:
+            self._aborted = True
+            self._cond.notify_all()
+
+    def ack(self, offset: int):
+        """Release the audio before `offset`, which no stream needs to see again."""
+        with self._cond:
+            self._release(offset)
+            self._cond.notify_all()
+
+    def progress(self, offset: int):
+        """Record that the server has processed the audio before `offset`, final or not."""
+        with self._cond:
+            self._processed = max(self._processed, offset)
+            self._processed_at = time.monotonic()
+            self._cond.notify_all()
+
+    def _release(self, offset: int):
+        while self._chunks and self._chunks[0][0] + len(self._chunks[0][1]) <= offset:
+            self._drop_first()
+
+    def replay_from(self, offset: int) -> Tuple[int, Iterator[bytes]]:
+        """Return where replay really starts and the audio from there on, live audio included.
+
+        The start is later than `offset` if that audio was dropped. Only the iterator of the
+        latest call keeps yielding; earlier ones stop, so a dead stream cannot steal audio.
+        """
+        with self._cond:
+            self._generation += 1
+            generation = self._generation
+            start = max(offset, self._start)
+            self._cond.notify_all()
+        return start, self._read(start, generation)
+
+    def _read(self, position: int, generation: int) -> Iterator[bytes]:
+        while True:
+            with self._cond:
+                while True:
+                    if self._aborted or generation != self._generation:
+                        return
+                    position = max(position, self._start)
+                    chunk = self._chunk_at(position)
+                    if chunk is not None:
+                        break
+                    if self._finished and position >= self._end:
+                        return
+                    self._cond.wait()
+                position += len(chunk)
+                self._sent = max(self._sent, position)
+                self._cond.notify_all()
+            yield chunk
+
+    def _chunk_at(self, position: int) -> Optional[bytes]:
+        for offset, chunk in self._chunks:
+            if offset + len(chunk) > position:
+                return chunk if offset == position else bytes(chunk)[position - offset:]
+        return None
+
+
+class AsyncReplayBuffer(ReplayBuffer):
+    """`ReplayBuffer` for a single event loop: `append` and reading await instead of blocking.
+
+    Everything runs on the loop's thread, so no lock is needed; waiters sleep on an event
+    that is replaced every time the buffer changes.
+    """
+
+    def __init__(self, max_bytes: int, stall_seconds: float = 5.0, max_ahead_bytes: int = 0,
+                 bytes_per_second: int = 32000):
+        super().__init__(max_bytes, stall_seconds, max_ahead_bytes, bytes_per_second)
+        self._changed = asyncio.Event()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def _wait(self, timeout: Optional[float] = None):
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def append(self, chunk: bytes) -> bool:
+        """Add captured audio. Returns False if the buffer was aborted."""
+        while not self._aborted and self._read_ahead_delay() > 0:
+            await self._wait(self._read_ahead_delay())
+        stalled_at = None
+        while not self._aborted and self._chunks and self._end + len(chunk) - self._start > self.max_bytes:
+            if self._sent < self._end:
+                stalled_at = None
+                await self._wait()
+                continue
+            now = time.monotonic()
+            if stalled_at is None:
+                stalled_at = now
+            if now - stalled_at >= self.stall_seconds:
+                self.dropped_bytes += self._drop_first()
+            else:
+                await self._wait(stalled_at + self.stall_seconds - now)
+        if self._aborted:
+            return False
+        self._chunks.append((self._end, chunk))
+        self._end += len(chunk)
+        self._notify()
+        return True
+
+    def finish(self):
+        self._finished = True
+        self._notify()
+
+    def abort(self):
+        self._aborted = True
+        self._notify()
+
+    def ack(self, offset: int):
+        self._release(offset)
+        self._notify()
+
+    def progress(self, offset: int):
+        self._processed = max(self._processed, offset)
+        self._processed_at = time.monotonic()
+        self._notify()
+
+    def replay_from(self, offset: int) -> Tuple[int, AsyncIterator[bytes]]:
+        self._generation += 1
+        start = max(offset, self._start)
+        self._notify()
+        return start, self._read(start, self._generation)
+
+    async def _read(self, position: int, generation: int) -> AsyncIterator[bytes]:
+        while True:
+            if self._aborted or generation != self._generation:
+                return
+            position = max(position, self._start)
+            chunk = self._chunk_at(position)
+            if chunk is None:
+                if self._finished and position >= self._end:
+                    return
+                await self._wait()
+                continue
+            position += len(chunk)
+            self._sent = max(self._sent, position)
+            self._notify()
+            yield chunk
+
+
+class ResilientSession:
+    """Runs a streaming recognition that survives stream failures.
+
+    Captured audio goes through a `ReplayBuffer` holding up to `buffer_seconds` of audio that
+    no final result has covered yet. When the stream fails with a retryable gRPC error the
+    pooled channel is replaced, and after an exponential backoff a new stream is started with
+    the buffered tail, so nothing said during the outage is lost. Result times (audio
+    processed and word offsets) are shifted so that they count from the start of the session
+    across reconnects. Interims of the failed stream are simply superseded by the new stream's.
+    Gives up after `max_retries` consecutive failures without a single result.
+
+    With `rollover_seconds`, long sessions are moved to a fresh stream after that much audio,
+    so server-side stream state does not keep growing. The handover happens after the next
+    final result, or after `rollover_grace_seconds` more audio if none comes. The new stream
+    starts `overlap_ms` before the handover point so the recognizer has context, and what it
+    recognizes again in the overlap is dropped; this needs word offsets, so without them the
+    new stream starts exactly at the handover point instead.
+
+    With `read_ahead_seconds`, the session takes at most that much audio from `chunks` beyond
+    what the server has reported processing in any result, interim or final. gRPC flow control
+    alone would let a stalled server absorb minutes of audio, so without this a backlog never
+    reaches the source, e.g. a WebSocketStream whose overflow policy should apply to it. While
+    the server reports nothing, as during silence, audio is taken in real time.
+    """
+
+    def __init__(
+            self,
+            args,
+            recognize: Recognizer,
+            buffer_seconds: float = 30.0,
+            initial_backoff: float = 0.5,
+            max_backoff: float = 10.0,
+            max_retries: int = 10,
+            on_reconnect: Optional[ReconnectCallback] = None,
+            rollover_seconds: float = 0.0,
+            rollover_grace_seconds: float = 30.0,
+            overlap_ms: float = 500.0,
+            read_ahead_seconds: float = 0.0,
+    ):
+        self.args = args
+        self.recognize = recognize
+        self.bytes_per_second = 2 * args.sample_rate_hz
+        self.buffer_bytes = int(buffer_seconds * self.bytes_per_second) & ~1
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.max_retries = max_retries
+        self.on_reconnect = on_reconnect
+        self.rollover_bytes = int(rollover_seconds * self.bytes_per_second) & ~1
+        self.rollover_grace_bytes = int(rollover_grace_seconds * self.bytes_per_second) & ~1
+        self.overlap_bytes = int(overlap_ms / 1000 * self.bytes_per_second) & ~1
+        self.read_ahead_bytes = int(read_ahead_seconds * self.bytes_per_second) & ~1
+        self.reconnects = 0
+        self.rollovers = 0
+        self.buffer: Optional[ReplayBuffer] = None
+
+    def _pump(self, chunks: Iterable[bytes], buffer: ReplayBuffer, errors: list):
+        try:
+            for chunk in chunks:
+                if not buffer.append(chunk):
+                    return
+        except Exception as e:
+            errors.append(e)
+        finally:
+            buffer.finish()
+
+    def _shift(self, event: ResultEvent, base_seconds: float) -> ResultEvent:
+        if not base_seconds:
+            return event
+        base_ms = round(base_seconds * 1000)
+        return replace(
+            event,
+            audio_processed=event.audio_processed + base_seconds,
+            words=tuple(replace(w, start_ms=w.start_ms + base_ms, end_ms=w.end_ms + base_ms) for w in event.words),
+        )
+
+    def _acked_offset(self, event: ResultEvent) -> int:
+        """Return the session offset up to which a (shifted) final result covers the audio."""
+        seconds = event.words[-1].end_ms / 1000 if event.words else event.audio_processed
+        return int(seconds * self.bytes_per_second) & ~1
+
+    def _suppress(self, event: ResultEvent, handover_ms: float) -> Optional[ResultEvent]:
+        """Drop what a new stream recognized again in the overlap before `handover_ms`."""
+        if event.audio_processed * 1000 <= handover_ms:
+            return None
+        if not event.words:
+            return event
+        kept = tuple(w for w in event.words if (w.start_ms + w.end_ms) / 2 > handover_ms)
+        if not kept:
+            return None
+        dropped = len(event.words) - len(kept)
+        if not dropped:
+            return event
+        return replace(
+            event,
+            text=_drop_leading_words(event.text, dropped, len(event.words)),
+            translation=_drop_leading_words(event.translation, dropped, len(event.words)),
+            words=kept,
+        )
+
+    def _prepare(self, event: ResultEvent, base_seconds: float, handover_ms: Optional[float]) -> Optional[ResultEvent]:
+        event = self._shift(event, base_seconds)
+        return event if handover_ms is None else self._suppress(event, handover_ms)
+
+    def _should_roll_over(self, event: ResultEvent, base: int) -> bool:
+        if not self.rollover_bytes:
+            return False
+        stream_bytes = int(event.audio_processed * self.bytes_per_second) - base
+        # Prefer to hand over right after a final result, at a natural pause.
+        return (event.is_final and stream_bytes >= self.rollover_bytes) \
+            or stream_bytes >= self.rollover_bytes + self.rollover_grace_bytes
+
+    def _rollover_point(self, event: ResultEvent, acked: int) -> Tuple[int, Optional[float]]:
+        """Return where the next stream starts and the handover point of its overlap, if any."""
+        self.rollovers += 1
+        overlap = self.overlap_bytes if event.is_final and event.words else 0
+        handover_ms = acked * 1000 / self.bytes_per_second if overlap else None
+        return max(0, acked - overlap), handover_ms
+
+    def _retry_delay(self, error: Exception, failures: int) -> float:
+        """Return the backoff before reconnecting after `error`, or raise it if it is final."""
+        if not is_retryable(error) or failures >= self.max_retries:
+            raise error
+        self.reconnects += 1
+        delay = min(self.max_backoff, self.initial_backoff * 2 ** failures)
+        return delay * random.uniform(0.8, 1.2)
+
+    def results(self, chunks: Iterable[bytes]) -> Iterator[ResultEvent]:
+        buffer = self.buffer = ReplayBuffer(self.buffer_bytes, max_ahead_bytes=self.read_ahead_bytes,
+                                            bytes_per_second=self.bytes_per_second)
+        source_errors: list = []
+        threading.Thread(target=self._pump, args=(chunks, buffer, source_errors),
+                         name="replay-buffer", daemon=True).start()
+        acked = 0
+        replay_from = 0
+        handover_ms = None
+        failures = 0
+        try:
+            while True:
+                base, audio = buffer.replay_from(replay_from)
+                base_seconds = base / self.bytes_per_second
+                rollover = False
+                results = self.recognize(self.args, audio)
+                try:
+                    for event in results:
+                        failures = 0
+                        buffer.progress(base + int(event.audio_processed * self.bytes_per_second))
+                        event = self._prepare(event, base_seconds, handover_ms)
+                        if event is None:
+                            continue
+                        if event.is_final:
+                            acked = max(acked, self._acked_offset(event))
+                            buffer.ack(acked - self.overlap_bytes)
+                        yield event
+                        if self._should_roll_over(event, base):
+                            rollover = True
+                            break
+                    if not rollover:
+                        break
+                    replay_from, handover_ms = self._rollover_point(event, acked)
+                except Exception as e:
+                    delay = self._retry_delay(e, failures)
+                    failures += 1
+                    replay_from, handover_ms = acked, None
+                    get_pool().invalidate(self.args)
+                    if self.on_reconnect is not None:
+                        self.on_reconnect(e, delay)
+                    time.sleep(delay)
+                finally:
+                    if hasattr(results, "close"):
+                        results.close()
+        finally:
+            buffer.abort()
+        if source_errors:
+            raise source_errors[0]
+
+
+def resilient_results(
+        args,
+        chunks: Iterable[bytes],
+        recognize: Recognizer,
+        on_reconnect: Optional[ReconnectCallback] = None,
+) -> Iterator[ResultEvent]:
+    """Stream `chunks` through `recognize(args, chunks)`, reconnecting and replaying on failure.
+
+    Streams are rolled over every `args.stream_rollover_seconds` of audio, if set.
+    """
+    rollover_seconds = getattr(args, "stream_rollover_seconds", 0.0)
+    return ResilientSession(args, recognize, on_reconnect=on_reconnect,
+                            rollover_seconds=rollover_seconds).results(chunks)
+
+
+class AsyncResilientSession(ResilientSession):
+    """`ResilientSession` for a recognizer that is an async generator, run on one event loop.
+
+    Reconnects, replay and rollover work the same; the session costs a task for feeding
+    the buffer instead of a thread, and failed channels are replaced in the asyncio pool.
+    """
+
+    async def _pump_async(self, chunks: AsyncIterable[bytes], buffer: AsyncReplayBuffer, errors: list):
+        try:
+            async for chunk in chunks:
+                if not await buffer.append(chunk):
+                    return
+        except Exception as e:
+            errors.append(e)
+        finally:
+            buffer.finish()
+
+    async def results(self, chunks: AsyncIterable[bytes]) -> AsyncIterator[ResultEvent]:
+        buffer = self.buffer = AsyncReplayBuffer(self.buffer_bytes, max_ahead_bytes=self.read_ahead_bytes,
+                                                 bytes_per_second=self.bytes_per_second)
+        source_errors: list = []
+        pump = asyncio.ensure_future(self._pump_async(chunks, buffer, source_errors))
+        acked = 0
+        replay_from = 0
+        handover_ms = None
+        failures = 0
+        try:
+            while True:
+                base, audio = buffer.replay_from(replay_from)
+                base_seconds = base / self.bytes_per_second
+                rollover = False
+                results = self.recognize(self.args, audio)
+                try:
+                    async for event in results:
+                        failures = 0
+                        buffer.progress(base + int(event.audio_processed * self.bytes_per_second))
+                        event = self._prepare(event, base_seconds, handover_ms)
+                        if event is None:
+                            continue
+                        if event.is_final:
+                            acked = max(acked, self._acked_offset(event))
+                            buffer.ack(acked - self.overlap_bytes)
+                        yield event
+                        if self._should_roll_over(event, base):
+                            rollover = True
+                            break
+                    if not rollover:
+                        break
+                    replay_from, handover_ms = self._rollover_point(event, acked)
+                except Exception as e:
+                    delay = self._retry_delay(e, failures)
+                    failures += 1
+                    replay_from, handover_ms = acked, None
+                    await get_aio_pool().invalidate(self.args)
+                    if self.on_reconnect is not None:
+                        self.on_reconnect(e, delay)
+                    await asyncio.sleep(delay)
+                finally:
+                    await results.aclose()
+        finally:
+            buffer.abort()
+            pump.cancel()
+        if source_errors:
+            raise source_errors[0]
+
+
+def resilient_results_async(
+        args,
+        chunks: AsyncIterable[bytes],
+        recognize: AsyncRecognizer,
+        on_reconnect: Optional[ReconnectCallback] = None,
+        read_ahead_seconds: float = 0.0,
+) -> AsyncIterator[ResultEvent]:
+    """Async counterpart of `resilient_results` for `AsyncRecognizer`s and async audio sources."""
+    rollover_seconds = getattr(args, "stream_rollover_seconds", 0.0)
+    return AsyncResilientSession(args, recognize, on_reconnect=on_reconnect, rollover_seconds=rollover_seconds,
+                                 read_ahead_seconds=read_ahead_seconds).results(chunks)
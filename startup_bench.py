@@ -0,0 +1,108 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import List, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Modules that must not be loaded before the GUI window shows.
+DEFERRED_MODULES = ("ffmpeg", "grpc", "numpy", "pyaudio", "riva.client")
+
+_FIRST_WINDOW = """
+import tkinter as tk
+root = tk.Tk()
+import gui
+app = gui.AudioConverterApp(root)
+root.wait_visibility(root)
+print("shown", flush=True)
+root.destroy()
+"""
+
+_IMPORTS = """
+import json, sys
+import gui
+import trans
+trans.RivaArguments()
+print(json.dumps(sorted(m for m in {modules!r} if m in sys.modules)))
+"""
+
+
+def _run_python(code_or_args: List[str], wait_for: Optional[str] = None) -> float:
+    """Run the interpreter and return the seconds until it prints `wait_for`, or exits."""
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, *code_or_args], cwd=HERE, stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE, text=True)
+    elapsed = None
+    if wait_for is not None:
+        for line in process.stdout:
+            if line.strip() == wait_for:
+                elapsed = time.perf_counter() - started
+                break
+    _, stderr = process.communicate()
+    if elapsed is None:
+        elapsed = time.perf_counter() - started
+    if process.returncode != 0:
+        raise RuntimeError(f"{' '.join(code_or_args[:2])} failed:\n{stderr.strip()}")
+    return elapsed
+
+
+def time_help(script: str, runs: int) -> float:
+    """Return the median seconds `script --help` takes."""
+    return statistics.median(_run_python([script, "--help"]) for _ in range(runs))
+
+
+def time_first_window(runs: int) -> float:
+    """Return the median seconds from starting the interpreter to the GUI window being visible."""
+    return statistics.median(_run_python(["-c", _FIRST_WINDOW], wait_for="shown") for _ in range(runs))
+
+
+def eager_modules() -> List[str]:
+    """Return the deferred modules that importing the GUI and creating RivaArguments loads anyway."""
+    output = subprocess.run([sys.executable, "-c", _IMPORTS.format(modules=DEFERRED_MODULES)], cwd=HERE,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Check that the GUI and command-line tools start within a time budget",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--runs", type=int, default=5, help="Runs per measurement; the median is reported.")
+    parser.add_argument("--help-budget", type=float, default=1.0, help="Seconds allowed for --help.")
+    parser.add_argument("--window-budget", type=float, default=1.5, help="Seconds allowed until the window shows.")
+    parser.add_argument("--scripts", nargs="+", default=["trans_any_mic.py", "gateway.py", "loadtest.py"],
+                        help="Scripts whose --help is timed.")
+    args = parser.parse_args()
+
+    failures = []
+    eager = eager_modules()
+    print(f"modules loaded before the window: {', '.join(eager) or 'none of ' + ', '.join(DEFERRED_MODULES)}")
+    if eager:
+        failures.append(f"GUI startup imports {', '.join(eager)}")
+
+    for script in args.scripts:
+        seconds = time_help(script, args.runs)
+        print(f"{script} --help: {seconds * 1000:.0f} ms (budget {args.help_budget * 1000:.0f} ms)")
+        if seconds > args.help_budget:
+            failures.append(f"{script} --help took {seconds:.2f}s")
+
+    if sys.platform == "win32" or sys.platform == "darwin" or os.environ.get("DISPLAY"):
+        seconds = time_first_window(args.runs)
+        print(f"time to first window: {seconds * 1000:.0f} ms (budget {args.window_budget * 1000:.0f} ms)")
+        if seconds > args.window_budget:
+            failures.append(f"the window took {seconds:.2f}s to show")
+    else:
+        print("time to first window: skipped, no display")
+
+    for failure in failures:
+        print(f"over budget: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+import gateway
+from fake_riva_server import FakeRecognizer, start_in_background
+from trans import RivaArguments
+from websocketstream import WebSocketStream
+
+SAMPLE_RATE_HZ = 16000
+MESSAGE_MS = 100
+MAX_BUFFERED_MS = 1000
+STALLED_SESSION_SECONDS = 2.0
+# Audio the session takes from the stalled server's stream before the stream's limit applies:
+# its read-ahead, plus audio in real time while the server reports nothing.
+SLACK_MS = (gateway.READ_AHEAD_SECONDS + STALLED_SESSION_SECONDS) * 1000 + 500
+
+
+class FakeWebSocket:
+    """A client that sends `segments` of (milliseconds, speech) as fast as the gateway reads them.
+
+    Speech is a constant non-zero signal, anything else digital silence. After the last
+    segment the client ends the audio if `end` is set, then waits.
+    """
+
+    def __init__(self, segments, end: bool = False):
+        self.messages = [speech for ms, speech in segments for _ in range(ms // MESSAGE_MS)]
+        self.end = end
+        self.accepted_ms = 0
+        self.results = []
+
+    async def receive_bytes(self) -> bytes:
+        if not self.messages:
+            if self.end:
+                self.end = False
+                return b""
+            await asyncio.Event().wait()
+        await asyncio.sleep(0)
+        speech = self.messages.pop(0)
+        self.accepted_ms += MESSAGE_MS
+        return (b"\x00\x01" if speech else b"\x00\x00") * (SAMPLE_RATE_HZ * MESSAGE_MS // 1000)
+
+    async def send_json(self, data):
+        self.results.append(data)
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def stalled_server():
+    address, stop = start_in_background(FakeRecognizer(stall=True))
+    yield address
+    stop()
+
+
+@pytest.fixture
+def quiet_server():
+    address, stop = start_in_background(FakeRecognizer(quiet_silence=True))
+    yield address
+    stop()
+
+
+def run_session(address: str, overflow: str, websocket: FakeWebSocket, seconds: float,
+                monkeypatch) -> "tuple[bool, WebSocketStream]":
+    """Run one gateway session against `address` for up to `seconds`.
+
+    Returns whether the session ended by itself, and its stream.
+    """
+    streams = []
+
+    class RecordedStream(WebSocketStream):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            streams.append(self)
+
+    monkeypatch.setattr(gateway, "WebSocketStream", RecordedStream)
+    args = RivaArguments()
+    args.set_server(address)
+    transcription_gateway = gateway.TranscriptionGateway(args, max_buffered_ms=MAX_BUFFERED_MS, overflow=overflow)
+
+    async def run() -> bool:
+        session = asyncio.ensure_future(transcription_gateway._run_session(websocket))
+        done, _ = await asyncio.wait([session], timeout=seconds)
+        session.cancel()
+        await asyncio.gather(session, return_exceptions=True)
+        await transcription_gateway.shutdown()
+        return bool(done)
+
+    return asyncio.run(run()), streams[0]
+
+
+def test_stalled_backend_blocks_client_at_buffer_limit(stalled_server, monkeypatch):
+    websocket = FakeWebSocket([(30000, False)])
+    _, stream = run_session(stalled_server, "block", websocket, STALLED_SESSION_SECONDS, monkeypatch)
+    assert websocket.accepted_ms <= MAX_BUFFERED_MS + SLACK_MS
+    assert stream.queue_depth_ms >= MAX_BUFFERED_MS - MESSAGE_MS
+    assert stream.dropped_bytes == 0
+
+
+def test_stalled_backend_drops_beyond_buffer_limit(stalled_server, monkeypatch):
+    websocket = FakeWebSocket([(30000, False)])
+    _, stream = run_session(stalled_server, "drop_newest", websocket, STALLED_SESSION_SECONDS, monkeypatch)
+    assert websocket.accepted_ms == 30000
+    assert stream.dropped_ms >= 30000 - MAX_BUFFERED_MS - SLACK_MS
+
+
+def test_session_continues_through_silence_without_results(quiet_server, monkeypatch):
+    segments = [(1000, True), (4000, False), (1000, True)]
+    websocket = FakeWebSocket(segments, end=True)
+    ended, stream = run_session(quiet_server, "block", websocket, 15.0, monkeypatch)
+    assert ended
+    assert stream.dropped_bytes == 0
+    finals = [result for result in websocket.results if result.get("is_final")]
+    assert finals[-1]["audio_processed"] == pytest.approx(sum(ms for ms, _ in segments) / 1000)
@@ -1,5 +1,28 @@
-import riva.client
-import riva.client.audio_io
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, Optional
+
+from metrics import get_recorder
+from results import ResultEvent, ResultSink, events_from_responses, print_event
+
+# riva.client, grpc and PortAudio take a noticeable time to load, so they are imported on
+# first use; creating RivaArguments (e.g. while the GUI starts) touches none of them.
+if TYPE_CHECKING:
+    import riva.client
+
+TRANSLATION_MODES = ("s2t", "decoupled")
+
+# Fields that describe one run rather than a reusable configuration; profiles leave them out.
+RUNTIME_FIELDS = ("list_devices",)
+_MISSING = object()
+
+def _frozen(value):
+    """Return `value` with lists turned into tuples, recursively."""
+    if isinstance(value, list):
+        return tuple(_frozen(item) for item in value)
+    return value
 
 class RivaArguments:
     def __init__(
@@ -8,8 +31,10 @@ class RivaArguments:
             profanity_filter: bool = True,
             word_time_offsets: bool = False
     ):
-        default_device_info = riva.client.audio_io.get_default_input_device_info()
-        self.input_device: int = None if default_device_info is None else default_device_info['index']
+        self._profile_hash: Optional[str] = None
+        # Name of the input device, as DeviceRegistry.find takes it; None records from the default
+        # device. A name rather than an index, which a rescan of the devices may change.
+        self.input_device: Optional[str] = None
         self.list_devices: bool = False
 
         self.word_time_offsets: bool = False if word_time_offsets else None
@@ -19,15 +44,18 @@ class RivaArguments:
         self.server: str = "localhost:50051"
         self.ssl_cert: str = None
         self.use_ssl: bool = False
-        self.metadata: list = []
+        self.metadata: tuple = ()
         self.sample_rate_hz: int = 16000
+        # Capture format of the input device; 0 picks one the device supports and resamples.
+        self.device_sample_rate_hz: int = 0
+        self.device_channel_count: int = 0
         self.file_streaming_chunk: int = 1600
         self.target_language_code: str = "fr-FR"
         self.automatic_punctuation: bool = False
         self.no_verbatim_transcripts: bool = False
         self.asr_language_code: str = "en-US"
         self.model_name: str = ""
-        self.boosted_lm_words: list = []
+        self.boosted_lm_words: tuple = ()
         self.boosted_lm_score: float = 4.0
         self.speaker_diarization: bool = False
         self.diarization_max_speakers: int = 3
@@ -38,11 +66,65 @@ class RivaArguments:
         self.stop_history_eou: int = -1
         self.stop_threshold_eou: float = -1.0
         self.custom_configuration: str = ""
+        self.vad_enabled: bool = False
+        # "s2t" translates every result in the speech-to-text stream; "decoupled" runs ASR on its
+        # own and sends finals, plus stable interims at most every interim_translation_ms, to NMT.
+        self.translation_mode: str = "s2t"
+        self.interim_translation_ms: int = 1000
+        # Long sessions move to a fresh stream after this much audio; 0 keeps one stream.
+        self.stream_rollover_seconds: float = 600.0
+
+    def __setattr__(self, name, value):
+        # Any change to a field invalidates the hash that the built configs are cached under.
+        # Lists are stored as tuples, since changing one in place would leave the hash stale.
+        if not name.startswith("_"):
+            value = _frozen(value)
+            if getattr(self, name, _MISSING) != value:
+                object.__setattr__(self, "_profile_hash", None)
+        object.__setattr__(self, name, value)
+
+    def to_dict(self) -> dict:
+        """Return the fields as plain JSON-serializable data, as stored in a profile."""
+        return {name: value for name, value in vars(self).items()
+                if not name.startswith("_") and name not in RUNTIME_FIELDS}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "RivaArguments":
+        """Build arguments from `to_dict` output, validating every field through its setter."""
+        args = cls()
+        for name, value in data.items():
+            if name.startswith("_") or name in RUNTIME_FIELDS or not hasattr(args, name):
+                continue
+            setter = getattr(args, f"set_{name}", None)
+            if setter is not None and value is not None:
+                setter(value)
+            else:
+                setattr(args, name, value)
+        return args
+
+    def profile_hash(self) -> str:
+        """Return a digest of all fields; it only changes when a field does."""
+        if self._profile_hash is None:
+            encoded = json.dumps(self.to_dict(), sort_keys=True, default=str).encode()
+            self._profile_hash = hashlib.blake2b(encoded, digest_size=16).hexdigest()
+        return self._profile_hash
+
+    def probe_input_device(self) -> Optional[int]:
+        """Resolve the input device and return its current index, or None if there is none.
+
+        The first call initializes PortAudio, which probes every device and can take a while,
+        so callers such as the GUI run it in the background; the device registry keeps the
+        result for every later caller.
+        """
+        from device_registry import get_registry
+
+        device = get_registry().resolve(self.input_device)
+        return None if device is None else device.index
 
     # Setters for each property
-    def set_input_device(self, device_index: int):
-        """Set input audio device index."""
-        self.input_device = device_index
+    def set_input_device(self, device: Optional[str]):
+        """Set the input audio device by name; None or empty is the system default device."""
+        self.input_device = None if device in (None, "") else device
 
     def set_list_devices(self, list_devices: bool):
         """Enable or disable listing audio devices."""
@@ -68,16 +150,18 @@ class RivaArguments:
         self.server = server
 
     def set_ssl_cert(self, cert_path: str):
-        """Set SSL certificate file path."""
-        self.ssl_cert = cert_path
+        """Set SSL certificate file path; empty means none."""
+        self.ssl_cert = cert_path or None
 
     def set_use_ssl(self, use_ssl: bool):
         """Enable or disable SSL encryption."""
         self.use_ssl = use_ssl
 
-    def set_metadata(self, metadata: list):
-        """Set HTTP metadata headers."""
-        self.metadata = metadata
+    def set_metadata(self, metadata: Iterable):
+        """Set gRPC metadata as (key, value) pairs or a "key=value, key=value" string."""
+        if isinstance(metadata, str):
+            metadata = [item.split("=", 1) for item in metadata.split(",") if item.strip()]
+        self.metadata = tuple((str(key).strip(), str(value).strip()) for key, value in metadata)
 
     def set_sample_rate_hz(self, sample_rate: int):
         """Set audio sample rate (frames per second)."""
@@ -86,6 +170,20 @@ class RivaArguments:
         else:
             raise ValueError("sample_rate_hz must be greater than 0.")
 
+    def set_device_sample_rate_hz(self, sample_rate: int):
+        """Set the capture sample rate of the input device (0 for automatic)."""
+        if sample_rate >= 0:
+            self.device_sample_rate_hz = sample_rate
+        else:
+            raise ValueError("device_sample_rate_hz must not be negative.")
+
+    def set_device_channel_count(self, channels: int):
+        """Set the number of channels captured from the input device (0 for automatic)."""
+        if channels >= 0:
+            self.device_channel_count = channels
+        else:
+            raise ValueError("device_channel_count must not be negative.")
+
     def set_file_streaming_chunk(self, chunk_size: int):
         """Set the maximum audio chunk size."""
         if chunk_size > 0:
@@ -113,9 +211,11 @@ class RivaArguments:
         """Set the ASR model name."""
         self.model_name = name
 
-    def set_boosted_lm_words(self, words: list):
-        """Set words to boost for recognition."""
-        self.boosted_lm_words = words
+    def set_boosted_lm_words(self, words: Iterable[str]):
+        """Set words to boost for recognition, as a sequence or a comma-separated string."""
+        if isinstance(words, str):
+            words = words.split(",")
+        self.boosted_lm_words = tuple(word.strip() for word in words if word.strip())
 
     def set_boosted_lm_score(self, score: float):
         """Set boost score for language model words."""
@@ -163,15 +263,57 @@ class RivaArguments:
         """Set custom ASR configurations."""
         self.custom_configuration = config
 
-def trans(args: RivaArguments, audio_chunk_iterator) -> None:
-    args = RivaArguments(profanity_filter = True)
-    if args.list_devices:
-        riva.client.audio_io.list_input_devices()
-        return
-    auth = riva.client.Auth(args.ssl_cert, args.use_ssl, args.server, args.metadata)
-    # asr_service = riva.client.ASRService(auth)
-    nmt_client = riva.client.NeuralMachineTranslationClient(auth)
-    
+    def set_vad_enabled(self, enabled: bool):
+        """Enable or disable the client-side voice activity gate."""
+        self.vad_enabled = enabled
+
+    def set_translation_mode(self, mode: str):
+        """Set the translation pipeline, "s2t" or "decoupled"."""
+        if mode not in TRANSLATION_MODES:
+            raise ValueError(f"translation mode must be one of {TRANSLATION_MODES}, got {mode!r}")
+        self.translation_mode = mode
+
+    def set_stream_rollover_seconds(self, seconds: float):
+        """Set how much audio one stream carries before the session rolls over to a new one."""
+        if seconds < 0:
+            raise ValueError("stream rollover cannot be negative")
+        self.stream_rollover_seconds = seconds
+
+    def set_interim_translation_ms(self, interval_ms: int):
+        """Set the minimum time between interim translations in decoupled mode; 0 translates finals only."""
+        if interval_ms < 0:
+            raise ValueError("interim translation interval cannot be negative")
+        self.interim_translation_ms = interval_ms
+
+_CONFIG_CACHE_SIZE = 32
+_configs: "OrderedDict[tuple, object]" = OrderedDict()
+_configs_lock = threading.Lock()
+
+def _cached_config(kind: str, args: RivaArguments, build):
+    """Return the config `build(args)` made for arguments with the same profile hash."""
+    key = (kind, args.profile_hash())
+    with _configs_lock:
+        config = _configs.get(key)
+        if config is not None:
+            _configs.move_to_end(key)
+            return config
+    config = build(args)
+    with _configs_lock:
+        _configs[key] = config
+        while len(_configs) > _CONFIG_CACHE_SIZE:
+            _configs.popitem(last=False)
+    return config
+
+def build_recognition_config(args: RivaArguments) -> "riva.client.StreamingRecognitionConfig":
+    """Return the streaming ASR config described by `args`.
+
+    Configs are built once per profile hash and shared, so treat them as read-only.
+    """
+    return _cached_config("asr", args, _build_recognition_config)
+
+def _build_recognition_config(args: RivaArguments) -> "riva.client.StreamingRecognitionConfig":
+    import riva.client
+
     config = riva.client.StreamingRecognitionConfig(
         config=riva.client.RecognitionConfig(
             encoding=riva.client.AudioEncoding.LINEAR_PCM,
@@ -183,6 +325,8 @@ def trans(args: RivaArguments, audio_chunk_iterator) -> None:
             verbatim_transcripts=not args.no_verbatim_transcripts,
             sample_rate_hertz=args.sample_rate_hz,
             audio_channel_count=1,
+            # Rolling over to a new stream removes the overlap it re-recognizes by word times.
+            enable_word_time_offsets=bool(args.word_time_offsets) or args.stream_rollover_seconds > 0,
         ),
         interim_results=True,
     )
@@ -201,19 +345,103 @@ def trans(args: RivaArguments, audio_chunk_iterator) -> None:
         config,
         args.custom_configuration
     )
+    return config
+
+def build_streaming_config(args: RivaArguments) -> "riva.client.StreamingTranslateSpeechToTextConfig":
+    """Return the speech-to-text translation streaming config described by `args` (read-only)."""
+    return _cached_config("s2t", args, _build_streaming_config)
 
-    config = riva.client.StreamingTranslateSpeechToTextConfig(
-        asr_config=config,
+def _build_streaming_config(args: RivaArguments) -> "riva.client.StreamingTranslateSpeechToTextConfig":
+    import riva.client
+
+    return riva.client.StreamingTranslateSpeechToTextConfig(
+        asr_config=build_recognition_config(args),
         translation_config=riva.client.TranslationConfig(
             source_language_code=args.asr_language_code,
             target_language_code=args.target_language_code,
         ),
     )
 
-    riva.client.print_streaming(
-        responses=nmt_client.streaming_s2t_response_generator(
-            audio_chunks=audio_chunk_iterator,
-            streaming_config=config,
-        ),
-        show_intermediate=True,
-    )
\ No newline at end of file
+def stream_results(args: RivaArguments, audio_chunk_iterator) -> Iterator[ResultEvent]:
+    """Stream audio to Riva and yield a translated result event for every interim and final result.
+
+    Uses the pipeline selected by `args.translation_mode`.
+    """
+    if args.translation_mode == "decoupled":
+        return stream_decoupled(args, audio_chunk_iterator)
+    return stream_s2t(args, audio_chunk_iterator)
+
+def stream_s2t(args: RivaArguments, audio_chunk_iterator) -> Iterator[ResultEvent]:
+    """Stream audio to Riva speech-to-text translation, which translates every result."""
+    from channelpool import get_pool
+
+    nmt_client = get_pool().get_nmt_client(args)
+    timeline = get_recorder().track(audio_chunk_iterator, args.sample_rate_hz)
+    responses = nmt_client.streaming_s2t_response_generator(
+        audio_chunks=iter(timeline),
+        streaming_config=build_streaming_config(args),
+    )
+    for event in events_from_responses(responses, translated=True):
+        timeline.observe(event)
+        yield event
+
+def stream_transcripts(args: RivaArguments, audio_chunk_iterator) -> Iterator[ResultEvent]:
+    """Stream audio to Riva ASR without translation and yield a result event per result."""
+    from channelpool import get_pool
+
+    asr_service = get_pool().get_asr_service(args)
+    timeline = get_recorder().track(audio_chunk_iterator, args.sample_rate_hz)
+    responses = asr_service.streaming_response_generator(
+        audio_chunks=iter(timeline),
+        streaming_config=build_recognition_config(args),
+    )
+    for event in events_from_responses(responses):
+        timeline.observe(event)
+        yield event
+
+def stream_decoupled(args: RivaArguments, audio_chunk_iterator) -> Iterator[ResultEvent]:
+    """Stream audio to Riva ASR and translate its results separately with batched, memoized NMT.
+
+    Interims that are not translated carry only the transcript.
+    """
+    from translation import get_translator, translate_events
+
+    return translate_events(
+        stream_transcripts(args, audio_chunk_iterator),
+        get_translator(args),
+        interim_interval_ms=args.interim_translation_ms,
+    )
+
+def trans(
+        args: RivaArguments,
+        audio_chunk_iterator,
+        on_result: Optional[ResultSink] = None,
+        on_reconnect: Optional[Callable[[Exception, float], None]] = None,
+) -> None:
+    """Transcribe and translate `audio_chunk_iterator`, passing every result event to `on_result`.
+
+    Without a sink, final results are printed to stdout. If the stream fails, it is
+    reconnected and the audio not yet covered by a final result is sent again; `on_reconnect`
+    is called with the error and the backoff delay before each attempt.
+    """
+    from session import resilient_results
+
+    if args.list_devices:
+        from device_registry import list_input_devices
+
+        list_input_devices()
+        return
+    sink = print_event if on_result is None else on_result
+    if args.translation_mode == "decoupled":
+        from translation import get_translator, translate_events
+
+        # Translated after the session has removed what a rollover recognized twice.
+        events = translate_events(
+            resilient_results(args, audio_chunk_iterator, stream_transcripts, on_reconnect),
+            get_translator(args),
+            interim_interval_ms=args.interim_translation_ms,
+        )
+    else:
+        events = resilient_results(args, audio_chunk_iterator, stream_s2t, on_reconnect)
+    for event in events:
+        sink(event)
@@ -2,21 +2,57 @@
 # SPDX-License-Identifier: MIT
 
 import argparse
+import sys
+import threading
+import time
+from dataclasses import replace
+from typing import Callable, Iterator, List, Optional
 
 import riva.client
 from riva.client.argparse_utils import add_asr_config_argparse_parameters, add_connection_argparse_parameters
 
-import riva.client.audio_io
+from channelpool import get_pool
+from device_registry import get_registry, list_input_devices
+from metrics import MetricsExporter, get_recorder
+from results import ResultEvent, ResultSink, TimeOrderedMerger, events_from_responses, print_event
+from session import resilient_results
 
 def parse_args() -> argparse.Namespace:
-    default_device_info = riva.client.audio_io.get_default_input_device_info()
-    default_device_index = None if default_device_info is None else default_device_info['index']
     parser = argparse.ArgumentParser(
         description="Streaming transcription from microphone via Riva AI Services",
         formatter_class=argparse.ArgumentDefaultsHelpFormatter,
     )
-    parser.add_argument("--input-device", type=int, default=default_device_index, help="An input audio device to use.")
+    parser.add_argument(
+        "--input-device",
+        nargs="+",
+        default=[None],
+        help="Input audio devices, each an index, a name, a glob or part of a name; without it the system "
+             "default input device is used. Several devices are transcribed at once into one merged output.",
+    )
+    parser.add_argument(
+        "--merge-delay",
+        type=float,
+        default=0.5,
+        help="Seconds results of several devices are held back so they can be printed in time order.",
+    )
+    parser.add_argument(
+        "--stream-rollover-seconds",
+        type=float,
+        default=600.0,
+        help="Move to a fresh stream after this many seconds of audio, at the next final result. 0 disables.",
+    )
     parser.add_argument("--list-devices", action="store_true", help="List input audio device indices.")
+    parser.add_argument(
+        "--metrics-file",
+        default=None,
+        help="Periodically write latency histograms here (.json for JSON, otherwise Prometheus text).",
+    )
+    parser.add_argument("--metrics-interval", type=float, default=10.0, help="Seconds between metrics writes.")
+    parser.add_argument(
+        "--vad",
+        action="store_true",
+        help="Skip silent audio before sending it, tuned by --start-threshold/--stop-threshold and the histories.",
+    )
     parser = add_asr_config_argparse_parameters(parser, profanity_filter=True)
     parser = add_connection_argparse_parameters(parser)
     parser.add_argument(
@@ -25,6 +61,18 @@ def parse_args() -> argparse.Namespace:
         help="A number of frames per second in audio streamed from a microphone.",
         default=16000,
     )
+    parser.add_argument(
+        "--device-sample-rate-hz",
+        type=int,
+        default=0,
+        help="Sample rate to capture at, resampled to --sample-rate-hz. 0 picks one the device supports.",
+    )
+    parser.add_argument(
+        "--device-channels",
+        type=int,
+        default=0,
+        help="Channels to capture, mixed down to mono. 0 picks a count the device supports.",
+    )
     parser.add_argument(
         "--file-streaming-chunk",
         type=int,
@@ -47,15 +95,7 @@ def parse_args() -> argparse.Namespace:
     return args
 
 
-def main() -> None:
-    args = parse_args()
-    if args.list_devices:
-        riva.client.audio_io.list_input_devices()
-        return
-    auth = riva.client.Auth(args.ssl_cert, args.use_ssl, args.server, args.metadata)
-    asr_service = riva.client.ASRService(auth)
-    nmt_client = riva.client.NeuralMachineTranslationClient(auth)
-    
+def build_streaming_config(args: argparse.Namespace) -> riva.client.StreamingTranslateSpeechToTextConfig:
     config = riva.client.StreamingRecognitionConfig(
         config=riva.client.RecognitionConfig(
             encoding=riva.client.AudioEncoding.LINEAR_PCM,
@@ -86,7 +126,7 @@ def main() -> None:
         args.custom_configuration
     )
 
-    config = riva.client.StreamingTranslateSpeechToTextConfig(
+    return riva.client.StreamingTranslateSpeechToTextConfig(
         asr_config=config,
         translation_config=riva.client.TranslationConfig(
             source_language_code=args.source_language_code,
@@ -94,19 +134,155 @@ def main() -> None:
         ),
     )
 
-    with riva.client.audio_io.MicrophoneStream(
-        args.sample_rate_hz,
-        args.file_streaming_chunk,
-        device=args.input_device,
-    ) as audio_chunk_iterator:
-        riva.client.print_streaming(
-            responses=nmt_client.streaming_s2t_response_generator(
-                audio_chunks=audio_chunk_iterator,
-                streaming_config=config,
-            ),
-            show_intermediate=True,
+
+def stream_results(args: argparse.Namespace, audio_chunk_iterator) -> Iterator[ResultEvent]:
+    nmt_client = get_pool().get_nmt_client(args)
+    timeline = get_recorder().track(audio_chunk_iterator, args.sample_rate_hz)
+    responses = nmt_client.streaming_s2t_response_generator(
+        audio_chunks=iter(timeline),
+        streaming_config=build_streaming_config(args),
+    )
+    for event in events_from_responses(responses, translated=True):
+        timeline.observe(event)
+        yield event
+
+
+class DeviceSession:
+    """Captures one input device and streams it to Riva on its own thread.
+
+    All sessions share the pooled gRPC channel. Every event is passed to `on_event` together
+    with the time.monotonic() time of the captured audio it ends at.
+    """
+
+    def __init__(
+            self,
+            args: argparse.Namespace,
+            device: Optional[int],
+            on_event: Callable[[ResultEvent, float], None],
+            source: str = "",
+    ):
+        self.args = args
+        self.device = device
+        self.source = source
+        self.error = None
+        self.gate = None
+        self.started_at = None
+        self._on_event = on_event
+        # Imported here so that --help and --list-devices do not load NumPy.
+        from resample import NativeMicrophoneStream
+
+        self._stream = NativeMicrophoneStream(
+            args.sample_rate_hz,
+            args.file_streaming_chunk,
+            device=device,
+            device_rate=args.device_sample_rate_hz,
+            device_channels=args.device_channels,
         )
+        self._thread = threading.Thread(target=self._run, name=f"device-{device}", daemon=True)
+
+    def start(self):
+        self._stream.__enter__()
+        self.started_at = time.monotonic()
+        self._thread.start()
+
+    def join(self, timeout: Optional[float] = None):
+        self._thread.join(timeout)
+
+    def is_alive(self) -> bool:
+        return self._thread.is_alive()
+
+    def stop(self):
+        """Stop capturing; the stream finishes once the server has answered the remaining audio."""
+        if not self._stream.closed:
+            self._stream.close()
+        self._thread.join()
+
+    def _capture_time(self, event: ResultEvent) -> float:
+        sent_ms = event.audio_processed * 1000
+        capture_ms = self.gate.to_capture_ms(sent_ms) if self.gate is not None else sent_ms
+        return self.started_at + capture_ms / 1000
+
+    def _on_reconnect(self, error: Exception, delay: float):
+        print(f"{self.source or 'Input'}: stream failed ({error.code().name}), reconnecting in {delay:.1f}s",
+              file=sys.stderr)
+
+    def _run(self):
+        try:
+            chunks = self._stream
+            if self.args.vad:
+                from vad import VoiceActivityGate
+
+                self.gate = VoiceActivityGate.from_args(self.args, chunks)
+                chunks = iter(self.gate)
+            for event in resilient_results(self.args, chunks, stream_results, self._on_reconnect):
+                if self.source:
+                    event = replace(event, source=self.source)
+                self._on_event(event, self._capture_time(event))
+        except Exception as e:
+            self.error = e
+
+
+def device_label(device: Optional[int]) -> str:
+    if device is None:
+        return "default"
+    info = get_registry().get(device)
+    return f"{device}:{info.name}" if info is not None else str(device)
+
+
+def resolve_devices(patterns: List[Optional[str]]) -> List[Optional[int]]:
+    """Return the device indices `--input-device` names; None stands for the default device."""
+    devices = []
+    for pattern in patterns:
+        if pattern is None:
+            devices.append(None)
+            continue
+        device = get_registry().find(pattern)
+        if device is None:
+            raise SystemExit(f"No input device matches {pattern!r}; see --list-devices.")
+        devices.append(device.index)
+    return devices
+
+
+def main(on_result: Optional[ResultSink] = None) -> None:
+    args = parse_args()
+    if args.list_devices:
+        list_input_devices()
+        return
+    sink = print_event if on_result is None else on_result
+
+    devices = resolve_devices(args.input_device)
+    merger = TimeOrderedMerger(sink, args.merge_delay) if len(devices) > 1 else None
+    sessions = [
+        DeviceSession(args, device, merger.push, device_label(device)) if merger is not None
+        else DeviceSession(args, device, lambda event, timestamp: sink(event))
+        for device in devices
+    ]
+    exporter = MetricsExporter(get_recorder(), args.metrics_file, args.metrics_interval).start() \
+        if args.metrics_file else None
+    try:
+        for session in sessions:
+            session.start()
+        # Join with a timeout so Ctrl+C is handled promptly.
+        while any(session.is_alive() for session in sessions):
+            for session in sessions:
+                session.join(0.2)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for session in sessions:
+            if session.started_at is not None:
+                session.stop()
+        if merger is not None:
+            merger.close()
+        if exporter is not None:
+            exporter.stop()
 
+    for session in sessions:
+        name = session.source or "Input"
+        if session.error is not None:
+            print(f"{name}: transcription failed: {session.error}", file=sys.stderr)
+        if session.gate is not None:
+            print(f"{name}: voice activity gate skipped {session.gate.saved_fraction:.1%} of the captured audio.")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,97 @@
+import queue
+import tkinter as tk
+from tkinter import ttk
+from typing import Dict, List
+
+from results import ResultEvent
+
+
+class TranscriptPanel(ttk.Frame):
+    """Scrolling live transcript fed from worker threads.
+
+    `post` may be called from any thread; events are queued and applied on the Tk main loop
+    once every `interval_ms`. All final results that arrived since the last tick are appended
+    in one redraw, and of a burst of interim results only the latest of each source is shown,
+    so the redraw rate does not depend on how fast results arrive. The panel keeps at most
+    `max_lines` lines of text.
+    """
+
+    def __init__(self, parent, interval_ms: int = 50, max_lines: int = 2000):
+        super().__init__(parent)
+        self._interval_ms = interval_ms
+        self._max_lines = max_lines
+        self._events = queue.SimpleQueue()
+        self._interims: Dict[str, str] = {}
+        self.redraws = 0
+
+        self.text = tk.Text(self, wrap="word", state="disabled", height=8)
+        self.text.tag_configure("interim", foreground="gray")
+        scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.text.yview)
+        self.text.configure(yscrollcommand=scrollbar.set)
+        self.text.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+
+        self.after(self._interval_ms, self._tick)
+
+    def post(self, event: ResultEvent):
+        """Queue a result event for display; safe to call from any thread."""
+        self._events.put(event)
+
+    __call__ = post
+
+    def add_note(self, text: str):
+        """Queue a line of text that is not a result, e.g. a session marker."""
+        self._events.put(text)
+
+    def clear(self):
+        self._interims.clear()
+        self.text.configure(state="normal")
+        self.text.delete("1.0", "end")
+        self.text.configure(state="disabled")
+
+    def _tick(self):
+        lines: List[str] = []
+        interims = dict(self._interims)
+        changed = False
+        while True:
+            try:
+                event = self._events.get_nowait()
+            except queue.Empty:
+                break
+            changed = True
+            if isinstance(event, str):
+                lines.append(event)
+            elif event.is_final:
+                interims.pop(event.source, None)
+                if event.display_text.strip():
+                    lines.append(self._format(event.source, event.display_text))
+            else:
+                interims[event.source] = event.display_text
+        if changed:
+            self._redraw(lines, interims)
+        self.after(self._interval_ms, self._tick)
+
+    @staticmethod
+    def _format(source: str, text: str) -> str:
+        text = text.strip()
+        return f"[{source}] {text}" if source else text
+
+    def _redraw(self, lines: List[str], interims: Dict[str, str]):
+        self.redraws += 1
+        self._interims = interims
+        follow = self.text.yview()[1] >= 0.999
+        self.text.configure(state="normal")
+        interim_range = self.text.tag_ranges("interim")
+        if interim_range:
+            self.text.delete(interim_range[0], interim_range[-1])
+        for line in lines:
+            self.text.insert("end-1c", line + "\n")
+        for source, text in interims.items():
+            if text.strip():
+                self.text.insert("end-1c", self._format(source, text) + "\n", "interim")
+        excess = int(self.text.index("end-1c").split(".")[0]) - self._max_lines
+        if excess > 0:
+            self.text.delete("1.0", f"{excess + 1}.0")
+        self.text.configure(state="disabled")
+        if follow:
+            self.text.see("end")
@@ -0,0 +1,310 @@
+import asyncio
+import copy
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from dataclasses import replace
+from typing import AsyncIterable, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from channelpool import get_pool
+from results import ResultEvent
+
+
+def nmt_language(code: str) -> str:
+    """Return the language part of a locale code, which is what text translation models expect."""
+    return code.split("-")[0].split("_")[0]
+
+
+class TranslationMemo:
+    """Thread-safe LRU map from (source, target, model, text) to its translation."""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str, str, str], str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[str, str, str, str]) -> Optional[str]:
+        with self._lock:
+            translation = self._entries.get(key)
+            if translation is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return translation
+
+    def put(self, key: Tuple[str, str, str, str], translation: str):
+        with self._lock:
+            self._entries[key] = translation
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class BatchTranslator:
+    """Translates texts with Riva NMT in batches on a background thread.
+
+    `submit` returns a future at once. Texts submitted within `max_wait_ms` of each other,
+    possibly by different streams, are sent in one TranslateText request of at most
+    `max_batch` texts. Texts already in the memo, or repeated within a batch, are not sent.
+    `get_client` is called for every batch, so a translator outlives the channel it started
+    on being replaced, e.g. after a reconnect invalidated it in the client pool.
+    """
+
+    def __init__(
+            self,
+            get_client: Callable[[], object],
+            source_language: str,
+            target_language: str,
+            model: str = "",
+            max_batch: int = 16,
+            max_wait_ms: float = 20.0,
+            memo: Optional[TranslationMemo] = None,
+    ):
+        self._get_client = get_client
+        self.source_language = nmt_language(source_language)
+        self.target_language = nmt_language(target_language)
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self.memo = memo if memo is not None else TranslationMemo()
+        self.requests = 0
+        self.texts_sent = 0
+        self._queue: "queue.Queue[Optional[Tuple[str, Future]]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="nmt-batcher", daemon=True)
+        self._thread.start()
+
+    def _key(self, text: str) -> Tuple[str, str, str, str]:
+        return self.source_language, self.target_language, self.model, text
+
+    def submit(self, text: str) -> Future:
+        """Return a future for the translation of `text`."""
+        future = Future()
+        text = text.strip()
+        cached = self.memo.get(self._key(text)) if text else ""
+        if cached is not None:
+            future.set_result(cached)
+        else:
+            self._queue.put((text, future))
+        return future
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        closing = False
+        while not closing:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait_ms / 1000
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    closing = True
+                    break
+                batch.append(item)
+            self._translate(batch)
+
+    def _translate(self, batch: List[Tuple[str, Future]]):
+        waiting: Dict[str, List[Future]] = {}
+        for text, future in batch:
+            waiting.setdefault(text, []).append(future)
+        texts = list(waiting)
+        try:
+            client = self._get_client()
+            try:
+                response = client.translate(texts, self.model, self.source_language, self.target_language)
+            except Exception:
+                # The channel was closed under the request; try once more on its replacement.
+                replacement = self._get_client()
+                if replacement is client:
+                    raise
+                response = replacement.translate(texts, self.model, self.source_language, self.target_language)
+        except Exception as e:
+            for futures in waiting.values():
+                for future in futures:
+                    future.set_exception(e)
+            return
+        self.requests += 1
+        self.texts_sent += len(texts)
+        for text, translation in zip(texts, response.translations):
+            self.memo.put(self._key(text), translation.text)
+            for future in waiting[text]:
+                future.set_result(translation.text)
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "texts_sent": self.texts_sent,
+            "memo_hits": self.memo.hits,
+            "memo_misses": self.memo.misses,
+        }
+
+
+class _TranslationGate:
+    """Decides which result events of one stream are worth translating; see `translate_events`."""
+
+    def __init__(self, interim_interval_ms: float, min_stability: float):
+        self.interim_interval_ms = interim_interval_ms
+        self.min_stability = min_stability
+        self._last_interim = ""
+        self._last_translated = ""
+        self._last_interim_at = -float("inf")
+
+    def wants(self, event: ResultEvent) -> bool:
+        if event.is_final:
+            self._last_interim = self._last_translated = ""
+            return True
+        if self.interim_interval_ms <= 0:
+            return False
+        now = time.monotonic()
+        stable = event.stability >= self.min_stability or event.text == self._last_interim
+        self._last_interim = event.text
+        if stable and event.text != self._last_translated \
+                and (now - self._last_interim_at) * 1000 >= self.interim_interval_ms:
+            self._last_translated = event.text
+            self._last_interim_at = now
+            return True
+        return False
+
+
+def translate_events(
+        events: Iterable[ResultEvent],
+        translator: BatchTranslator,
+        interim_interval_ms: float = 1000.0,
+        min_stability: float = 0.5,
+) -> Iterator[ResultEvent]:
+    """Add translations to a stream of ASR result events, in order.
+
+    Every final result is translated. An interim result is translated only when it looks
+    stable (its stability is at least `min_stability`, or it repeats the previous interim)
+    and at least `interim_interval_ms` has passed since the last interim translation;
+    `interim_interval_ms=0` translates finals only. Other interims are passed on untranslated.
+    Each event is yielded as soon as it and every earlier event are ready, so a final is
+    delayed by its own translation only. `events` is consumed on a helper thread, which stops
+    at the next event and closes `events` once the returned iterator is closed or fails.
+    """
+    ready: "queue.Queue[Tuple[str, object]]" = queue.Queue()
+    pending: deque = deque()  # (event, future or None) in arrival order
+    stop = threading.Event()
+
+    def pump():
+        try:
+            for event in events:
+                if stop.is_set():
+                    break
+                ready.put(("event", event))
+        except Exception as e:
+            ready.put(("error", e))
+        finally:
+            if hasattr(events, "close"):
+                events.close()
+        ready.put(("end", None))
+
+    threading.Thread(target=pump, name="asr-results", daemon=True).start()
+
+    gate = _TranslationGate(interim_interval_ms, min_stability)
+    finished = False
+    try:
+        while not finished or pending:
+            kind, value = ready.get() if not finished else ("wait", None)
+            if kind == "event":
+                event = value
+                future = translator.submit(event.text) if gate.wants(event) else None
+                if future is not None:
+                    future.add_done_callback(lambda _: ready.put(("translated", None)))
+                pending.append((event, future))
+            elif kind == "error":
+                raise value
+            elif kind == "end":
+                finished = True
+            elif kind == "wait":
+                pending[0][1].result()
+            while pending and (pending[0][1] is None or pending[0][1].done()):
+                event, future = pending.popleft()
+                yield event if future is None else replace(event, translation=future.result())
+    finally:
+        stop.set()
+
+
+async def translate_events_async(
+        events: AsyncIterable[ResultEvent],
+        translator: BatchTranslator,
+        interim_interval_ms: float = 1000.0,
+        min_stability: float = 0.5,
+) -> AsyncIterator[ResultEvent]:
+    """`translate_events` for an async stream of events; `events` is consumed by a task.
+
+    The translator's batching thread is shared by all streams, so this adds no thread per stream.
+    """
+    ready: asyncio.Queue = asyncio.Queue()
+    pending: deque = deque()  # (event, future or None) in arrival order
+
+    async def pump():
+        try:
+            async for event in events:
+                ready.put_nowait(("event", event))
+        except Exception as e:
+            ready.put_nowait(("error", e))
+        ready.put_nowait(("end", None))
+
+    task = asyncio.ensure_future(pump())
+    gate = _TranslationGate(interim_interval_ms, min_stability)
+    finished = False
+    try:
+        while not finished or pending:
+            if finished:
+                await asyncio.wait([pending[0][1]])
+            else:
+                kind, value = await ready.get()
+                if kind == "event":
+                    future = None
+                    if gate.wants(value):
+                        future = asyncio.wrap_future(translator.submit(value.text))
+                        future.add_done_callback(lambda _: ready.put_nowait(("translated", None)))
+                    pending.append((value, future))
+                elif kind == "error":
+                    raise value
+                elif kind == "end":
+                    finished = True
+            while pending and (pending[0][1] is None or pending[0][1].done()):
+                event, future = pending.popleft()
+                yield event if future is None else replace(event, translation=future.result())
+    finally:
+        task.cancel()
+
+
+_translators: Dict[tuple, BatchTranslator] = {}
+_translators_lock = threading.Lock()
+
+
+def get_translator(args) -> BatchTranslator:
+    """Return the shared batch translator for the server and languages of `args`.
+
+    Streams with the same server and language pair share one translator, so their texts are
+    batched together and hit the same memo.
+    """
+    pool = get_pool()
+    key = (pool.key_for(args), args.asr_language_code, args.target_language_code)
+    with _translators_lock:
+        translator = _translators.get(key)
+        if translator is None:
+            # A copy, so later changes to `args` cannot point the translator at another server.
+            connection = copy.copy(args)
+            translator = BatchTranslator(lambda: pool.get_nmt_client(connection), args.asr_language_code,
+                                         args.target_language_code)
+            _translators[key] = translator
+        return translator
@@ -0,0 +1,179 @@
+from bisect import bisect_right
+from collections import deque
+from dataclasses import replace
+from typing import Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+# Defaults used when the matching RivaArguments field is unset (-1).
+DEFAULT_START_THRESHOLD = 0.5
+DEFAULT_STOP_THRESHOLD = 0.3
+DEFAULT_PRE_ROLL_MS = 300
+DEFAULT_HANGOVER_MS = 800
+# Frames this quiet are digital silence (muted or padded input), not room noise.
+DIGITAL_SILENCE_DB = -85.0
+
+
+class VoiceActivityGate:
+    """Suppresses silent 16-bit mono audio chunks before they are sent to Riva.
+
+    Each chunk is split into `frame_ms` frames whose energy above an adaptive noise floor
+    and zero-crossing rate give a speech score between 0 and 1. The gate opens when a
+    chunk scores at least `start_threshold`, replaying up to `pre_roll_ms` of the audio
+    before it so word onsets are kept, and closes after `hangover_ms` of chunks scoring
+    below `stop_threshold`. While closed, one chunk every `keepalive_ms` is still sent if
+    `keepalive_ms` is set; everything else is dropped.
+    """
+
+    def __init__(
+            self,
+            chunks: Iterable[bytes],
+            sample_rate_hz: int = 16000,
+            start_threshold: float = DEFAULT_START_THRESHOLD,
+            stop_threshold: float = DEFAULT_STOP_THRESHOLD,
+            pre_roll_ms: int = DEFAULT_PRE_ROLL_MS,
+            hangover_ms: int = DEFAULT_HANGOVER_MS,
+            keepalive_ms: int = 0,
+            frame_ms: int = 20,
+            snr_range_db: float = 20.0,
+    ):
+        self._chunks = chunks
+        self._sample_rate_hz = sample_rate_hz
+        self.start_threshold = start_threshold
+        self.stop_threshold = stop_threshold
+        self.pre_roll_ms = pre_roll_ms
+        self.hangover_ms = hangover_ms
+        self.keepalive_ms = keepalive_ms
+        self._frame_len = max(sample_rate_hz * frame_ms // 1000, 1)
+        self._snr_range_db = snr_range_db
+        self._noise_floor_db = -60.0
+
+        self.is_open = False
+        self._pre_roll: deque = deque()
+        self._pre_roll_ms = 0.0
+        self._silence_ms = 0.0
+        self._since_keepalive_ms = 0.0
+
+        self.total_ms = 0.0
+        self.sent_ms = 0.0
+        # (sent audio position, total audio dropped before it) at every gap, for offset mapping.
+        self._gaps: List[Tuple[float, float]] = []
+
+    @classmethod
+    def from_args(cls, args, chunks: Iterable[bytes]) -> "VoiceActivityGate":
+        """Build a gate tuned by the endpointing fields of a RivaArguments instance."""
+        return cls(
+            chunks,
+            sample_rate_hz=args.sample_rate_hz,
+            start_threshold=args.start_threshold if args.start_threshold > 0 else DEFAULT_START_THRESHOLD,
+            stop_threshold=args.stop_threshold if args.stop_threshold > 0 else DEFAULT_STOP_THRESHOLD,
+            pre_roll_ms=args.start_history if args.start_history > 0 else DEFAULT_PRE_ROLL_MS,
+            hangover_ms=args.stop_history if args.stop_history > 0 else DEFAULT_HANGOVER_MS,
+        )
+
+    @property
+    def suppressed_ms(self) -> float:
+        return self.total_ms - self.sent_ms - self._pre_roll_ms
+
+    @property
+    def saved_fraction(self) -> float:
+        """Fraction of the captured audio that was not sent to the server."""
+        return self.suppressed_ms / self.total_ms if self.total_ms else 0.0
+
+    def to_capture_ms(self, sent_ms: float) -> float:
+        """Map a time in the sent audio (as seen by the server) to a time in the captured audio."""
+        index = bisect_right(self._gaps, (sent_ms, float("inf")))
+        return sent_ms + (self._gaps[index - 1][1] if index else 0.0)
+
+    def to_capture_event(self, event):
+        """Return a result event with its audio and word times mapped to the captured audio."""
+        return replace(
+            event,
+            audio_processed=self.to_capture_ms(event.audio_processed * 1000) / 1000,
+            words=tuple(replace(w, start_ms=round(self.to_capture_ms(w.start_ms)),
+                                end_ms=round(self.to_capture_ms(w.end_ms))) for w in event.words),
+        )
+
+    def score(self, chunk: bytes) -> float:
+        """Return the speech score of a chunk and update the noise floor estimate."""
+        samples = np.frombuffer(chunk, dtype=np.int16)
+        n_frames = len(samples) // self._frame_len
+        if n_frames == 0:
+            return 0.0
+        frames = samples[:n_frames * self._frame_len].reshape(n_frames, self._frame_len).astype(np.float32)
+        rms = np.sqrt(np.mean(frames * frames, axis=1))
+        level_db = 20.0 * np.log10(rms / 32768.0 + 1e-9)
+        signs = np.signbit(frames)
+        zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+
+        scores = np.clip((level_db - self._noise_floor_db) / self._snr_range_db, 0.0, 1.0)
+        # Broadband hiss crosses zero far more often than voiced speech.
+        scores = np.where(zcr > 0.35, scores * 0.5, scores)
+        top = np.sort(scores)[-max(n_frames // 4, 1):]
+
+        # The floor follows quiet frames down immediately and drifts up slowly, towards the
+        # typical level outside speech and the pauses between words inside it, so a louder
+        # room closes the gate again. Digital silence would pin it far below any real noise.
+        noise_db = level_db[level_db > DIGITAL_SILENCE_DB]
+        if len(noise_db):
+            self._noise_floor_db = min(self._noise_floor_db, float(noise_db.min()))
+            if self.is_open:
+                self._noise_floor_db = 0.98 * self._noise_floor_db + 0.02 * float(np.percentile(noise_db, 10))
+            else:
+                self._noise_floor_db = 0.95 * self._noise_floor_db + 0.05 * float(np.median(noise_db))
+        return float(top.mean())
+
+    def _duration_ms(self, chunk: bytes) -> float:
+        return len(chunk) / 2 * 1000.0 / self._sample_rate_hz
+
+    def _drop(self):
+        dropped = self.total_ms - self.sent_ms - self._pre_roll_ms
+        if self._gaps and self._gaps[-1][0] == self.sent_ms:
+            self._gaps[-1] = (self.sent_ms, dropped)
+        else:
+            self._gaps.append((self.sent_ms, dropped))
+
+    def _send(self, chunk: bytes, duration_ms: float) -> bytes:
+        self.sent_ms += duration_ms
+        return chunk
+
+    def __iter__(self) -> Iterator[bytes]:
+        for chunk in self._chunks:
+            duration_ms = self._duration_ms(chunk)
+            self.total_ms += duration_ms
+            score = self.score(chunk)
+            if self.is_open:
+                self._silence_ms = self._silence_ms + duration_ms if score < self.stop_threshold else 0.0
+                if self._silence_ms >= self.hangover_ms:
+                    self.is_open = False
+                    self._since_keepalive_ms = 0.0
+                yield self._send(chunk, duration_ms)
+            elif score >= self.start_threshold:
+                self.is_open = True
+                self._silence_ms = 0.0
+                while self._pre_roll:
+                    buffered = self._pre_roll.popleft()
+                    buffered_ms = self._duration_ms(buffered)
+                    self._pre_roll_ms -= buffered_ms
+                    yield self._send(buffered, buffered_ms)
+                yield self._send(chunk, duration_ms)
+            else:
+                self._since_keepalive_ms += duration_ms
+                if self.keepalive_ms and self._since_keepalive_ms >= self.keepalive_ms:
+                    self._since_keepalive_ms = 0.0
+                    self._flush_pre_roll()
+                    yield self._send(chunk, duration_ms)
+                    continue
+                self._pre_roll.append(chunk)
+                self._pre_roll_ms += duration_ms
+                while self._pre_roll_ms > self.pre_roll_ms and len(self._pre_roll) > 1:
+                    dropped = self._pre_roll.popleft()
+                    self._pre_roll_ms -= self._duration_ms(dropped)
+                    self._drop()
+
+    def _flush_pre_roll(self):
+        """Drop the buffered pre-roll; used when a keepalive chunk is sent instead."""
+        while self._pre_roll:
+            dropped = self._pre_roll.popleft()
+            self._pre_roll_ms -= self._duration_ms(dropped)
+            self._drop()
@@ -1,17 +1,57 @@
-import queue
-from typing import Optional
+import asyncio
+import time
+from collections import deque
+from typing import Iterator, Optional
+
+from metrics import StampedChunk
+
+OVERFLOW_POLICIES = ("block", "drop_oldest", "drop_newest")
+
 
 class WebSocketStream:
-    """Opens a WebSocket stream as an iterator yielding audio chunks."""
+    """Opens a WebSocket stream as an iterator yielding audio chunks.
 
-    def __init__(self, websocket, chunk_size: int = 1024):
+    Received audio is held in a bounded buffer of at most `max_buffered_ms` of audio and
+    handed out re-framed into chunks of `chunk_size` frames. When the buffer is full,
+    `overflow` decides whether the receiver waits ("block"), the oldest buffered audio is
+    discarded ("drop_oldest") or the incoming message is discarded ("drop_newest"). Chunks
+    are `StampedChunk`s carrying the time their oldest audio was received.
+    """
+
+    def __init__(
+            self,
+            websocket,
+            chunk_size: int = 1024,
+            sample_rate_hz: int = 16000,
+            sample_width: int = 2,
+            channels: int = 1,
+            max_buffered_ms: int = 5000,
+            overflow: str = "block",
+    ):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {OVERFLOW_POLICIES}, got {overflow!r}.")
         self._websocket = websocket
-        self._chunk_size = chunk_size
-        self._buff = queue.Queue()  # Thread-safe buffer for audio chunks
+        self._frame_bytes = sample_width * channels
+        self._bytes_per_ms = sample_rate_hz * self._frame_bytes / 1000.0
+        self._chunk_bytes = max(chunk_size, 1) * self._frame_bytes
+        self._max_bytes = max(int(max_buffered_ms * self._bytes_per_ms), self._chunk_bytes)
+        self._overflow = overflow
+        self._buff = bytearray()
+        # [bytes still buffered, receive time] of every message in the buffer, oldest first.
+        self._arrivals = deque()
+        self._readable = asyncio.Event()
+        self._writable = asyncio.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
         self.closed = False
 
+        self.received_bytes = 0
+        self.dropped_bytes = 0
+        self.drop_events = 0
+        self.max_depth_bytes = 0
+
     async def __aenter__(self):
         """Start the WebSocket stream and return the iterator."""
+        self._loop = asyncio.get_running_loop()
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
@@ -19,41 +59,130 @@ class WebSocketStream:
         self.close()
 
     def close(self):
-        """Mark the stream as closed and signal the iterator to stop."""
+        """Mark the stream as closed and signal the iterator to stop once the buffer is drained.
+
+        Safe to call from any thread.
+        """
         self.closed = True
-        self._buff.put(None)  # Signal the end of the stream
+        if self._loop is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._wake()
+        elif not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self):
+        self._readable.set()
+        self._writable.set()
+
+    @property
+    def queue_depth_bytes(self) -> int:
+        return len(self._buff)
+
+    @property
+    def queue_depth_ms(self) -> float:
+        return len(self._buff) / self._bytes_per_ms
+
+    @property
+    def dropped_ms(self) -> float:
+        return self.dropped_bytes / self._bytes_per_ms
+
+    def stats(self) -> dict:
+        """Return buffer depth and drop counters."""
+        return {
+            "received_bytes": self.received_bytes,
+            "queue_depth_bytes": self.queue_depth_bytes,
+            "queue_depth_ms": self.queue_depth_ms,
+            "max_depth_bytes": self.max_depth_bytes,
+            "dropped_bytes": self.dropped_bytes,
+            "dropped_ms": self.dropped_ms,
+            "drop_events": self.drop_events,
+        }
+
+    async def _put(self, data: bytes):
+        incoming = len(data)
+        if self._overflow == "block":
+            while self._buff and len(self._buff) + incoming > self._max_bytes and not self.closed:
+                self._writable.clear()
+                await self._writable.wait()
+        elif self._overflow == "drop_newest" and len(self._buff) + incoming > self._max_bytes:
+            self.dropped_bytes += incoming
+            self.drop_events += 1
+            return
+        self._buff += data
+        self._arrivals.append([incoming, time.monotonic()])
+        if self._overflow == "drop_oldest":
+            excess = len(self._buff) - self._max_bytes
+            if excess > 0:
+                excess += -excess % self._frame_bytes
+                del self._buff[:excess]
+                self._consume_arrivals(excess)
+                self.dropped_bytes += excess
+                self.drop_events += 1
+        self.max_depth_bytes = max(self.max_depth_bytes, len(self._buff))
+        self._readable.set()
 
     async def receive_chunks(self):
-        """Continuously receive audio chunks from the WebSocket and add them to the buffer."""
+        """Continuously receive audio chunks from the WebSocket and add them to the buffer.
+
+        An empty binary message marks the end of the audio.
+        """
+        self._loop = asyncio.get_running_loop()
         try:
             while not self.closed:
                 data = await self._websocket.receive_bytes()
-                self._buff.put(data)
+                if not data:
+                    break
+                self.received_bytes += len(data)
+                await self._put(data)
+            self.close()
         except Exception as e:
             print(f"WebSocket receive error: {e}")
             self.close()
 
+    async def _next_chunk(self) -> Optional[bytes]:
+        while len(self._buff) < self._chunk_bytes and not self.closed:
+            self._readable.clear()
+            await self._readable.wait()
+        if not self._buff:
+            return None
+        size = min(self._chunk_bytes, len(self._buff))
+        data = StampedChunk(self._buff[:size], self._arrivals[0][1])
+        del self._buff[:size]
+        self._consume_arrivals(size)
+        self._writable.set()
+        return data
+
+    def _consume_arrivals(self, size: int):
+        while size > 0 and self._arrivals:
+            arrival = self._arrivals[0]
+            taken = min(size, arrival[0])
+            arrival[0] -= taken
+            size -= taken
+            if not arrival[0]:
+                self._arrivals.popleft()
+
+    def chunks(self) -> Iterator[bytes]:
+        """Yield audio chunks synchronously, for consumers running on another thread."""
+        if self._loop is None:
+            raise RuntimeError("WebSocketStream must be entered on its event loop before chunks() is used.")
+        while True:
+            chunk = asyncio.run_coroutine_threadsafe(self._next_chunk(), self._loop).result()
+            if chunk is None:
+                return
+            yield chunk
+
     def __aiter__(self):
         """Return the iterator object."""
         return self
 
     async def __anext__(self) -> bytes:
         """Yield the next audio chunk from the buffer."""
-        if self.closed:
-            raise StopAsyncIteration
-
-        chunk = self._buff.get()
+        chunk = await self._next_chunk()
         if chunk is None:
             raise StopAsyncIteration
-
-        data = [chunk]
-        while True:
-            try:
-                chunk = self._buff.get_nowait()
-                if chunk is None:
-                    raise StopAsyncIteration
-                data.append(chunk)
-            except queue.Empty:
-                break
-
-        return b"".join(data)
\ No newline at end of file
+        return chunk